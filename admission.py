@@ -0,0 +1,170 @@
+"""
+Admission Control
+
+Bounds the work the system accepts: at most max_concurrency queries run
+the pipeline at once, at most max_queue_depth more wait for a slot, and
+anything beyond that is rejected immediately. Each admitted query carries
+a deadline that the pipeline stages check, so work that can no longer
+finish in time is abandoned instead of holding capacity.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+import threading
+import time
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when the system is saturated and a query is not admitted."""
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised when a query's deadline passes before a stage starts."""
+
+
+class Deadline:
+    """Absolute point in time a request must finish by."""
+
+    def __init__(self, timeout: Optional[float]):
+        """
+        Initialize the deadline.
+
+        Args:
+            timeout: Seconds from now (None means no deadline)
+        """
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[None]:
+    """Make a deadline current for the pipeline stages run in this context."""
+    token = _current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Get the deadline of the request being processed, if any."""
+    return _current_deadline.get()
+
+
+def remaining_time(default: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds left on the current deadline.
+
+    Args:
+        default: Upper bound to apply (e.g. a configured queue timeout)
+
+    Returns:
+        The smaller of the remaining time and default (None if both are unbounded)
+    """
+    deadline = current_deadline()
+    remaining = deadline.remaining() if deadline else None
+    if remaining is None:
+        return default
+    return remaining if default is None else min(default, remaining)
+
+
+def check_deadline(stage: str) -> None:
+    """
+    Abandon the request if its deadline has passed.
+
+    Args:
+        stage: Stage about to start (for the error message)
+
+    Raises:
+        DeadlineExceeded: If the current deadline has expired
+    """
+    deadline = current_deadline()
+    if deadline is not None and deadline.expired():
+        raise DeadlineExceeded(f"Deadline exceeded before the {stage} stage")
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded wait queue and fast rejection."""
+
+    def __init__(self, max_concurrency: int = 8, max_queue_depth: int = 16):
+        """
+        Initialize the admission controller.
+
+        Args:
+            max_concurrency: Queries allowed to run at once
+            max_queue_depth: Queries allowed to wait for a slot; more are rejected
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue_depth = max(0, max_queue_depth)
+        self.running = 0
+        self.waiting = 0
+        self.counters = {"admitted": 0, "rejected": 0, "timed_out": 0}
+        self._condition = threading.Condition()
+
+    def acquire(self, deadline: Optional[Deadline] = None) -> None:
+        """
+        Take a slot, waiting in the queue until one frees up or the deadline passes.
+
+        Args:
+            deadline: Request deadline bounding the wait (None waits indefinitely)
+
+        Raises:
+            AdmissionRejected: If the queue is full or the deadline passes first
+        """
+        with self._condition:
+            if self.running < self.max_concurrency and self.waiting == 0:
+                self.running += 1
+                self.counters["admitted"] += 1
+                return
+
+            if self.waiting >= self.max_queue_depth:
+                self.counters["rejected"] += 1
+                raise AdmissionRejected(
+                    f"System is at capacity ({self.running} running, {self.waiting} queued)"
+                )
+
+            self.waiting += 1
+            try:
+                while self.running >= self.max_concurrency:
+                    remaining = deadline.remaining() if deadline else None
+                    if remaining == 0.0:
+                        self.counters["timed_out"] += 1
+                        raise AdmissionRejected("Timed out waiting for a free slot")
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+
+            self.running += 1
+            self.counters["admitted"] += 1
+
+    def release(self) -> None:
+        """Free a slot taken with acquire()."""
+        with self._condition:
+            self.running -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self, deadline: Optional[Deadline] = None) -> Iterator[None]:
+        """Context manager around acquire()/release()."""
+        self.acquire(deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        """Get current load and admission counters."""
+        with self._condition:
+            return {"running": self.running, "waiting": self.waiting, **self.counters}
@@ -0,0 +1,101 @@
+"""
+Agent Logging
+
+Structured logging for agent activity. Agents log through standard
+`logging` loggers under "agents"; records are handed to a queue and a
+background listener thread does the console I/O, so the request path never
+blocks on stdout. Messages are formatted lazily, only for records that pass
+the level check.
+"""
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+
+ROOT_LOGGER = "agents"
+LOG_FORMAT = "[%(asctime)s] [%(agent)s] %(message)s"
+
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+class _DropWhenFullHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Leave formatting to the listener thread
+        if not hasattr(record, "agent"):
+            record.agent = record.name
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_agent_logging(level: Optional[str] = None, max_queued: int = 10000) -> logging.Logger:
+    """
+    Route agent logs through a background console writer (idempotent).
+
+    Args:
+        level: Minimum level logged (AGENT_LOG_LEVEL, default INFO)
+        max_queued: Records buffered for the writer before new ones are dropped
+
+    Returns:
+        The root agent logger
+    """
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    with _listener_lock:
+        if _listener is not None:
+            return root
+
+        root.setLevel((level or os.getenv('AGENT_LOG_LEVEL', 'INFO')).upper())
+        root.propagate = False
+
+        log_queue: queue.Queue = queue.Queue(maxsize=max_queued)
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(_DropWhenFullHandler(log_queue))
+
+        _listener = QueueListener(log_queue, console, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_agent_logging)
+    return root
+
+
+def shutdown_agent_logging() -> None:
+    """Write out queued records and stop the background writer."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            root = logging.getLogger(ROOT_LOGGER)
+            for handler in list(root.handlers):
+                if isinstance(handler, QueueHandler):
+                    root.removeHandler(handler)
+
+
+def get_agent_logger(name: str) -> logging.Logger:
+    """
+    Get the logger for one agent.
+
+    Args:
+        name: Agent display name
+
+    Returns:
+        Logger under the "agents" hierarchy
+    """
+    configure_agent_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name.replace(' ', '_').lower()}")
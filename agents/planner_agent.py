@@ -1,16 +1,108 @@
+import logging
 import sys
 import os
+from importlib.util import find_spec
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from base_agent import BaseAgent
-from typing import Any, List, Dict
-from llm_config import get_llm_config
+from typing import Any, List, Dict, Optional
+import threading
+from llm_config import get_llm_config, get_agent_llm
+from tools.intent_index import IntentIndex, fill_template
 
-try:
-    from crewai import Agent
-    CREW_AVAILABLE = True
-except ImportError:
-    CREW_AVAILABLE = False
+# CrewAI itself is imported by get_planner_agent() on first use
+CREW_AVAILABLE = find_spec("crewai") is not None
+
+
+# Example queries that seed the intent centroids
+INTENT_EXAMPLES = {
+    "symptoms": [
+        "What are the symptoms of diabetes?",
+        "What are the signs of a heart attack?",
+        "Early warning signs of stroke",
+        "How do I know if I have the flu?",
+        "Symptoms of high blood pressure",
+    ],
+    "prevention": [
+        "How can I prevent heart disease?",
+        "How to avoid getting the flu",
+        "Ways to reduce the risk of diabetes",
+        "How to protect against infectious diseases",
+        "Prevention of high blood pressure",
+    ],
+    "treatment": [
+        "How is asthma treated?",
+        "What medications treat high blood pressure?",
+        "Treatment options for depression",
+        "How to manage type 2 diabetes",
+        "Is there a cure for arthritis?",
+    ],
+    "causes": [
+        "What causes heart disease?",
+        "Why do people get migraines?",
+        "Risk factors for stroke",
+        "What are the causes of obesity?",
+        "What causes high blood pressure?",
+    ],
+}
+
+# Plans for these intents are structurally identical; {query} and {topic} are filled in locally
+PLAN_TEMPLATES = {
+    "symptoms": (
+        "Research Plan for: '{query}'\n\n"
+        "Step 1: Identify the key medical concepts of {topic}\n"
+        "Step 2: Search trusted health sources (CDC, WHO, PubMed) for signs and symptoms\n"
+        "Step 3: Distinguish common, early and severe symptoms and when to seek care\n"
+        "Step 4: Verify symptoms across multiple sources\n"
+        "Step 5: Summarize findings in plain language with medical disclaimers\n"
+    ),
+    "prevention": (
+        "Research Plan for: '{query}'\n\n"
+        "Step 1: Identify the key risk factors for {topic}\n"
+        "Step 2: Search trusted health sources (CDC, WHO, PubMed) for prevention measures\n"
+        "Step 3: Extract lifestyle, vaccination and screening recommendations\n"
+        "Step 4: Verify recommendations across multiple sources\n"
+        "Step 5: Summarize findings in plain language with medical disclaimers\n"
+    ),
+    "treatment": (
+        "Research Plan for: '{query}'\n\n"
+        "Step 1: Identify the key medical concepts of {topic}\n"
+        "Step 2: Search trusted health sources (CDC, WHO, PubMed) for treatment options\n"
+        "Step 3: Extract medications, therapies and self-management guidance\n"
+        "Step 4: Verify treatment information across multiple sources\n"
+        "Step 5: Summarize findings in plain language with medical disclaimers\n"
+    ),
+    "causes": (
+        "Research Plan for: '{query}'\n\n"
+        "Step 1: Identify the key medical concepts of {topic}\n"
+        "Step 2: Search trusted health sources (CDC, WHO, PubMed) for causes and risk factors\n"
+        "Step 3: Separate modifiable from non-modifiable risk factors\n"
+        "Step 4: Verify causes across multiple sources\n"
+        "Step 5: Summarize findings in plain language with medical disclaimers\n"
+    ),
+}
+
+
+# Shared intent index - seeded lazily so the embedding model loads on first use
+_intent_index: Optional[IntentIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_intent_index() -> IntentIndex:
+    """Get or create the shared intent index, seeded with the built-in intents."""
+    global _intent_index
+    with _index_lock:
+        if _intent_index is None:
+            index = IntentIndex(match_threshold=float(os.getenv('INTENT_MATCH_THRESHOLD', '0.3')))
+            for intent, examples in INTENT_EXAMPLES.items():
+                index.add_intent(intent, examples, PLAN_TEMPLATES[intent])
+            _intent_index = index
+        return _intent_index
+
+
+def _plan_failed(response: str) -> bool:
+    """Check whether an LLM response is an error message rather than a plan."""
+    return not response.strip() or response.startswith("Error")
 
 
 class PlannerAgent(BaseAgent):
@@ -30,7 +122,7 @@ class PlannerAgent(BaseAgent):
             "extract_information",
             "summarize_findings"
         ]
-        self.llm = get_llm_config()
+        self.llm = get_agent_llm()
     
     def process(self, input_data: Any) -> str:
         """
@@ -46,21 +138,29 @@ class PlannerAgent(BaseAgent):
             raise ValueError("PlannerAgent expects string input")
         
         query = input_data
-        self.log_activity(f"Creating plan for query: {query}")
+        self.log_activity("Creating plan for query: %s", query)
         
         plan = self.create_plan(query)
         return plan
     
-    def create_plan(self, query: str) -> str:
+    def create_plan(self, query: str, use_template: bool = True) -> str:
         """
         Create a structured research plan.
         
         Args:
             query: User query
+            use_template: Fill in the cached template for the query's intent
+                when one matches, calling the LLM only for unseen intents
             
         Returns:
             Formatted plan
         """
+        if use_template:
+            plan = self.match_template(query)
+            if plan is not None:
+                get_intent_index().observe(query)
+                return plan
+        
         # Try using LLM if available
         if self.llm:
             try:
@@ -81,9 +181,14 @@ class PlannerAgent(BaseAgent):
                     response = str(self.llm.predict(prompt))
                 
                 self.log_activity("LLM plan generated successfully")
-                return f"Research Plan (Generated by AI)\n========================================\n{response}"
+                plan = f"Research Plan (Generated by AI)\n========================================\n{response}"
+                if not _plan_failed(response):
+                    intent = get_intent_index().observe(query, plan)
+                    self.log_activity("Plan cached under intent '%s'", intent)
+                return plan
             except Exception as e:
-                self.log_activity(f"LLM planning failed: {e}. Falling back to rule-based logic.")
+                self.log_activity("LLM planning failed: %s. Falling back to rule-based logic.", e,
+                                  level=logging.WARNING)
 
         return (
             f"Research Plan for: '{query}'\n\n"
@@ -98,6 +203,37 @@ class PlannerAgent(BaseAgent):
             "Step 5: Add medical disclaimers\n"
         )
     
+    def classify_intent(self, query: str) -> str:
+        """
+        Classify the intent of a query by its nearest intent centroid.
+        
+        Args:
+            query: User query
+            
+        Returns:
+            Intent name (e.g. "symptoms"), or "general" if no intent is close enough
+        """
+        intent, _ = get_intent_index().classify(query)
+        return intent or "general"
+    
+    def match_template(self, query: str) -> Optional[str]:
+        """
+        Build a plan from the template for the query's intent, without an LLM call.
+        
+        Args:
+            query: User query
+            
+        Returns:
+            Filled-in plan, or None if no template matches the intent
+        """
+        index = get_intent_index()
+        intent, similarity = index.classify(query)
+        template = index.template_for(intent)
+        if template is None:
+            return None
+        self.log_activity("Matched plan template '%s' (similarity %.2f)", intent, similarity)
+        return fill_template(template, query)
+    
     def prioritize_tasks(self, tasks: List[str]) -> List[str]:
         """Prioritize a list of tasks."""
         # Simple priority: maintain order for now
@@ -124,6 +260,8 @@ def get_planner_agent():
         if llm is None:
             return None
             
+        from crewai import Agent
+        
         planner_agent = Agent(
             name="Planner Agent",
             role="Task Planner",
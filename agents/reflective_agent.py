@@ -1,16 +1,17 @@
+import logging
 import sys
 import os
+from importlib.util import find_spec
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from base_agent import BaseAgent
-from typing import Any, Dict, List
-from llm_config import get_llm_config
+from tools.context_packer import fit_context, model_name
+from tools.groundedness import score_groundedness
+from typing import Any, Dict, List, Optional
+from llm_config import get_llm_config, get_agent_llm
 
-try:
-    from crewai import Agent
-    CREW_AVAILABLE = True
-except ImportError:
-    CREW_AVAILABLE = False
+# CrewAI itself is imported by get_reflective_agent() on first use
+CREW_AVAILABLE = find_spec("crewai") is not None
 
 try:
     from models import UserFeedback, ReflectionReport
@@ -41,7 +42,13 @@ class ReflectiveAgent(BaseAgent):
             "completeness": 3.0,
             "factuality": 3.0
         }
-        self.llm = get_llm_config()
+        self.output_tokens = 512  # Context reserved for the LLM response
+        # Local grounding good enough to skip the LLM evaluation call
+        self.grounding_skip_thresholds = {
+            "factuality": 4.0,
+            "support_rate": 0.8
+        }
+        self.llm = get_agent_llm()
     
     def process(self, input_data: Any) -> str:
         """
@@ -57,17 +64,25 @@ class ReflectiveAgent(BaseAgent):
             raise ValueError("ReflectiveAgent expects string input")
         
         summary_text = input_data
-        self.log_activity(f"Evaluating summary ({len(summary_text)} chars)")
+        self.log_activity("Evaluating summary (%s chars)", len(summary_text))
         
         report = self.evaluate_summary(summary_text)
         return report
     
-    def evaluate_summary(self, summary_text: str) -> str:
+    def evaluate_summary(self, summary_text: str, sources: Optional[List[str]] = None,
+                         grounding: Optional[Dict[str, Any]] = None,
+                         use_llm: Optional[bool] = None) -> str:
         """
         Evaluate the quality of a summary.
         
         Args:
             summary_text: Summary to evaluate
+            sources: Retrieved chunks the summary was built from (optional).
+                When given, the summary is scored for groundedness locally and
+                the LLM evaluation is skipped if it is clearly well grounded.
+            grounding: Precomputed grounding report (skips recomputing from sources)
+            use_llm: Force (True) or skip (False) the LLM evaluation; None decides
+                from the grounding report
             
         Returns:
             Formatted reflection report
@@ -75,15 +90,32 @@ class ReflectiveAgent(BaseAgent):
         if not summary_text or summary_text.strip() == "":
             return "Reflection: No summary provided to evaluate."
         
+        if grounding is None and sources:
+            grounding = self.check_groundedness(summary_text, sources)
+        if use_llm is None:
+            use_llm = not self.is_well_grounded(grounding)
+            if not use_llm:
+                self.log_activity(
+                    "Summary is well grounded (factuality %.1f/5.0); skipping LLM evaluation",
+                    grounding['factuality']
+                )
+        
         # Try using LLM if available
-        if self.llm:
+        if self.llm and use_llm:
             try:
                 self.log_activity("Attempting to evaluate summary using LLM...")
-                prompt = (
+                instructions = (
                     "Evaluate the following health summary for coherence, completeness, and factuality. "
                     "Provide a score out of 5 for each metric and suggest improvements.\n\n"
-                    f"SUMMARY TO EVALUATE:\n{summary_text[:4000]}"
+                    "SUMMARY TO EVALUATE:\n"
+                )
+                # Fit the summary to the model's context budget at a sentence boundary
+                context, prompt_tokens = fit_context(
+                    instructions, [summary_text],
+                    model=model_name(self.llm), reserve_output=self.output_tokens
                 )
+                self.log_activity("Prompt packed to %s tokens", prompt_tokens)
+                prompt = instructions + context
                 
                 if hasattr(self.llm, 'call'):
                     response = self.llm.call([{"role": "user", "content": prompt}])
@@ -93,10 +125,11 @@ class ReflectiveAgent(BaseAgent):
                 self.log_activity("LLM evaluation generated successfully")
                 return f"Quality Evaluation Report (Generated by AI)\n==================================================\n{response}"
             except Exception as e:
-                self.log_activity(f"LLM evaluation failed: {e}. Falling back to rule-based logic.")
+                self.log_activity("LLM evaluation failed: %s. Falling back to rule-based logic.", e,
+                                  level=logging.WARNING)
 
         # Calculate scores
-        scores = self.calculate_scores(summary_text)
+        scores = self.calculate_scores(summary_text, grounding=grounding)
         self.metrics.update(scores)
         
         # Generate report
@@ -109,6 +142,19 @@ class ReflectiveAgent(BaseAgent):
             f"Overall Score: {sum(scores.values())/len(scores):.1f}/5.0\n\n"
         )
         
+        if grounding and grounding["sentences"]:
+            supported = sum(1 for sentence in grounding["sentences"] if sentence["supported"])
+            report += (
+                f"Grounding: {supported}/{len(grounding['sentences'])} statements supported by sources "
+                f"(source coverage {grounding['coverage']:.0%})\n"
+            )
+            weak = [sentence for sentence in grounding["sentences"] if not sentence["supported"]]
+            if weak:
+                report += "Weakly supported statements:\n"
+                for sentence in weak:
+                    report += f"- {sentence['text']} (support {sentence['support']:.2f})\n"
+            report += "\n"
+        
         # Add suggestions
         suggestions = self.suggest_improvements(scores)
         if suggestions:
@@ -118,15 +164,50 @@ class ReflectiveAgent(BaseAgent):
         
         report += "\nNote: Always verify critical medical information with primary sources.\n"
         
-        self.log_activity(f"Evaluation complete. Overall score: {sum(scores.values())/len(scores):.1f}/5.0")
+        self.log_activity("Evaluation complete. Overall score: %.1f/5.0", sum(scores.values())/len(scores))
         return report
     
-    def calculate_scores(self, summary_text: str) -> Dict[str, float]:
+    def check_groundedness(self, summary_text: str, sources: List[str]) -> Dict[str, Any]:
+        """
+        Score how well each summary sentence is supported by the sources.
+        
+        Args:
+            summary_text: Summary to check
+            sources: Retrieved source chunks
+            
+        Returns:
+            Grounding report (see tools.groundedness.score_groundedness)
+        """
+        grounding = score_groundedness(summary_text, sources)
+        self.log_activity(
+            "Grounding: support rate %.0f%%, coverage %.0f%%, factuality %.1f/5.0",
+            grounding['support_rate'] * 100, grounding['coverage'] * 100, grounding['factuality']
+        )
+        return grounding
+    
+    def is_well_grounded(self, grounding: Optional[Dict[str, Any]]) -> bool:
+        """
+        Check whether a grounding report clears the LLM-skip thresholds.
+        
+        Args:
+            grounding: Grounding report, or None if no sources were available
+            
+        Returns:
+            True if the summary is clearly supported by its sources
+        """
+        if not grounding or not grounding["sentences"]:
+            return False
+        return (grounding["factuality"] >= self.grounding_skip_thresholds["factuality"]
+                and grounding["support_rate"] >= self.grounding_skip_thresholds["support_rate"])
+    
+    def calculate_scores(self, summary_text: str,
+                         grounding: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
         """
         Calculate quality scores for a summary.
         
         Args:
             summary_text: Summary to score
+            grounding: Grounding report against the sources (optional)
             
         Returns:
             Dictionary of scores
@@ -141,8 +222,13 @@ class ReflectiveAgent(BaseAgent):
         has_sections = any(marker in summary_text for marker in ['Summary', 'Key', 'Important'])
         coherence = 4.0 if has_sections else 3.0
         
-        # Factuality - assume moderate confidence
-        factuality = 3.5
+        if grounding and grounding["sentences"]:
+            # Factuality from sentence support; completeness also rewards source coverage
+            factuality = grounding["factuality"]
+            completeness = (completeness + 5.0 * grounding["coverage"]) / 2
+        else:
+            # Factuality - assume moderate confidence
+            factuality = 3.5
         
         return {
             "coherence": coherence,
@@ -150,6 +236,18 @@ class ReflectiveAgent(BaseAgent):
             "factuality": factuality
         }
     
+    def passes_quality_thresholds(self, scores: Dict[str, float]) -> bool:
+        """
+        Check whether scores clear every quality threshold.
+        
+        Args:
+            scores: Quality scores from calculate_scores
+            
+        Returns:
+            True if no metric is below its threshold
+        """
+        return all(scores[metric] >= threshold for metric, threshold in self.quality_thresholds.items())
+    
     def suggest_improvements(self, scores: Dict[str, float]) -> List[str]:
         """
         Generate improvement suggestions based on scores.
@@ -180,13 +278,13 @@ class ReflectiveAgent(BaseAgent):
         Args:
             feedback: UserFeedback object or dict
         """
-        self.log_activity(f"Processing user feedback")
+        self.log_activity("Processing user feedback")
         
         if hasattr(feedback, 'rating'):
             self.feedback_history.append(feedback)
-            self.log_activity(f"Feedback stored. Rating: {feedback.rating}/5")
+            self.log_activity("Feedback stored. Rating: %s/5", feedback.rating)
         else:
-            self.log_activity("Invalid feedback format")
+            self.log_activity("Invalid feedback format", level=logging.WARNING)
     
     def determine_revision_need(self, feedback: Any) -> bool:
         """
@@ -201,17 +299,18 @@ class ReflectiveAgent(BaseAgent):
         if hasattr(feedback, 'rating'):
             # Revision needed if rating is low or explicitly requested
             needs_revision = feedback.rating < 3 or feedback.improvement_requested
-            self.log_activity(f"Revision needed: {needs_revision}")
+            self.log_activity("Revision needed: %s", needs_revision)
             return needs_revision
         
         return False
 
 
 # Legacy fallback function for compatibility
-def reflect_logic(summary_text: str) -> str:
+def reflect_logic(summary_text: str, sources: Optional[List[str]] = None) -> str:
     """Simple reflection that scores the summary on a few axes."""
     agent = ReflectiveAgent()
-    return agent.process(summary_text)
+    agent.log_activity("Evaluating summary (%s chars)", len(summary_text))
+    return agent.evaluate_summary(summary_text, sources=sources)
 
 
 # CrewAI agent for compatibility - created lazily to avoid import errors
@@ -222,6 +321,8 @@ def get_reflective_agent():
     global reflective_agent
     if CREW_AVAILABLE and reflective_agent is None:
         llm = get_llm_config()
+        from crewai import Agent
+        
         reflective_agent = Agent(
             name="Reflective Agent",
             role="Quality Reviewer",
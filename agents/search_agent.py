@@ -1,17 +1,15 @@
 import sys
 import os
+from importlib.util import find_spec
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from base_agent import BaseAgent
-from tools.rag_tool import rag_search_fallback
-from typing import Any, List
+from tools.rag_tool import rag_search_batch, rag_search_fallback, rag_search_with_scores
+from typing import Any, List, Optional, Tuple
 from llm_config import get_llm_config
 
-try:
-    from crewai import Agent
-    CREW_AVAILABLE = True
-except ImportError:
-    CREW_AVAILABLE = False
+# CrewAI itself is imported by get_search_agent() on first use
+CREW_AVAILABLE = find_spec("crewai") is not None
 
 
 class SearchAgent(BaseAgent):
@@ -45,7 +43,7 @@ class SearchAgent(BaseAgent):
         if len(query) < 3:
              return "Query too short. Please provide more specific health-related keywords."
 
-        self.log_activity(f"Searching for: {query}")
+        self.log_activity("Searching for: %s", query)
         
         docs = self.retrieve_documents(query)
         return docs
@@ -61,12 +59,57 @@ class SearchAgent(BaseAgent):
             Formatted document results
         """
         docs = self.query_vector_db(query, self.top_k)
+        return self.format_results(docs)
+    
+    def retrieve_with_scores(self, query: str) -> Tuple[str, List[float]]:
+        """
+        Retrieve relevant documents along with their relevance scores.
+        
+        Args:
+            query: Search query
+            
+        Returns:
+            Tuple of (formatted document results, relevance score per chunk in [0, 1])
+        """
+        results = rag_search_with_scores(query, self.top_k)
+        scores = [score for _, score in results]
+        if scores:
+            self.log_activity("Top relevance score: %.2f", max(scores))
+        return self.format_results([doc for doc, _ in results]), scores
+    
+    def retrieve_batch(self, queries: List[str]) -> Tuple[List[Tuple[str, List[float]]], Optional[Any]]:
+        """
+        Retrieve documents for many queries with a single embedding batch.
         
+        Args:
+            queries: Search queries
+            
+        Returns:
+            (formatted document results, relevance scores) per query, in input
+            order, and the query embeddings (None if they were not computed)
+        """
+        self.log_activity("Batch retrieval for %s queries", len(queries))
+        results, vectors = rag_search_batch(queries, self.top_k)
+        return [
+            (self.format_results([doc for doc, _ in hits]), [score for _, score in hits])
+            for hits in results
+        ], vectors
+    
+    def format_results(self, docs: List[str]) -> str:
+        """
+        Format retrieved chunks for the downstream agents.
+        
+        Args:
+            docs: Document contents in rank order
+            
+        Returns:
+            Formatted document results
+        """
         if not docs:
             self.log_activity("No documents found")
             return "No documents found in the health RAG store."
         
-        self.log_activity(f"Retrieved {len(docs)} documents")
+        self.log_activity("Retrieved %s documents", len(docs))
         joined = "\n\n".join(docs)
         return f"Retrieved {len(docs)} document chunks:\n\n{joined}"
     
@@ -103,6 +146,8 @@ def get_search_agent():
     global search_agent
     if CREW_AVAILABLE and search_agent is None:
         llm = get_llm_config()
+        from crewai import Agent
+        
         search_agent = Agent(
             name="Search Agent",
             role="Health Document Retriever",
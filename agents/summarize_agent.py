@@ -1,22 +1,67 @@
+import logging
 import sys
 import os
+from importlib.util import find_spec
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from base_agent import BaseAgent
-from typing import Any, List
-from llm_config import get_llm_config
+from tools.extractive import extractive_summary
+from tools.context_packer import (
+    count_tokens, fit_context, get_context_window, model_name, pack_chunks,
+    split_chunks, truncate_to_tokens,
+)
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, List, Optional
+from llm_config import get_llm_config, get_agent_llm
+from tracing import add_span_attributes
+import hashlib
+import threading
 
-try:
-    from crewai import Agent
-    CREW_AVAILABLE = True
-except ImportError:
-    CREW_AVAILABLE = False
+# CrewAI itself is imported by get_summarize_agent() on first use
+CREW_AVAILABLE = find_spec("crewai") is not None
+
+
+SUMMARY_INSTRUCTIONS = (
+    "You are a health research assistant. Summarize the following medical text "
+    "into clear, accessible language for a general audience. "
+    "Focus on key symptoms, causes, and prevention if applicable. "
+    "Do not add outside information, strictly use the provided text.\n\n"
+    "TEXT TO SUMMARIZE:\n"
+)
+
+MAP_INSTRUCTIONS = (
+    "You are a health research assistant. Extract the key health facts (symptoms, causes, "
+    "treatment, prevention) from the following passage in 2-3 plain sentences. "
+    "Do not add outside information.\n\n"
+    "PASSAGE:\n"
+)
+
+REDUCE_INSTRUCTIONS = (
+    "You are a health research assistant. Combine the following partial summaries of "
+    "retrieved medical passages into one clear, accessible summary for a general audience. "
+    "Merge duplicate points and focus on key symptoms, causes, and prevention if applicable. "
+    "Do not add outside information, strictly use the provided text.\n\n"
+    "PARTIAL SUMMARIES:\n"
+)
+
+# Per-chunk partial summaries shared by all summarizer instances, keyed by chunk id
+_partial_cache: "OrderedDict[str, str]" = OrderedDict()
+_partial_cache_lock = threading.Lock()
+PARTIAL_CACHE_SIZE = 1024
+
+
+def chunk_id(chunk: str, model: str = "") -> str:
+    """Stable id for a retrieved chunk (content hash, scoped to the model)."""
+    return hashlib.sha1(f"{model}\x1f{chunk}".encode("utf-8")).hexdigest()
 
 
 class SummarizationAgent(BaseAgent):
     """Agent responsible for summarizing retrieved health information."""
     
-    def __init__(self, max_length: int = 1000):
+    def __init__(self, max_length: int = 1000, output_tokens: int = 512,
+                 mode: str = "auto", map_reduce_min_chunks: int = 10, max_workers: int = 4):
         super().__init__(
             agent_id="summarizer_001",
             name="Summarization Agent",
@@ -27,7 +72,13 @@ class SummarizationAgent(BaseAgent):
         self.max_length = max_length
         self.style = "accessible"
         self.temperature = 0.7
-        self.llm = get_llm_config()
+        self.output_tokens = output_tokens  # Context reserved for the LLM response
+        # "single", "map_reduce", or "auto" (map-reduce when the chunks would not
+        # all fit in one prompt or there are at least map_reduce_min_chunks)
+        self.mode = mode
+        self.map_reduce_min_chunks = map_reduce_min_chunks
+        self.max_workers = max_workers
+        self.llm = get_agent_llm()
     
     def process(self, input_data: Any) -> str:
         """
@@ -43,17 +94,18 @@ class SummarizationAgent(BaseAgent):
             raise ValueError("SummarizationAgent expects string input")
         
         retrieved_text = input_data
-        self.log_activity(f"Summarizing {len(retrieved_text)} characters of text")
+        self.log_activity("Summarizing %s characters of text", len(retrieved_text))
         
         summary = self.summarize(retrieved_text)
         return summary
     
-    def summarize(self, retrieved_text: str) -> str:
+    def summarize(self, retrieved_text: str, query: Optional[str] = None) -> str:
         """
         Create a summary from retrieved documents.
         
         Args:
             retrieved_text: Text to summarize
+            query: Original user query, used to rank sentences without an LLM
             
         Returns:
             Formatted summary
@@ -64,21 +116,21 @@ class SummarizationAgent(BaseAgent):
         # Try using LLM if available
         if self.llm:
             try:
-                self.log_activity("Attempting to summarize using LLM...")
-                prompt = (
-                    "You are a health research assistant. Summarize the following medical text "
-                    "into clear, accessible language for a general audience. "
-                    "Focus on key symptoms, causes, and prevention if applicable. "
-                    "Do not add outside information, strictly use the provided text.\n\n"
-                    f"TEXT TO SUMMARIZE:\n{retrieved_text[:4000]}"  # Limit context
-                )
-                
-                # CrewAI LLM call (supports call or predict)
-                if hasattr(self.llm, 'call'):
-                    response = self.llm.call([{"role": "user", "content": prompt}])
+                chunks = split_chunks(retrieved_text)
+                add_span_attributes(chunks=len(chunks))
+                if self.use_map_reduce(chunks):
+                    self.log_activity("Attempting map-reduce summary of %s chunks using LLM...", len(chunks))
+                    response = self.map_reduce_summarize(chunks)
                 else:
-                    # Fallback for different LLM wrapper versions
-                    response = str(self.llm.predict(prompt))
+                    self.log_activity("Attempting to summarize using LLM...")
+                    # Pack whole retrieved chunks, best first, into the model's context budget
+                    context, prompt_tokens = fit_context(
+                        SUMMARY_INSTRUCTIONS, chunks,
+                        model=model_name(self.llm), reserve_output=self.output_tokens
+                    )
+                    self.log_activity("Prompt packed to %s tokens", prompt_tokens)
+                    add_span_attributes(prompt_tokens=prompt_tokens)
+                    response = self._ask_llm(SUMMARY_INSTRUCTIONS + context)
                 
                 self.log_activity("LLM summary generated successfully")
                 
@@ -91,14 +143,16 @@ class SummarizationAgent(BaseAgent):
                     "Please consult with qualified healthcare professionals for medical guidance.\n"
                 )
             except Exception as e:
-                self.log_activity(f"LLM summarization failed: {e}. Falling back to rule-based logic.")
+                self.log_activity("LLM summarization failed: %s. Falling back to rule-based logic.", e,
+                                  level=logging.WARNING)
 
-        # Improved summarization: Extract sentences instead of raw slicing
-        sentences = retrieved_text.replace('\n', ' ').split('. ')
-        
-        # Take the first 5-7 sentences for a coherent summary
-        selected_sentences = sentences[:7]
-        snippet = ". ".join(selected_sentences)
+        # Extractive summary: TextRank over sentence embeddings, biased to the query
+        try:
+            snippet = " ".join(extractive_summary(retrieved_text, query=query, max_sentences=7))
+        except Exception as e:
+            self.log_activity("Extractive summarization failed: %s. Using leading sentences.", e,
+                              level=logging.WARNING)
+            snippet = ". ".join(retrieved_text.replace('\n', ' ').split('. ')[:7])
         if not snippet.endswith('.'):
             snippet += "."
         
@@ -116,6 +170,98 @@ class SummarizationAgent(BaseAgent):
         self.log_activity("Summary generated successfully")
         return summary
     
+    def use_map_reduce(self, chunks: List[str]) -> bool:
+        """
+        Decide whether to summarize chunks with map-reduce.
+        
+        Args:
+            chunks: Retrieved chunks in rank order
+            
+        Returns:
+            True to summarize chunks in parallel and merge, False for one prompt
+        """
+        if len(chunks) < 2 or self.mode == "single":
+            return False
+        if self.mode == "map_reduce" or len(chunks) >= self.map_reduce_min_chunks:
+            return True
+        
+        model = model_name(self.llm)
+        budget = (get_context_window(model) - count_tokens(SUMMARY_INSTRUCTIONS, model)
+                  - self.output_tokens)
+        packed, _ = pack_chunks(chunks, budget, model)
+        return len(packed) < len(chunks)
+    
+    def map_reduce_summarize(self, chunks: List[str]) -> str:
+        """
+        Summarize each chunk in parallel, then merge the partial summaries.
+        
+        Partial summaries are cached by chunk id, so chunks seen in earlier
+        queries skip the map call.
+        
+        Args:
+            chunks: Retrieved chunks in rank order
+            
+        Returns:
+            Merged summary text from the reduce call
+        """
+        model = model_name(self.llm)
+        partials: List[str] = [""] * len(chunks)
+        pending = []
+        
+        with _partial_cache_lock:
+            for i, chunk in enumerate(chunks):
+                cached = _partial_cache.get(chunk_id(chunk, model))
+                if cached is not None:
+                    _partial_cache.move_to_end(chunk_id(chunk, model))
+                    partials[i] = cached
+                else:
+                    pending.append(i)
+        
+        self.log_activity("Map step: %s chunks to summarize, %s cached",
+                          len(pending), len(chunks) - len(pending))
+        add_span_attributes(map_reduce=True, cached_chunks=len(chunks) - len(pending))
+        if pending:
+            # Each map call runs in a copy of this context so its spans nest under the stage
+            contexts = [copy_context() for _ in pending]
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+                results = pool.map(
+                    lambda i, ctx: ctx.run(self._summarize_chunk, chunks[i], model),
+                    pending, contexts
+                )
+                for i, partial in zip(pending, results):
+                    partials[i] = partial
+        
+        # Reduce: merge the partial summaries, best-ranked first, within budget
+        context, prompt_tokens = fit_context(
+            REDUCE_INSTRUCTIONS, partials, model=model, reserve_output=self.output_tokens
+        )
+        self.log_activity("Reduce prompt packed to %s tokens", prompt_tokens)
+        add_span_attributes(prompt_tokens=prompt_tokens)
+        return self._ask_llm(REDUCE_INSTRUCTIONS + context)
+    
+    def _summarize_chunk(self, chunk: str, model: str) -> str:
+        """Map step for one chunk; falls back to the chunk's leading sentences on failure."""
+        context, _ = fit_context(MAP_INSTRUCTIONS, [chunk], model=model,
+                                 reserve_output=self.output_tokens)
+        try:
+            partial = self._ask_llm(MAP_INSTRUCTIONS + context)
+        except Exception as e:
+            self.log_activity("Map step failed for one chunk: %s", e, level=logging.WARNING)
+            return truncate_to_tokens(chunk, 120, model) or chunk[:500]
+        
+        with _partial_cache_lock:
+            _partial_cache[chunk_id(chunk, model)] = partial
+            while len(_partial_cache) > PARTIAL_CACHE_SIZE:
+                _partial_cache.popitem(last=False)
+        return partial
+    
+    def _ask_llm(self, prompt: str) -> str:
+        """Send one prompt to the LLM (supports call or predict)."""
+        if hasattr(self.llm, 'call'):
+            return self.llm.call([{"role": "user", "content": prompt}])
+        # Fallback for different LLM wrapper versions
+        return str(self.llm.predict(prompt))
+    
     def format_output(self, summary: str) -> str:
         """Format the summary output."""
         return summary
@@ -131,7 +277,7 @@ class SummarizationAgent(BaseAgent):
         Returns:
             Improved summary
         """
-        self.log_activity(f"Re-summarizing with {len(suggestions)} suggestions")
+        self.log_activity("Re-summarizing with %s suggestions", len(suggestions))
         
         # For now, append suggestions to summary
         base_summary = self.summarize(retrieved_text)
@@ -144,10 +290,11 @@ class SummarizationAgent(BaseAgent):
 
 
 # Legacy fallback function for compatibility
-def summarize_logic(retrieved_text: str) -> str:
+def summarize_logic(retrieved_text: str, query: Optional[str] = None) -> str:
     """Very simple python summarization fallback."""
     agent = SummarizationAgent()
-    return agent.process(retrieved_text)
+    agent.log_activity("Summarizing %s characters of text", len(retrieved_text))
+    return agent.summarize(retrieved_text, query=query)
 
 
 # CrewAI agent for compatibility - created lazily to avoid import errors
@@ -158,6 +305,8 @@ def get_summarize_agent():
     global summarize_agent
     if CREW_AVAILABLE and summarize_agent is None:
         llm = get_llm_config()
+        from crewai import Agent
+        
         summarize_agent = Agent(
             name="Summarization Agent",
             role="Health Research Summarizer",
@@ -4,42 +4,99 @@ Tries to use CrewAI multi-agent workflow. If anything goes wrong
 (e.g., missing API keys, version issues), it falls back to a pure
 Python pipeline using the *_logic() helper functions from each agent module.
 """
-from typing import Any
+from contextlib import nullcontext
+from importlib.util import find_spec
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import threading
+import time
 
-try:
-    from crewai import Crew, Task
-    CREW_AVAILABLE = True
-except Exception:
-    CREW_AVAILABLE = False
+# CrewAI takes seconds to import, so run_pipeline() imports it on first use
+CREW_AVAILABLE = find_spec("crewai") is not None
 
-from agents.planner_agent import get_planner_agent, planner_logic
-from agents.search_agent import get_search_agent, search_logic
-from agents.summarize_agent import get_summarize_agent, summarize_logic
-from agents.reflective_agent import get_reflective_agent, reflect_logic
+from agents.planner_agent import PlannerAgent, get_planner_agent
+from agents.search_agent import SearchAgent, get_search_agent
+from agents.summarize_agent import SummarizationAgent, get_summarize_agent, summarize_logic
+from agents.reflective_agent import ReflectiveAgent
+from admission import DeadlineExceeded, check_deadline
+from metrics import PIPELINE_FALLBACKS
+from quality_gate import QualityGate, get_quality_gate
+from tools.context_packer import split_chunks
 
+# Agents reused by the gating layer, one set per thread
+_thread_agents = threading.local()
 
-def run_system(user_query: str) -> str:
+
+def _agent(name: str, factory: Callable[[], Any]) -> Any:
+    """Get this thread's instance of an agent, creating it on first use."""
+    agent = getattr(_thread_agents, name, None)
+    if agent is None:
+        agent = factory()
+        setattr(_thread_agents, name, agent)
+    return agent
+
+
+def run_system(user_query: str, reflect: bool = True) -> str:
+    return run_pipeline(user_query, reflect=reflect)["output"]
+
+
+def run_pipeline(user_query: str, reflect: bool = True,
+                 retrieved: Optional[Tuple[str, List[float]]] = None) -> Dict[str, Any]:
+    """Run the agent pipeline and keep the intermediate stage outputs.
+
+    Args:
+        user_query: Sanitized user query
+        reflect: Whether to run the Reflective Agent inline. Callers that
+            evaluate the summary in the background pass False.
+        retrieved: (search results, relevance scores) already retrieved for
+            the query, e.g. by a batch search; retrieved here if None
+
+    Returns:
+        Dict with the user-facing "output" plus the "retrieved" content, the
+        "summary" text on their own, the "query_class" used for gating and
+        per-stage "timings" in seconds.
+    """
     if not user_query or user_query.strip() == "":
-        return "Please enter a health-related question to begin."
+        return {
+            "output": "Please enter a health-related question to begin.",
+            "retrieved": "",
+            "summary": "",
+        }
+
+    gate = get_quality_gate()
+    timings: Dict[str, float] = {}
+    planner = _agent("planner", PlannerAgent)
+    query_class = planner.classify_intent(user_query)
+
+    # Retrieval is local and cheap; its relevance scores decide whether the
+    # LLM planner is needed at all
+    if retrieved is None:
+        check_deadline("search")
+        with gate.timed("search", timings) as span:
+            retrieved = _agent("search", SearchAgent).retrieve_with_scores(user_query)
+            span.set(documents=len(retrieved[1]))
+    search_results, scores = retrieved
+    template_plan = gate_planner(user_query, scores, query_class, planner=planner, gate=gate)
 
     if CREW_AVAILABLE:
         try:
+            from crewai import Crew, Task
+            
             # Get agents lazily
             planner_agent = get_planner_agent()
             search_agent = get_search_agent()
             summarize_agent = get_summarize_agent()
-            reflective_agent = get_reflective_agent()
             
+            # The planner runs inside the crew; its task callback marks when it
+            # finished so its latency can be observed apart from the crew's
+            task_finished: Dict[str, float] = {}
             plan_task = Task(
                 description=f"Plan research steps for the health query: '{user_query}'",
                 expected_output="A clear list of research subtasks.",
                 agent=planner_agent,
+                callback=lambda _: task_finished.setdefault("planner", time.perf_counter()),
             )
             search_task = Task(
-                description=(
-                    "Using the plan, retrieve relevant health information from the vector store "
-                    f"related to: '{user_query}'"
-                ),
+                description=_search_task_description(user_query, search_results, template_plan),
                 expected_output="A set of relevant passages or document snippets.",
                 agent=search_agent,
             )
@@ -51,55 +108,213 @@ def run_system(user_query: str) -> str:
                 expected_output="A well-structured health research summary.",
                 agent=summarize_agent,
             )
-            reflect_task = Task(
-                description=(
-                    "Evaluate the summary for completeness, clarity, and potential issues. "
-                    "Provide a short reflection report with recommendations."
-                ),
-                expected_output="A reflection report on the quality of the summary.",
-                agent=reflective_agent,
-            )
+            if template_plan:
+                agents = [search_agent, summarize_agent]
+                tasks = [search_task, summarize_task]
+            else:
+                agents = [planner_agent, search_agent, summarize_agent]
+                tasks = [plan_task, search_task, summarize_task]
 
             crew = Crew(
-                agents=[planner_agent, search_agent, summarize_agent, reflective_agent],
-                tasks=[plan_task, search_task, summarize_task, reflect_task],
+                agents=agents,
+                tasks=tasks,
                 verbose=True,
             )
-            result: Any = crew.kickoff()
+            check_deadline("crew")
+            with gate.timed("crew", timings) as span:
+                span.set(tasks=len(tasks), template_plan=bool(template_plan))
+                started = time.perf_counter()
+                result: Any = crew.kickoff()
+            if "planner" in task_finished:
+                # Part of the crew's time; recorded so planner skips report what they save
+                planner_seconds = task_finished["planner"] - started
+                gate.observe("planner", planner_seconds)
+                timings["planner"] = planner_seconds
             
-            # Extract the summary task output (3rd task, index 2)
-            # CrewAI returns the last task by default, but we want the summary
+            # Extract the summary task output rather than the last task's output
             summary_output = None
-            if hasattr(result, 'tasks_output') and len(result.tasks_output) >= 3:
-                summary_output = result.tasks_output[2]  # summarize_task is 3rd
+            summary_index = tasks.index(summarize_task)
+            if hasattr(result, 'tasks_output') and len(result.tasks_output) > summary_index:
+                summary_output = result.tasks_output[summary_index]
             
             if summary_output:
-                if hasattr(summary_output, 'raw'):
-                    return str(summary_output.raw)
-                elif hasattr(summary_output, 'output'):
-                    return str(summary_output.output)
-                else:
-                    return str(summary_output)
+                summary_text = _task_output_text(summary_output)
+                retrieved_text = search_results
+                if reflect:
+                    # Reflection runs through the gate instead of as a crew task
+                    _, revised = reflect_summary(
+                        summary_text, split_chunks(retrieved_text), query_class,
+                        gate=gate, timings=timings
+                    )
+                    summary_text = revised or summary_text
+                return {
+                    "output": summary_text,
+                    "retrieved": retrieved_text,
+                    "summary": summary_text,
+                    "query_class": query_class,
+                    "timings": timings,
+                }
             
             # Fallback to full result if we can't extract summary
-            return str(result)
+            return {"output": str(result), "retrieved": "", "summary": str(result),
+                    "query_class": query_class, "timings": timings}
+        except DeadlineExceeded:
+            raise
         except Exception as e:
+            PIPELINE_FALLBACKS.inc(reason="crew_error")
             fallback_header = (
                 "CrewAI execution failed or is not fully configured.\n"
                 f"Reason: {e}\n\n"
                 "Falling back to simplified Python pipeline:\n\n"
             )
-            return fallback_header + _python_fallback(user_query)
+            pipeline = _python_fallback(user_query, search_results, template_plan,
+                                        query_class, reflect=reflect, gate=gate, timings=timings)
+            pipeline["output"] = fallback_header + pipeline["output"]
+            return pipeline
+    else:
+        PIPELINE_FALLBACKS.inc(reason="crew_unavailable")
+        return _python_fallback(user_query, search_results, template_plan,
+                                query_class, reflect=reflect, gate=gate, timings=timings)
+
+
+def gate_planner(user_query: str, scores: List[float], query_class: str = "general",
+                 planner: Optional[PlannerAgent] = None,
+                 gate: Optional[QualityGate] = None) -> Optional[str]:
+    """Decide whether a template plan can replace the LLM planner.
+
+    Args:
+        user_query: Sanitized user query
+        scores: Retrieval relevance scores for the query
+        query_class: Intent class the decision is attributed to
+        planner: Planner agent providing the templates (this thread's by default)
+        gate: Quality gate (the shared one by default)
+
+    Returns:
+        The template plan if the planner stage can be skipped, else None
+    """
+    gate = gate or get_quality_gate()
+    planner = planner or _agent("planner", PlannerAgent)
+    template_plan = planner.match_template(user_query)
+    top_score = max(scores, default=0.0)
+
+    if template_plan is None:
+        reason = "no plan template for this query class"
+    elif top_score < gate.retrieval_threshold:
+        reason = f"top retrieval score {top_score:.2f} < {gate.retrieval_threshold:.2f}"
+    else:
+        reason = f"template plan, top retrieval score {top_score:.2f}"
+
+    skip = gate.decide("planner", template_plan is not None and top_score >= gate.retrieval_threshold,
+                       query_class, reason)
+    return template_plan if skip else None
+
+
+def reflect_summary(summary_text: str, sources: List[str], query_class: str = "general",
+                    gate: Optional[QualityGate] = None,
+                    timings: Optional[Dict[str, float]] = None) -> Tuple[str, Optional[str]]:
+    """Reflect on a summary, calling the LLM and re-summarizing only when needed.
+
+    The summary is scored for groundedness locally first. If the scores
+    clear the Reflective Agent's quality thresholds the LLM evaluation is
+    skipped; the summary is only re-summarized when a score is below its
+    threshold.
+
+    Args:
+        summary_text: Summary to evaluate
+        sources: Retrieved chunks the summary was built from
+        query_class: Intent class the decisions are attributed to
+        gate: Quality gate (the shared one by default)
+        timings: Per-query stage timings to add to (optional)
+
+    Returns:
+        Tuple of (reflection report, revised summary or None if not revised)
+    """
+    gate = gate or get_quality_gate()
+    reflective = _agent("reflective", ReflectiveAgent)
+
+    with gate.timed("grounding", timings):
+        grounding = reflective.check_groundedness(summary_text, sources) if sources else None
+    scores = reflective.calculate_scores(summary_text, grounding)
+    passes = reflective.passes_quality_thresholds(scores)
+    scored = ", ".join(f"{metric} {score:.1f}" for metric, score in scores.items())
+
+    if grounding is None or not grounding["sentences"]:
+        skip_llm = gate.decide("reflection", False, query_class, "no grounding against sources")
     else:
-        return _python_fallback(user_query)
+        skip_llm = gate.decide(
+            "reflection", passes, query_class,
+            f"{'passes' if passes else 'below'} quality thresholds ({scored})"
+        )
+
+    if not skip_llm:
+        check_deadline("reflection")
+    with nullcontext() if skip_llm else gate.timed("reflection", timings):
+        report = reflective.evaluate_summary(summary_text, grounding=grounding, use_llm=not skip_llm)
+
+    suggestions = [] if passes else reflective.suggest_improvements(scores)
+    if not gate.decide("resummarize", not suggestions, query_class,
+                       "scores above threshold" if not suggestions else f"below threshold ({scored})"):
+        check_deadline("resummarize")
+        with gate.timed("resummarize", timings):
+            revised = _agent("summarizer", SummarizationAgent).re_summarize(
+                "\n\n".join(sources), suggestions
+            )
+        return report, revised
 
+    return report, None
 
-def _python_fallback(user_query: str) -> str:
-    """Run a simple sequential pipeline without LLM calls."""
-    plan = planner_logic(user_query)
-    search_results = search_logic(user_query)
-    summary = summarize_logic(search_results)
-    reflection = reflect_logic(summary)
+
+def _search_task_description(user_query: str, search_results: str,
+                              template_plan: Optional[str] = None) -> str:
+    """Describe the crew's search task around passages that were already retrieved.
+
+    Args:
+        user_query: Sanitized user query
+        search_results: Passages run_pipeline() retrieved for the query
+        template_plan: Plan replacing the planner task, if the gate skipped it
+
+    Returns:
+        Task description asking the search agent to work from the given
+        passages instead of querying the vector store again
+    """
+    plan = (f"Following this research plan:\n{template_plan}\n\n" if template_plan
+            else "Using the plan, ")
+    return (
+        f"{plan}select the health information relevant to: '{user_query}' from the "
+        "passages below, which were already retrieved from the vector store. "
+        "Do not search again.\n\n"
+        f"=== RETRIEVED CONTENT ===\n{search_results}"
+    )
+
+
+def _task_output_text(task_output: Any) -> str:
+    """Extract the text of a CrewAI task output."""
+    if task_output is None:
+        return ""
+    if hasattr(task_output, 'raw'):
+        return str(task_output.raw)
+    elif hasattr(task_output, 'output'):
+        return str(task_output.output)
+    return str(task_output)
+
+
+def _python_fallback(user_query: str, search_results: str, template_plan: Optional[str] = None,
+                     query_class: str = "general", reflect: bool = True,
+                     gate: Optional[QualityGate] = None,
+                     timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Run a simple sequential pipeline without CrewAI."""
+    gate = gate or get_quality_gate()
+    timings = {} if timings is None else timings
+    if template_plan:
+        plan = template_plan
+    else:
+        # The gate already ruled the template out, so plan with the LLM
+        check_deadline("planner")
+        with gate.timed("planner", timings):
+            plan = _agent("planner", PlannerAgent).create_plan(user_query, use_template=False)
+    check_deadline("summarize")
+    with gate.timed("summarize", timings):
+        summary = summarize_logic(search_results, query=user_query)
 
     parts = [
         "=== PLAN ===",
@@ -110,8 +325,28 @@ def _python_fallback(user_query: str) -> str:
         "",
         "=== SUMMARY ===",
         summary,
-        "",
-        "=== REFLECTION ===",
-        reflection,
     ]
-    return "\n".join(parts)
+
+    if reflect:
+        reflection, revised = reflect_summary(summary, split_chunks(search_results),
+                                              query_class, gate=gate, timings=timings)
+        parts.extend([
+            "",
+            "=== REFLECTION ===",
+            reflection,
+        ])
+        if revised:
+            summary = revised
+            parts.extend([
+                "",
+                "=== REVISED SUMMARY ===",
+                revised,
+            ])
+
+    return {
+        "output": "\n".join(parts),
+        "retrieved": search_results,
+        "summary": summary,
+        "query_class": query_class,
+        "timings": timings,
+    }
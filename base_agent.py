@@ -5,14 +5,21 @@ Provides common interface and functionality for all agents in the system.
 All agent classes should inherit from this base class.
 """
 from abc import ABC, abstractmethod
+from collections import deque
 from typing import Any
 from datetime import datetime
+import logging
+import time
+
+from agent_logging import get_agent_logger
+from tracing import get_tracer
 
 
 class BaseAgent(ABC):
     """Abstract base class for all agents in the system."""
     
-    def __init__(self, agent_id: str, name: str, role: str, llm_model: str = "gpt-4o-mini", verbose: bool = True):
+    def __init__(self, agent_id: str, name: str, role: str, llm_model: str = "gpt-4o-mini", verbose: bool = True,
+                 max_log_entries: int = 500):
         """
         Initialize the base agent.
         
@@ -21,14 +28,17 @@ class BaseAgent(ABC):
             name: Display name of the agent
             role: Role description of the agent
             llm_model: LLM model to use (default: gpt-4o-mini)
-            verbose: Whether to log activities (default: True)
+            verbose: Whether to write activities to the console (default: True)
+            max_log_entries: Most recent activities kept in the activity log
         """
         self.agent_id = agent_id
         self.name = name
         self.role = role
         self.llm_model = llm_model
         self.verbose = verbose
-        self.activity_log = []
+        self.logger = get_agent_logger(name)
+        # Ring buffer of (time, level, message, args), formatted only when read
+        self.activity_log = deque(maxlen=max_log_entries)
     
     def execute(self, input_data: Any) -> Any:
         """
@@ -41,12 +51,13 @@ class BaseAgent(ABC):
             Processed output from the agent
         """
         if not self.validate_input(input_data):
-            self.log_activity(f"Invalid input received: {type(input_data)}")
+            self.log_activity("Invalid input received: %s", type(input_data), level=logging.WARNING)
             raise ValueError(f"Invalid input for agent {self.name}")
         
-        self.log_activity(f"Executing task with input type: {type(input_data).__name__}")
-        result = self.process(input_data)
-        self.log_activity(f"Task completed successfully")
+        self.log_activity("Executing task with input type: %s", type(input_data).__name__)
+        with get_tracer().span("agent.execute", agent=self.name):
+            result = self.process(input_data)
+        self.log_activity("Task completed successfully")
         return result
     
     def validate_input(self, input_data: Any) -> bool:
@@ -63,32 +74,43 @@ class BaseAgent(ABC):
             return False
         return True
     
-    def log_activity(self, message: str) -> None:
+    def log_activity(self, message: str, *args: Any, level: int = logging.INFO) -> None:
         """
         Log an activity message.
         
+        Nothing is formatted here: filtered-out levels return immediately,
+        and the message is only merged with its args when read back or
+        written out by the background console writer.
+        
         Args:
-            message: Message to log
+            message: Message to log, with %-style placeholders for args
+            *args: Values for the placeholders
+            level: Logging level (default: INFO)
         """
-        timestamp = datetime.now().isoformat()
-        log_entry = f"[{timestamp}] [{self.name}] {message}"
-        self.activity_log.append(log_entry)
+        if not self.logger.isEnabledFor(level):
+            return
+        
+        self.activity_log.append((time.time(), level, message, args))
         
         if self.verbose:
-            print(log_entry)
+            self.logger.log(level, message, *args, extra={"agent": self.name})
     
     def get_activity_log(self) -> list:
         """
         Get the agent's activity log.
         
         Returns:
-            List of log entries
+            List of log entries, oldest first
         """
-        return self.activity_log.copy()
+        return [
+            f"[{datetime.fromtimestamp(created).isoformat()}] [{self.name}] "
+            f"{message % args if args else message}"
+            for created, _, message, args in list(self.activity_log)
+        ]
     
     def clear_log(self) -> None:
         """Clear the activity log."""
-        self.activity_log = []
+        self.activity_log.clear()
     
     @abstractmethod
     def process(self, input_data: Any) -> Any:
@@ -0,0 +1,256 @@
+"""Offline batch runner: replay a JSONL file of queries through the SystemController.
+
+Each input line is a JSON object holding the query (or a bare JSON string).
+Queries are sent in batches to a pool of worker processes; each worker
+builds its controller, retriever and LLM clients once. Results are appended
+to the output JSONL as they complete, so an interrupted run resumes where it
+stopped when started again with the same output file.
+
+Run:
+    python batch_runner.py queries.jsonl --output results.jsonl --workers 4
+"""
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+# Per-process controller, created by _init_worker
+_controller = None
+_concurrency = 1
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile.
+
+    Args:
+        values: Samples
+        pct: Percentile between 0 and 100
+
+    Returns:
+        Percentile value (0.0 without samples)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_checkpoint(output_path: str) -> Set[int]:
+    """
+    Find the input lines already processed in a previous run.
+
+    A record cut off by a crash is dropped from the output so the file stays
+    valid JSONL when the run appends to it.
+
+    Args:
+        output_path: Output JSONL of the previous run
+
+    Returns:
+        Line numbers with a result
+    """
+    done: Set[int] = set()
+    if not os.path.exists(output_path):
+        return done
+
+    valid_bytes = 0
+    with open(output_path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                done.add(json.loads(raw)["line"])
+            except (ValueError, KeyError):
+                break
+            valid_bytes += len(raw)
+
+    if valid_bytes < os.path.getsize(output_path):
+        print(f"⚠️  Dropping incomplete records at the end of {output_path}")
+        with open(output_path, "rb+") as f:
+            f.truncate(valid_bytes)
+    return done
+
+
+def read_queries(input_path: str, field: str, skip: Set[int]) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+    """
+    Stream queries from a JSONL file.
+
+    Args:
+        input_path: Input JSONL
+        field: Key holding the query text in each object
+        skip: Line numbers to skip (already processed)
+
+    Yields:
+        (line number, query text, original record)
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if line_number in skip or not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"⚠️  Skipping line {line_number}: invalid JSON")
+                continue
+            if isinstance(record, str):
+                yield line_number, record, {}
+            elif isinstance(record, dict):
+                yield line_number, str(record.get(field, "")), record
+            else:
+                print(f"⚠️  Skipping line {line_number}: expected an object or string")
+
+
+def _init_worker(concurrency: int) -> None:
+    """Create this worker's controller and load its retriever and LLM clients once."""
+    global _controller, _concurrency
+    from controller import SystemController
+    from llm_config import get_agent_llm
+    from tools.rag_tool import get_vectorstore
+
+    _concurrency = concurrency
+    _controller = SystemController(async_reflection=False)
+    _controller.initialize_system()
+    try:
+        get_vectorstore()
+    except Exception as e:
+        print(f"⚠️  Worker {os.getpid()} could not load the vector store: {e}")
+    get_agent_llm()
+
+
+def _process_batch(batch: List[Tuple[int, str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Run one batch through the worker's controller."""
+    responses = _controller.handle_batch([query for _, query, _ in batch],
+                                         concurrency=_concurrency)
+    results = []
+    for (line_number, query, record), response in zip(batch, responses):
+        results.append({
+            "line": line_number,
+            "id": record.get("id", record.get("request_id")),
+            "query": query,
+            "status": response.status,
+            "output": response.agent_logs[0] if response.agent_logs else "",
+            "error": response.error_message,
+            "execution_time": response.execution_time,
+            "stage_timings": response.stage_timings,
+        })
+    return results
+
+
+def _batches(items: Iterator[Tuple[int, str, Dict[str, Any]]], batch_size: int,
+             window: threading.Semaphore) -> Iterator[List[Tuple[int, str, Dict[str, Any]]]]:
+    """Group items into batches, blocking while too many batches are in flight."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            window.acquire()
+            yield batch
+            batch = []
+    if batch:
+        window.acquire()
+        yield batch
+
+
+def run(input_path: str, output_path: str, field: str = "query", workers: int = 2,
+        batch_size: int = 16, concurrency: int = 4) -> Dict[str, Any]:
+    """
+    Replay a JSONL file of queries and write the results incrementally.
+
+    Args:
+        input_path: Input JSONL
+        output_path: Output JSONL (appended to when resuming)
+        field: Key holding the query text in each input object
+        workers: Number of worker processes
+        batch_size: Queries sent to a worker at a time
+        concurrency: Queries each worker runs through the LLM stages at once
+
+    Returns:
+        Run report with counts, throughput and latency percentiles
+    """
+    done = load_checkpoint(output_path)
+    if done:
+        print(f"Resuming: {len(done)} queries already processed")
+
+    # Bound the batches queued ahead of the workers so the input is streamed
+    window = threading.Semaphore(workers * 2)
+    batches = _batches(read_queries(input_path, field, done), batch_size, window)
+
+    processed = 0
+    statuses: Dict[str, int] = {}
+    totals: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    start = time.time()
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            multiprocessing.Pool(workers, initializer=_init_worker,
+                                 initargs=(concurrency,)) as pool:
+        for results in pool.imap_unordered(_process_batch, batches):
+            window.release()
+            for result in results:
+                out.write(json.dumps(result) + "\n")
+                processed += 1
+                statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+                totals.append(result["execution_time"])
+                for stage, seconds in result["stage_timings"].items():
+                    stages.setdefault(stage, []).append(seconds)
+            out.flush()
+            print(f"Processed {processed} queries ({processed / (time.time() - start):.2f}/s)")
+
+    elapsed = time.time() - start
+    latency = {"total": totals, **stages}
+    return {
+        "processed": processed,
+        "resumed": len(done),
+        "statuses": statuses,
+        "elapsed_seconds": elapsed,
+        "throughput": processed / elapsed if elapsed > 0 else 0.0,
+        "latency": {
+            stage: {
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+                "count": len(values),
+            }
+            for stage, values in latency.items()
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print throughput and per-stage latency percentiles."""
+    print("\n" + "=" * 70)
+    print(" BATCH RUN REPORT")
+    print("=" * 70)
+    print(f"Processed: {report['processed']} (already done: {report['resumed']})")
+    print(f"Statuses: {report['statuses']}")
+    print(f"Elapsed: {report['elapsed_seconds']:.1f}s  Throughput: {report['throughput']:.2f} queries/s")
+    print(f"\n{'Stage':<14}{'p50 (s)':>10}{'p90 (s)':>10}{'p99 (s)':>10}{'count':>8}")
+    for stage, stats in report["latency"].items():
+        print(f"{stage:<14}{stats['p50']:>10.3f}{stats['p90']:>10.3f}{stats['p99']:>10.3f}{stats['count']:>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a JSONL file of health queries.")
+    parser.add_argument("input", help="Input JSONL, one query object (or string) per line")
+    parser.add_argument("--output", help="Output JSONL (default: <input>.results.jsonl)")
+    parser.add_argument("--field", default="query", help="Key holding the query text")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Worker processes")
+    parser.add_argument("--batch-size", type=int, default=16, help="Queries per worker batch")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Queries in the LLM stages at once, per worker")
+    args = parser.parse_args(argv)
+
+    output = args.output or f"{os.path.splitext(args.input)[0]}.results.jsonl"
+    report = run(args.input, output, field=args.field, workers=args.workers,
+                 batch_size=args.batch_size, concurrency=args.concurrency)
+    print_report(report)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Micro-benchmark: memory per model instance and serialization speed.
+
+Compares the slotted models with their previous __dict__-backed layout, and
+the binary codec with the to_dict/JSON path.
+
+Run:
+    python benchmarks/bench_models.py --count 20000
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import model_codec  # noqa: E402
+from models import Query  # noqa: E402
+
+
+@dataclass
+class DictQuery:
+    """Query with the previous layout (per-instance __dict__)."""
+    query_id: str
+    text: str
+    timestamp: datetime = field(default_factory=datetime.now)
+    user_context: Dict[str, Any] = field(default_factory=dict)
+    session_id: str = ""
+
+    to_dict = Query.to_dict
+    from_dict = Query.__dict__["from_dict"]
+
+
+def make_queries(cls: type, count: int) -> List[Any]:
+    return [cls(query_id=f"q{i}", text=f"What are the symptoms of condition {i}?",
+                session_id="bench-session") for i in range(count)]
+
+
+def bytes_per_instance(cls: type, count: int) -> float:
+    """Memory allocated per instance, including its strings, timestamp and context dict."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = make_queries(cls, count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return (after - before) / count
+
+
+def best_of(fn: Callable[[], Any], repeat: int = 5) -> float:
+    """Fastest wall time of several runs."""
+    best: Optional[float] = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(count: int) -> Dict[str, Dict[str, float]]:
+    """
+    Run every measurement.
+
+    Args:
+        count: Instances per measurement
+
+    Returns:
+        Results keyed by measurement, each with "before" and "after" values
+    """
+    results: Dict[str, Dict[str, float]] = {
+        "bytes/instance": {
+            "before": bytes_per_instance(DictQuery, count),
+            "after": bytes_per_instance(Query, count),
+        }
+    }
+
+    queries = make_queries(Query, count)
+    json_payloads = [json.dumps(q.to_dict()) for q in queries]
+    binary_payloads = [model_codec.encode(q) for q in queries]
+    json_batch = json.dumps([q.to_dict() for q in queries])
+    binary_batch = model_codec.encode_batch(queries)
+
+    def per_item_us(seconds: float) -> float:
+        return seconds / count * 1e6
+
+    results["encode us/item"] = {
+        "before": per_item_us(best_of(lambda: [json.dumps(q.to_dict()) for q in queries])),
+        "after": per_item_us(best_of(lambda: [model_codec.encode(q) for q in queries])),
+    }
+    results["decode us/item"] = {
+        "before": per_item_us(best_of(lambda: [Query.from_dict(json.loads(p)) for p in json_payloads])),
+        "after": per_item_us(best_of(lambda: [model_codec.decode(p, Query) for p in binary_payloads])),
+    }
+    results["batch encode us/item"] = {
+        "before": per_item_us(best_of(lambda: json.dumps([q.to_dict() for q in queries]))),
+        "after": per_item_us(best_of(lambda: model_codec.encode_batch(queries))),
+    }
+    results["batch decode us/item"] = {
+        "before": per_item_us(best_of(
+            lambda: [Query.from_dict(d) for d in json.loads(json_batch)])),
+        "after": per_item_us(best_of(lambda: model_codec.decode_batch(binary_batch, Query))),
+    }
+    results["payload bytes/item"] = {
+        "before": sum(len(p.encode("utf-8")) for p in json_payloads) / count,
+        "after": sum(len(p) for p in binary_payloads) / count,
+    }
+    return results
+
+
+def print_report(results: Dict[str, Dict[str, float]], count: int) -> None:
+    backend = "msgpack" if model_codec.MSGPACK_AVAILABLE else "marshal"
+    print(f"Query models, {count} instances (codec backend: {backend})")
+    print(f"\n{'Measurement':<24}{'dict/JSON':>12}{'slots/codec':>14}{'change':>10}")
+    for name, values in results.items():
+        change = (values["after"] - values["before"]) / values["before"] * 100
+        print(f"{name:<24}{values['before']:>12.2f}{values['after']:>14.2f}{change:>9.0f}%")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark model memory and serialization.")
+    parser.add_argument("--count", type=int, default=20000, help="Instances per measurement")
+    args = parser.parse_args(argv)
+    print_report(run(args.count), args.count)
+
+
+if __name__ == "__main__":
+    main()
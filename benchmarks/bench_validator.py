@@ -0,0 +1,145 @@
+"""Micro-benchmark: per-query cost of input validation and sanitization.
+
+Compares the single-pass validator (precompiled alternation, length
+pre-check, one substitution) with the previous validate_query +
+sanitize_input path over a mixed workload of valid, too short, oversized
+and unsafe queries.
+
+Run:
+    python benchmarks/bench_validator.py --count 100000
+"""
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from validator import InputValidator  # noqa: E402
+
+
+class LegacyValidator:
+    """The previous implementation: one re.search per pattern, several sanitize passes."""
+
+    def __init__(self, max_length: int = 1000, min_length: int = 3):
+        self.max_length = max_length
+        self.min_length = min_length
+        self.forbidden_patterns = [
+            r'<script.*?>.*?</script>',
+            r'javascript:',
+            r'on\w+\s*=',
+        ]
+
+    def validate_query(self, query: str) -> bool:
+        if not query or not isinstance(query, str):
+            return False
+        query = query.strip()
+        return self.min_length <= len(query.strip()) <= self.max_length and self.check_safety(query)
+
+    def check_safety(self, text: str) -> bool:
+        text_lower = text.lower()
+        for pattern in self.forbidden_patterns:
+            if re.search(pattern, text_lower, re.IGNORECASE):
+                return False
+        return True
+
+    def sanitize_input(self, input_str: str) -> str:
+        if not input_str:
+            return ""
+        sanitized = re.sub(r'<[^>]+>', '', input_str)
+        sanitized = sanitized.replace('\x00', '')
+        sanitized = ' '.join(sanitized.split())
+        return sanitized.strip()
+
+
+SAMPLES = [
+    "What are the symptoms of diabetes?",
+    "How can I lower my blood pressure without medication?",
+    "  Is intermittent fasting   safe for people with <b>heart disease</b>?  ",
+    "What does the research say about vitamin D and immunity?",
+    "hi",
+    "<script>alert('xss')</script>What is asthma?",
+    "Click <a href='javascript:void(0)'>here</a> for flu facts",
+    "<img src=x onerror=alert(1)> migraine triggers",
+    "Explain the difference between type 1 and type 2 diabetes. " * 40,
+]
+
+
+def make_workload(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(SAMPLES) for _ in range(count)]
+
+
+def best_of(fn: Callable[[], Any], repeat: int = 5) -> float:
+    """Fastest wall time of several runs."""
+    best: Optional[float] = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(count: int) -> Dict[str, Dict[str, float]]:
+    """
+    Run every measurement.
+
+    Args:
+        count: Queries per measurement
+
+    Returns:
+        Microseconds per query keyed by measurement, each with "before" and "after" values
+    """
+    queries = make_workload(count)
+    legacy = LegacyValidator()
+    validator = InputValidator()
+
+    # Both paths must agree before their speed is worth comparing
+    expected = [legacy.sanitize_input(q) if legacy.validate_query(q) else None for q in queries]
+    assert validator.validate_batch(queries) == expected
+
+    def per_query_us(seconds: float) -> float:
+        return seconds / count * 1e6
+
+    return {
+        "validate us/query": {
+            "before": per_query_us(best_of(lambda: [legacy.validate_query(q) for q in queries])),
+            "after": per_query_us(best_of(lambda: [validator.validate_query(q) for q in queries])),
+        },
+        "validate+sanitize us/query": {
+            "before": per_query_us(best_of(
+                lambda: [legacy.sanitize_input(q) if legacy.validate_query(q) else None
+                         for q in queries])),
+            "after": per_query_us(best_of(
+                lambda: [validator.validate_and_sanitize(q) for q in queries])),
+        },
+        "batch us/query": {
+            "before": per_query_us(best_of(
+                lambda: [legacy.sanitize_input(q) if legacy.validate_query(q) else None
+                         for q in queries])),
+            "after": per_query_us(best_of(lambda: validator.validate_batch(queries))),
+        },
+    }
+
+
+def print_report(results: Dict[str, Dict[str, float]], count: int) -> None:
+    print(f"Input validation, {count} mixed queries")
+    print(f"\n{'Measurement':<28}{'before':>10}{'after':>10}{'change':>10}")
+    for name, values in results.items():
+        change = (values["after"] - values["before"]) / values["before"] * 100
+        print(f"{name:<28}{values['before']:>10.2f}{values['after']:>10.2f}{change:>9.0f}%")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark input validation cost per query.")
+    parser.add_argument("--count", type=int, default=100000, help="Queries per measurement")
+    args = parser.parse_args(argv)
+    print_report(run(args.count), args.count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Import-time profile: what a cold import of each entry module costs.
+
+Imports each module in a fresh interpreter with `python -X importtime`,
+keeps the fastest of several runs, and reports the total plus the packages
+that account for most of it. Heavy dependencies (CrewAI, LangChain,
+sentence-transformers, ...) are meant to load on first use; any that a
+cold import pulls in are listed, and --check turns them into a failure.
+
+Run:
+    python benchmarks/profile_imports.py controller app --top 10
+"""
+from typing import Dict, List, Optional, Tuple
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Packages that must not be imported until they are first used
+HEAVY_PACKAGES = ("crewai", "langchain", "langchain_community", "langchain_core",
+                  "langchain_huggingface", "sentence_transformers", "transformers", "torch",
+                  "faiss", "streamlit")
+
+
+def profile_import(module: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Import a module in a fresh interpreter.
+
+    Args:
+        module: Module to import, e.g. "controller"
+
+    Returns:
+        Tuple of (total import time in ms, self time in ms per top-level package)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    total = 0.0
+    packages: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[0].strip().isdigit():
+            continue  # Column header
+        self_us, cumulative_us, name = int(fields[0]), int(fields[1]), fields[2]
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0.0) + self_us / 1000
+        if name.strip() == module and len(name) - len(name.lstrip()) == 1:
+            total = cumulative_us / 1000
+    return total, packages
+
+
+def run(modules: List[str], repeat: int) -> Dict[str, Tuple[float, Dict[str, float]]]:
+    """
+    Profile every module, keeping its fastest run.
+
+    Args:
+        modules: Modules to import
+        repeat: Fresh-interpreter runs per module
+
+    Returns:
+        (total ms, per-package ms) of the fastest run, keyed by module
+    """
+    results = {}
+    for module in modules:
+        runs = [profile_import(module) for _ in range(repeat)]
+        results[module] = min(runs, key=lambda run_result: run_result[0])
+    return results
+
+
+def print_report(results: Dict[str, Tuple[float, Dict[str, float]]], top: int) -> List[str]:
+    """Print the profile; returns the heavy packages imported eagerly."""
+    eager = []
+    for module, (total, packages) in results.items():
+        print(f"\nimport {module}: {total:.1f} ms")
+        print(f"  {'Package':<28}{'self ms':>10}")
+        for package, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            print(f"  {package:<28}{ms:>10.1f}")
+        heavy = sorted(p for p in packages if p in HEAVY_PACKAGES)
+        if heavy:
+            print(f"  ⚠️  Imported eagerly: {', '.join(heavy)}")
+            eager.extend(f"{module}: {package}" for package in heavy)
+    return eager
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Profile cold import time of entry modules.")
+    parser.add_argument("modules", nargs="*", default=["controller", "app", "batch_runner"],
+                        help="Modules to import")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per module (fastest kept)")
+    parser.add_argument("--top", type=int, default=10, help="Packages listed per module")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 if a heavy package is imported eagerly")
+    args = parser.parse_args(argv)
+
+    eager = print_report(run(args.modules, args.repeat), args.top)
+    if args.check and eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,24 +4,80 @@ System Controller
 Main controller that mediates between UI and backend agents.
 Handles input validation, session management, and response formatting.
 """
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+import os
 import uuid
 import time
+import weakref
 
 from models import Query, QueryResponse, UserFeedback, QueryStatus
+from admission import AdmissionController, AdmissionRejected, Deadline, deadline_scope
 from validator import InputValidator
 from session_manager import SessionManager
-from app import run_system
+from session_store import get_session_store
+from reflection_worker import ReflectionWorker
+from single_flight import SingleFlight, normalize_query
+from app import reflect_summary, run_pipeline
+from quality_gate import get_quality_gate
+from tracing import get_tracer
+from metrics import QUERIES, REGISTRY, CallbackMetric
+from llm_config import get_llm_cache, load_environment
+from agents.search_agent import SearchAgent
+from tools.context_packer import split_chunks
+from tools.extractive import cache_embeddings, embed_texts
 
 
 class SystemController:
     """Controller layer between UI and agents."""
     
-    def __init__(self):
-        """Initialize the system controller."""
+    def __init__(self, async_reflection: bool = True, reflection_queue_size: int = 32,
+                 max_concurrency: Optional[int] = None, max_queue_depth: Optional[int] = None,
+                 request_timeout: Optional[float] = None):
+        """
+        Initialize the system controller.
+        
+        Args:
+            async_reflection: Evaluate summaries in a background worker instead
+                of making the user wait for the Reflective Agent
+            reflection_queue_size: Maximum number of pending background evaluations
+            max_concurrency: Queries processed at once (MAX_CONCURRENT_QUERIES, default 8)
+            max_queue_depth: Queries waiting for a slot before new ones are
+                rejected (QUERY_QUEUE_DEPTH, default 16)
+            request_timeout: Seconds a query may take, including its wait for a
+                slot (QUERY_TIMEOUT, default 120; 0 disables the deadline)
+        """
+        load_environment()
         self.validator = InputValidator()
-        self.session_manager = SessionManager()
+        # Sessions persist across restarts and processes when SESSION_STORE_PATH is set
+        self.session_manager = SessionManager(
+            store=get_session_store(),
+            history_limit=int(os.getenv('SESSION_HISTORY_LIMIT', '100'))
+        )
+        self.reflection_worker = (
+            ReflectionWorker(self.session_manager, max_queue_size=reflection_queue_size)
+            if async_reflection else None
+        )
+        # Concurrent identical queries share one pipeline run
+        self.single_flight = SingleFlight()
+        self.admission = AdmissionController(
+            max_concurrency=max_concurrency or int(os.getenv('MAX_CONCURRENT_QUERIES', '8')),
+            max_queue_depth=(max_queue_depth if max_queue_depth is not None
+                             else int(os.getenv('QUERY_QUEUE_DEPTH', '16')))
+        )
+        if request_timeout is None:
+            request_timeout = float(os.getenv('QUERY_TIMEOUT', '120'))
+        self.request_timeout = request_timeout or None
         self.initialized = False
+        _live_controllers.add(self)
+        # The UI discards controllers without closing them; stop the worker
+        # thread when this controller is garbage collected
+        self._finalizer = (
+            weakref.finalize(self, self.reflection_worker.stop, 0)
+            if self.reflection_worker else None
+        )
     
     def initialize_system(self) -> None:
         """Initialize the system and verify all components."""
@@ -45,6 +101,14 @@ class SystemController:
         Returns:
             QueryResponse with results or error
         """
+        with get_tracer().span("query") as span:
+            response = self._handle_query(query_text, session_id)
+            span.set(status=response.status)
+        QUERIES.inc(status=response.status)
+        return response
+    
+    def _handle_query(self, query_text: str, session_id: Optional[str]) -> QueryResponse:
+        """Handle a user query inside its root tracing span (see handle_query)."""
         start_time = time.time()
         
         # Create or get session
@@ -56,7 +120,9 @@ class SystemController:
         response_id = str(uuid.uuid4())
         
         # Validate input
-        if not self.validator.validate_query(query_text):
+        with get_tracer().span("validation"):
+            sanitized_query = self.validator.validate_and_sanitize(query_text)
+        if sanitized_query is None:
             query = Query(
                 query_id=query_id,
                 text=query_text,
@@ -70,9 +136,6 @@ class SystemController:
                 execution_time=time.time() - start_time
             )
         
-        # Sanitize input
-        sanitized_query = self.validator.sanitize_input(query_text)
-        
         # Create Query object
         query = Query(
             query_id=query_id,
@@ -84,33 +147,19 @@ class SystemController:
         self.session_manager.update_session(session_id, query=query)
         
         try:
-            # Process query through agent system
-            result = run_system(sanitized_query)
+            # Process query through agent system; reflection is deferred to the
+            # background worker when one is configured
+            pipeline = self._run_coalesced(sanitized_query, deadline=Deadline(self.request_timeout))
+            return self._complete_response(query, response_id, pipeline, time.time() - start_time)
             
-            # Create response (simplified for now - will be enhanced with proper Summary/Reflection objects)
-            response = QueryResponse(
+        except AdmissionRejected as e:
+            return QueryResponse(
                 response_id=response_id,
                 query=query,
-                status=QueryStatus.COMPLETED.value,
+                status=QueryStatus.REJECTED.value,
+                error_message=f"The system is busy, please try again shortly. ({e})",
                 execution_time=time.time() - start_time
             )
-            
-            # Extract text from CrewAI result object
-            if hasattr(result, 'raw'):
-                # CrewAI result object
-                result_text = str(result.raw)
-            elif hasattr(result, 'output'):
-                result_text = str(result.output)
-            elif isinstance(result, str):
-                result_text = result
-            else:
-                result_text = str(result)
-            
-            # Store result as string for now (will be structured later)
-            response.agent_logs = [result_text]
-            
-            return response
-            
         except Exception as e:
             return QueryResponse(
                 response_id=response_id,
@@ -120,6 +169,181 @@ class SystemController:
                 execution_time=time.time() - start_time
             )
     
+    def handle_batch(self, queries: List[str], session_id: Optional[str] = None,
+                     concurrency: int = 4) -> List[QueryResponse]:
+        """
+        Handle many queries at once.
+        
+        All inputs are validated in one pass, identical sanitized queries are
+        processed once, retrieval runs as a single embedding batch and the
+        LLM stages run on at most `concurrency` queries at a time.
+        
+        Args:
+            queries: The user query texts
+            session_id: Optional session ID for tracking (one is created if omitted)
+            concurrency: Maximum number of queries in the LLM stages at once
+            
+        Returns:
+            One QueryResponse per input query, in input order
+        """
+        with get_tracer().span("batch", queries=len(queries)):
+            responses = self._handle_batch(queries, session_id, concurrency)
+        for response in responses:
+            QUERIES.inc(status=response.status)
+        return responses
+    
+    def _handle_batch(self, queries: List[str], session_id: Optional[str],
+                      concurrency: int) -> List[QueryResponse]:
+        """Handle many queries inside their root tracing span (see handle_batch)."""
+        if not session_id:
+            session_id = self.session_manager.create_session()
+        
+        # Validate and sanitize every input up front
+        entries = []
+        with get_tracer().span("validation", queries=len(queries)):
+            for query_text, sanitized_query in zip(queries, self.validator.validate_batch(queries)):
+                query_id = str(uuid.uuid4())
+                if sanitized_query is None:
+                    entries.append((Query(query_id=query_id, text=query_text, session_id=session_id), None))
+                    continue
+                query = Query(query_id=query_id, text=sanitized_query, session_id=session_id)
+                self.session_manager.update_session(session_id, query=query)
+                entries.append((query, sanitized_query))
+        
+        unique_queries = list(dict.fromkeys(s for _, s in entries if s is not None))
+        results: Dict[str, Tuple[Optional[Dict[str, Any]], Optional[Exception], float]] = {}
+        
+        if unique_queries:
+            # One embedding batch, reused for intent matching
+            search_start = time.time()
+            retrieved, query_vectors = SearchAgent().retrieve_batch(unique_queries)
+            if query_vectors is not None:
+                cache_embeddings(unique_queries, query_vectors)
+            else:
+                embed_texts(unique_queries)
+            # Shared batch search time, attributed evenly to each distinct query
+            search_seconds = (time.time() - search_start) / len(unique_queries)
+            
+            def run(query_text: str, query_retrieved: Tuple[str, List[float]]):
+                start_time = time.time()
+                try:
+                    pipeline = dict(self._run_coalesced(query_text, retrieved=query_retrieved))
+                    pipeline["timings"] = {**pipeline.get("timings", {}), "search": search_seconds}
+                    return pipeline, None, time.time() - start_time + search_seconds
+                except Exception as e:
+                    return None, e, time.time() - start_time
+            
+            with ThreadPoolExecutor(max_workers=max(1, concurrency),
+                                    thread_name_prefix="batch-query") as pool:
+                # Copy the context per query so pipeline spans nest under the batch span
+                futures = [pool.submit(copy_context().run, run, q, r)
+                           for q, r in zip(unique_queries, retrieved)]
+                for query_text, future in zip(unique_queries, futures):
+                    results[query_text] = future.result()
+        
+        responses = []
+        for query, sanitized_query in entries:
+            response_id = str(uuid.uuid4())
+            if sanitized_query is None:
+                responses.append(QueryResponse(
+                    response_id=response_id,
+                    query=query,
+                    status=QueryStatus.FAILED.value,
+                    error_message="Invalid query. Please check length and content.",
+                ))
+                continue
+            
+            pipeline, error, execution_time = results[sanitized_query]
+            if error is not None:
+                responses.append(QueryResponse(
+                    response_id=response_id,
+                    query=query,
+                    status=QueryStatus.FAILED.value,
+                    error_message=f"Error processing query: {str(error)}",
+                    execution_time=execution_time
+                ))
+            else:
+                responses.append(self._complete_response(query, response_id, pipeline, execution_time))
+        
+        return responses
+    
+    def _run_coalesced(self, sanitized_query: str,
+                       retrieved: Optional[Tuple[str, List[float]]] = None,
+                       deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Run the pipeline, sharing the result with identical queries already in flight.
+        
+        Args:
+            sanitized_query: Sanitized query text
+            retrieved: Pre-retrieved (search results, scores), e.g. from a batch search
+            deadline: Admit the run through admission control under this deadline;
+                None runs it directly (used by batch processing)
+            
+        Returns:
+            Pipeline result (see app.run_pipeline)
+            
+        Raises:
+            AdmissionRejected: If the system is saturated
+        """
+        def run() -> Dict[str, Any]:
+            return run_pipeline(sanitized_query, reflect=self.reflection_worker is None,
+                                retrieved=retrieved)
+        
+        def admit_and_run() -> Dict[str, Any]:
+            # Only the caller that actually runs the pipeline takes a slot;
+            # coalesced duplicates share its outcome, including a rejection
+            with self.admission.slot(deadline), deadline_scope(deadline):
+                return run()
+        
+        pipeline, _ = self.single_flight.do(
+            normalize_query(sanitized_query),
+            run if deadline is None else admit_and_run
+        )
+        return pipeline
+    
+    def _complete_response(self, query: Query, response_id: str, pipeline: Dict[str, Any],
+                           execution_time: float) -> QueryResponse:
+        """Build the response for a finished pipeline and queue its reflection."""
+        result = pipeline["output"]
+        
+        # Create response (simplified for now - will be enhanced with proper Summary/Reflection objects)
+        response = QueryResponse(
+            response_id=response_id,
+            query=query,
+            status=QueryStatus.COMPLETED.value,
+            execution_time=execution_time,
+            stage_timings=dict(pipeline.get("timings", {}))
+        )
+        
+        # Extract text from CrewAI result object
+        if hasattr(result, 'raw'):
+            # CrewAI result object
+            result_text = str(result.raw)
+        elif hasattr(result, 'output'):
+            result_text = str(result.output)
+        elif isinstance(result, str):
+            result_text = result
+        else:
+            result_text = str(result)
+        
+        # Store result as string for now (will be structured later)
+        response.agent_logs = [result_text]
+        
+        if self.reflection_worker and pipeline["summary"]:
+            queued = self.reflection_worker.submit(
+                query.session_id, query.query_id, pipeline["summary"],
+                sources=split_chunks(pipeline["retrieved"]),
+                evaluator=partial(self._evaluate_reflection,
+                                  query_class=pipeline.get("query_class", "general"))
+            )
+            if not queued:
+                self.session_manager.attach_reflection(
+                    query.session_id, query.query_id,
+                    "Reflection skipped: the reflection queue is full."
+                )
+        
+        return response
+    
     def handle_feedback(self, summary_id: str, rating: int, comments: str = "", 
                        improvement_requested: bool = False, 
                        session_id: Optional[str] = None) -> QueryResponse:
@@ -185,17 +409,69 @@ class SystemController:
         
         return response
     
-    def get_session_state(self, session_id: str) -> Optional[dict]:
+    def get_session_state(self, session_id: str, offset: int = 0,
+                          limit: Optional[int] = None) -> Optional[dict]:
         """
         Get the current state of a session.
         
         Args:
             session_id: Session ID to retrieve
+            offset: Number of most recent history entries to skip
+            limit: History page size (None for the in-memory window)
             
         Returns:
             Session history dict or None if not found
         """
-        return self.session_manager.get_session_history(session_id)
+        return self.session_manager.get_session_history(session_id, offset, limit)
+    
+    def get_reflection(self, session_id: str, query_id: str) -> Optional[str]:
+        """
+        Get the background reflection report for a query.
+        
+        Args:
+            session_id: Session the query belongs to
+            query_id: Query to look up
+            
+        Returns:
+            Reflection report text, or None while it is still pending
+        """
+        return self.session_manager.get_reflection(session_id, query_id)
+    
+    def get_admission_stats(self) -> Dict[str, int]:
+        """
+        Get current load and how many queries were admitted or rejected.
+        
+        Returns:
+            Running/waiting counts plus admitted, rejected and timed_out totals
+        """
+        return self.admission.stats()
+    
+    def get_latency_histograms(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get latency percentiles for every traced stage.
+        
+        Returns:
+            Histogram summary (count, min, mean, p50, p90, p99, p999, max in
+            seconds) per span name, e.g. "query", "search", "llm.call"
+        """
+        return get_tracer().stats()
+    
+    def get_gating_stats(self) -> List[Dict[str, Any]]:
+        """
+        Get how often each pipeline stage was skipped and the latency saved.
+        
+        Returns:
+            One row per query class and stage (see QualityGate.stats)
+        """
+        return get_quality_gate().stats()
+    
+    def _evaluate_reflection(self, summary_text: str, sources: Optional[List[str]],
+                             query_class: str = "general") -> str:
+        """Background evaluator: gated reflection, with any revised summary appended."""
+        report, revised = reflect_summary(summary_text, sources or [], query_class)
+        if revised:
+            report += f"\n=== REVISED SUMMARY ===\n{revised}"
+        return report
     
     def cleanup_sessions(self) -> int:
         """
@@ -205,3 +481,56 @@ class SystemController:
             Number of sessions cleaned up
         """
         return self.session_manager.cleanup_expired()
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background reflection worker once its queued work is done.
+        
+        Args:
+            timeout: Maximum seconds to wait for pending reflections
+        """
+        if self._finalizer and self._finalizer.detach():
+            self.reflection_worker.stop(timeout)
+
+
+# Controllers reported by the metrics endpoint (the UI creates one per browser session)
+_live_controllers: "weakref.WeakSet[SystemController]" = weakref.WeakSet()
+
+
+def _sum_over_controllers(read) -> float:
+    return sum(read(controller) for controller in list(_live_controllers))
+
+
+def _llm_cache_lookups() -> Dict[Tuple[str, ...], float]:
+    cache = get_llm_cache()
+    if cache is None:
+        return {}
+    stats = cache.stats()
+    return {("hit",): stats["hits"], ("miss",): stats["misses"]}
+
+
+def _llm_cache_disk_errors() -> float:
+    cache = get_llm_cache()
+    return cache.stats()["disk_errors"] if cache is not None else 0
+
+
+REGISTRY.register(CallbackMetric(
+    "health_active_sessions", "Sessions that have not expired",
+    lambda: _sum_over_controllers(lambda c: c.session_manager.get_active_session_count())))
+REGISTRY.register(CallbackMetric(
+    "health_queries_in_flight", "Queries running the pipeline or waiting for a slot",
+    lambda: {
+        ("running",): _sum_over_controllers(lambda c: c.admission.stats()["running"]),
+        ("waiting",): _sum_over_controllers(lambda c: c.admission.stats()["waiting"]),
+    },
+    labelnames=["state"]))
+REGISTRY.register(CallbackMetric(
+    "health_reflection_queue_depth", "Background reflections waiting to run",
+    lambda: _sum_over_controllers(
+        lambda c: c.reflection_worker.pending_count() if c.reflection_worker else 0)))
+REGISTRY.register(CallbackMetric(
+    "health_llm_cache_lookups_total", "LLM response cache lookups, by result",
+    _llm_cache_lookups, labelnames=["result"], metric_type="counter"))
+REGISTRY.register(CallbackMetric(
+    "health_llm_cache_disk_errors_total", "LLM cache disk reads and writes skipped after SQLite errors",
+    _llm_cache_disk_errors, metric_type="counter"))
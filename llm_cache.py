@@ -0,0 +1,309 @@
+"""
+LLM Response Cache
+
+Two-tier cache for LLM calls keyed by (provider, model, prompt hash):
+an in-memory LRU in front of an optional SQLite file so cached responses
+survive restarts. Entries expire after a TTL and both tiers are size-capped.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from tracing import add_span_attributes
+
+
+class LLMCache:
+    """In-memory LRU cache with an optional SQLite-backed second tier."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400,
+                 db_path: Optional[str] = None, max_disk_entries: int = 10000,
+                 busy_timeout: float = 5.0):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of responses kept in memory
+            ttl_seconds: Time-to-live for cached responses (0 disables expiry)
+            db_path: SQLite file for the persistent tier (None for memory only)
+            max_disk_entries: Maximum number of responses kept on disk
+            busy_timeout: Seconds to wait for another process's lock on the
+                SQLite file before the disk tier is skipped for that call
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Guards the SQLite tier separately so disk I/O never blocks memory hits
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes_since_prune = 0
+        self.metrics = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "disk_errors": 0,
+        }
+
+        if db_path:
+            # Shared by batch worker processes: WAL lets readers proceed during writes
+            self._db = sqlite3.connect(db_path, timeout=busy_timeout, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str) -> str:
+        """
+        Build a cache key from the provider, model and prompt.
+
+        Args:
+            provider: LLM provider name (e.g. "ollama")
+            model: Model name
+            prompt: Full prompt text
+
+        Returns:
+            Hex digest identifying the request
+        """
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{provider}:{model}:{digest}"
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            Cached response text, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at and expires_at < now:
+                    del self._memory[key]
+                else:
+                    self._memory.move_to_end(key)
+                    self.metrics["memory_hits"] += 1
+                    return value
+
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None and row[1] and row[1] < now:
+                        row = None
+                        self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                        self._db.commit()
+            except sqlite3.Error as e:
+                # A locked or unreadable disk tier counts as a miss
+                self._disk_error("read", e)
+                row = None
+            if row is not None:
+                value, expires_at = row
+                with self._lock:
+                    self._remember(key, expires_at, value)
+                    self.metrics["disk_hits"] += 1
+                return value
+
+        with self._lock:
+            self.metrics["misses"] += 1
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a response in both tiers.
+
+        Args:
+            key: Cache key from make_key
+            value: Response text
+        """
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else 0.0
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.metrics["writes"] += 1
+
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, value, created_at, expires_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, value, now, expires_at)
+                    )
+                    self._db.commit()
+                    self._writes_since_prune += 1
+                    if self._writes_since_prune >= 100:
+                        self._prune_disk(now)
+            except sqlite3.Error as e:
+                # The response is still cached in memory; only the disk copy is skipped
+                self._disk_error("write", e)
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache hit-rate metrics.
+
+        Returns:
+            Dictionary of counters, current size and overall hit rate
+        """
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.metrics)
+            stats["memory_size"] = len(self._memory)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hits"] = hits
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
+
+    def _disk_error(self, operation: str, error: sqlite3.Error) -> None:
+        """Count a failed disk-tier operation and undo its partial transaction."""
+        with self._db_lock:
+            try:
+                self._db.rollback()
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            self.metrics["disk_errors"] += 1
+        print(f"⚠️  LLM disk cache {operation} skipped: {error}")
+
+    def _remember(self, key: str, expires_at: float, value: str) -> None:
+        """Insert into the memory tier, evicting the least recently used entries."""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.metrics["evictions"] += 1
+
+    def _prune_disk(self, now: float) -> None:
+        """Drop expired rows and the oldest rows beyond the disk size cap (disk lock held)."""
+        self._writes_since_prune = 0
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE expires_at > 0 AND expires_at < ?", (now,)
+        )
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+        self._db.commit()
+
+
+class CachedLLM:
+    """Wraps an LLM object (call/predict interface) with an LLMCache."""
+
+    def __init__(self, llm: Any, cache: LLMCache, provider: Optional[str] = None,
+                 model: Optional[str] = None):
+        """
+        Initialize the cached LLM.
+
+        Args:
+            llm: Underlying LLM (CrewAI LLM, OllamaWrapper, ...)
+            cache: Cache to read from and write to
+            provider: Provider name for the cache key (inferred if omitted)
+            model: Model name for the cache key (inferred if omitted)
+        """
+        self.llm = llm
+        self.cache = cache
+        inferred_provider, inferred_model = _describe_llm(llm)
+        self.provider = provider or inferred_provider
+        self.model = model or inferred_model
+
+    def call(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Chat-style call, served from the cache when possible.
+
+        Args:
+            messages: List of {"role", "content"} messages
+
+        Returns:
+            Response text
+        """
+        prompt = json.dumps(messages, sort_keys=True, ensure_ascii=False)
+        return self._cached(prompt, lambda: self._invoke_call(messages))
+
+    def predict(self, prompt: str) -> str:
+        """
+        Single-prompt call, served from the cache when possible.
+
+        Args:
+            prompt: Prompt text
+
+        Returns:
+            Response text
+        """
+        # Keyed like the equivalent one-message chat call so both entry points share entries
+        key_prompt = json.dumps([{"role": "user", "content": prompt}], sort_keys=True,
+                                ensure_ascii=False)
+        return self._cached(key_prompt, lambda: self._invoke_predict(prompt))
+
+    def _cached(self, prompt: str, compute) -> str:
+        key = LLMCache.make_key(self.provider, self.model, prompt)
+        cached = self.cache.get(key)
+        add_span_attributes(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+
+        response = str(compute())
+        # Wrappers such as OllamaWrapper report failures as text; never cache those
+        if not response.startswith("Error"):
+            self.cache.set(key, response)
+        return response
+
+    def _invoke_call(self, messages: List[Dict[str, str]]) -> str:
+        if hasattr(self.llm, 'call'):
+            return self.llm.call(messages)
+        return self.llm.predict("\n\n".join(m.get("content", "") for m in messages))
+
+    def _invoke_predict(self, prompt: str) -> str:
+        if hasattr(self.llm, 'predict'):
+            return self.llm.predict(prompt)
+        return self.llm.call([{"role": "user", "content": prompt}])
+
+    def __repr__(self) -> str:
+        return f"CachedLLM(provider={self.provider}, model={self.model})"
+
+
+def _describe_llm(llm: Any) -> Tuple[str, str]:
+    """Infer (provider, model) from an LLM object such as CrewAI's LLM("ollama/llama3.2")."""
+    model = str(getattr(llm, 'model', '') or type(llm).__name__)
+    provider = getattr(llm, 'provider', None)
+    if provider == "router":
+        # Already a list of provider-qualified backends ("ollama/a,mistral/b")
+        return provider, model
+    if "/" in model:
+        prefix, model = model.split("/", 1)
+        provider = provider or prefix
+    if not provider:
+        provider = "ollama" if type(llm).__name__ == "OllamaWrapper" else type(llm).__name__.lower()
+    return str(provider), model
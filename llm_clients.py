@@ -0,0 +1,297 @@
+"""
+LLM Provider Clients
+
+Shared HTTP clients for Ollama, Mistral AI and OpenAI. Each base URL gets
+one persistent keep-alive connection pool that is reused by every agent
+and request in the process, instead of opening a new TCP (and TLS)
+connection per call.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import http.client
+import json
+import queue
+import threading
+
+
+class LLMClientError(RuntimeError):
+    """Raised when a provider request fails."""
+
+
+class ConnectionPool:
+    """Pool of keep-alive HTTP connections to a single host."""
+
+    def __init__(self, base_url: str, max_size: int = 4, timeout: float = 60.0,
+                 acquire_timeout: Optional[float] = None):
+        """
+        Initialize the connection pool.
+
+        Args:
+            base_url: Scheme, host, port and optional path prefix (e.g. http://localhost:11434)
+            max_size: Maximum number of open connections
+            timeout: Socket timeout in seconds for connect and read
+            acquire_timeout: Seconds to wait for a free connection (None waits forever)
+        """
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port
+        self.path_prefix = parts.path.rstrip("/")
+        self.max_size = max_size
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self.metrics = {"requests": 0, "connections_created": 0, "connections_reused": 0}
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        """
+        Send a request over a pooled connection.
+
+        Args:
+            method: HTTP method
+            path: Path relative to the pool's base URL
+            body: Request body
+            headers: Extra request headers
+
+        Returns:
+            Tuple of (status code, response body)
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise LLMClientError(f"Timed out waiting for a connection to {self.host}")
+
+        try:
+            request_headers = {"Connection": "keep-alive"}
+            request_headers.update(headers or {})
+            conn, reused = self._checkout()
+            try:
+                return self._send(conn, method, path, body, request_headers)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server may have closed an idle keep-alive connection; retry once fresh
+                conn.close()
+                if not reused:
+                    raise
+                conn, _ = self._checkout(fresh=True)
+                return self._send(conn, method, path, body, request_headers)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self) -> Dict[str, int]:
+        """Get request and connection churn counters."""
+        with self._lock:
+            stats = dict(self.metrics)
+        stats["idle_connections"] = self._idle.qsize()
+        return stats
+
+    def _checkout(self, fresh: bool = False) -> Tuple[http.client.HTTPConnection, bool]:
+        """Take an idle connection or open a new one. Returns (connection, reused)."""
+        if not fresh:
+            try:
+                conn = self._idle.get_nowait()
+                with self._lock:
+                    self.metrics["connections_reused"] += 1
+                return conn, True
+            except queue.Empty:
+                pass
+
+        conn_class = (http.client.HTTPSConnection if self.scheme == "https"
+                      else http.client.HTTPConnection)
+        conn = conn_class(self.host, self.port, timeout=self.timeout)
+        with self._lock:
+            self.metrics["connections_created"] += 1
+        return conn, False
+
+    def _send(self, conn: http.client.HTTPConnection, method: str, path: str,
+              body: Optional[bytes], headers: Dict[str, str]) -> Tuple[int, bytes]:
+        try:
+            conn.request(method, self.path_prefix + path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except Exception:
+            conn.close()
+            raise
+
+        with self._lock:
+            self.metrics["requests"] += 1
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._idle.put(conn)
+        return response.status, data
+
+
+class ProviderClient(ABC):
+    """Base chat client over a shared connection pool."""
+
+    provider = ""
+    default_base_url = ""
+
+    def __init__(self, model: str, pool: ConnectionPool, api_key: Optional[str] = None):
+        """
+        Initialize the provider client.
+
+        Args:
+            model: Model name sent with each request
+            pool: Connection pool for the provider's base URL
+            api_key: API key, if the provider requires one
+        """
+        self.model = model
+        self.pool = pool
+        self.api_key = api_key
+
+    @abstractmethod
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Send a chat request and return the response text.
+
+        Args:
+            messages: List of {"role", "content"} messages
+
+        Returns:
+            Response text
+        """
+
+    def call(self, messages: List[Dict[str, str]]) -> str:
+        """CrewAI-style call interface used by the agents."""
+        return self.chat(messages)
+
+    def predict(self, prompt: str) -> str:
+        """Single-prompt interface used by the agents."""
+        return self.chat([{"role": "user", "content": prompt}])
+
+    def _post_json(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        status, data = self.pool.request("POST", path, json.dumps(payload).encode("utf-8"), headers)
+        if status >= 400:
+            raise LLMClientError(
+                f"{self.provider} request failed ({status}): {data[:200].decode('utf-8', 'replace')}"
+            )
+        return json.loads(data)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(model={self.model}, host={self.pool.host})"
+
+
+class OllamaClient(ProviderClient):
+    """Client for a local Ollama server."""
+
+    provider = "ollama"
+    default_base_url = "http://localhost:11434"
+
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        data = self._post_json("/api/chat", {
+            "model": self.model,
+            "messages": messages,
+            "stream": False
+        })
+        return data["message"]["content"]
+
+
+class OpenAIClient(ProviderClient):
+    """Client for the OpenAI chat completions API."""
+
+    provider = "openai"
+    default_base_url = "https://api.openai.com/v1"
+
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        data = self._post_json("/chat/completions", {
+            "model": self.model,
+            "messages": messages
+        })
+        return data["choices"][0]["message"]["content"]
+
+
+class MistralClient(OpenAIClient):
+    """Client for the Mistral AI chat completions API (OpenAI-compatible)."""
+
+    provider = "mistral"
+    default_base_url = "https://api.mistral.ai/v1"
+
+
+CLIENT_CLASSES = {
+    "ollama": OllamaClient,
+    "mistral": MistralClient,
+    "openai": OpenAIClient,
+}
+
+_pools: Dict[str, ConnectionPool] = {}
+_clients: Dict[Tuple[str, str, str, str], ProviderClient] = {}
+_registry_lock = threading.Lock()
+
+
+def get_connection_pool(base_url: str, pool_size: int = 4, timeout: float = 60.0) -> ConnectionPool:
+    """
+    Get the shared connection pool for a base URL, creating it on first use.
+
+    Args:
+        base_url: Provider base URL
+        pool_size: Maximum connections (only used when the pool is created)
+        timeout: Socket timeout (only used when the pool is created)
+
+    Returns:
+        Shared ConnectionPool
+    """
+    with _registry_lock:
+        pool = _pools.get(base_url)
+        if pool is None:
+            pool = ConnectionPool(base_url, max_size=pool_size, timeout=timeout)
+            _pools[base_url] = pool
+        return pool
+
+
+def get_provider_client(provider: str, model: str, base_url: Optional[str] = None,
+                        api_key: Optional[str] = None, pool_size: int = 4,
+                        timeout: float = 60.0) -> ProviderClient:
+    """
+    Get the shared client for a provider/model.
+
+    Args:
+        provider: "ollama", "mistral" or "openai"
+        model: Model name
+        base_url: Override for the provider's default base URL
+        api_key: API key, if required
+        pool_size: Maximum connections per base URL
+        timeout: Socket timeout in seconds
+
+    Returns:
+        ProviderClient reusing the base URL's connection pool
+    """
+    client_class = CLIENT_CLASSES.get(provider)
+    if client_class is None:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+
+    base_url = (base_url or client_class.default_base_url).rstrip("/")
+    key = (provider, model, base_url, api_key or "")
+    with _registry_lock:
+        client = _clients.get(key)
+    if client is not None:
+        return client
+
+    pool = get_connection_pool(base_url, pool_size=pool_size, timeout=timeout)
+    client = client_class(model, pool, api_key=api_key)
+    with _registry_lock:
+        return _clients.setdefault(key, client)
+
+
+def close_all_pools() -> None:
+    """Close idle connections in every shared pool."""
+    with _registry_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
@@ -1,31 +1,107 @@
 """LLM Configuration for Multi-Provider Support (Mistral AI or OpenAI)"""
 import os
-from dotenv import load_dotenv
+import threading
 
-# Force reload environment variables
-load_dotenv(override=True)
+from llm_cache import LLMCache, CachedLLM
+from llm_clients import get_provider_client
+from rate_limiter import RateLimitedLLM, get_rate_limiter
+from llm_router import LatencyRouter
+from tracing import TracedLLM
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
+def load_environment():
+    """
+    Load .env into the process environment, once per process.
+    
+    Runs before configuration is first read rather than at import time, so
+    modules that never configure an LLM do not pay for it. Values in .env
+    override variables already set.
+    """
+    global _env_loaded
+    with _env_lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+            
+            load_dotenv(override=True)
+            _env_loaded = True
 
 class OllamaWrapper:
     """Simple wrapper for Ollama when CrewAI is not available."""
     def __init__(self, model, base_url=None):
         self.model = model
         self.base_url = base_url
-        try:
-            import ollama
-            self.client = ollama.Client(host=base_url) if base_url else ollama
-        except ImportError:
-            self.client = None
-            print("⚠️  'ollama' package not found. Please install it with `pip install ollama`.")
+        self.client = get_provider_client(
+            "ollama", model, base_url=base_url,
+            pool_size=_pool_size(), timeout=_request_timeout()
+        )
 
     def predict(self, prompt):
-        if not self.client:
-            return "Error: Ollama client not available."
         try:
-            response = self.client.chat(model=self.model, messages=[{'role': 'user', 'content': prompt}])
-            return response['message']['content']
+            return self.client.predict(prompt)
         except Exception as e:
             return f"Error calling Ollama: {str(e)}"
 
+def _valid_key(key, placeholder_prefixes):
+    """Check that an API key looks real (not empty or a placeholder)."""
+    return bool(key) and len(key) > 20 and not any(key.startswith(p) for p in placeholder_prefixes)
+
+def _pool_size():
+    return int(os.getenv('LLM_POOL_SIZE', '4'))
+
+def _request_timeout():
+    return float(os.getenv('LLM_TIMEOUT', '60'))
+
+def get_all_provider_settings():
+    """
+    Resolve every configured LLM provider from the environment.
+    
+    Returns:
+        List of dicts with provider, model, base_url and api_key, in priority
+        order: Ollama (if USE_OLLAMA), then Mistral, then OpenAI
+    """
+    load_environment()
+    providers = []
+    
+    if os.getenv('USE_OLLAMA', 'false').lower() == 'true':
+        providers.append({
+            "provider": "ollama",
+            "model": os.getenv('OLLAMA_MODEL', 'llama3.2'),
+            "base_url": os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'),
+            "api_key": None,
+        })
+    
+    mistral_key = os.getenv('MISTRAL_API_KEY', '').strip()
+    if _valid_key(mistral_key, ['your-mistral-api-key-here']):
+        providers.append({
+            "provider": "mistral",
+            "model": os.getenv('MISTRAL_MODEL', 'mistral-small-latest'),
+            "base_url": os.getenv('MISTRAL_BASE_URL') or None,
+            "api_key": mistral_key,
+        })
+    
+    openai_key = os.getenv('OPENAI_API_KEY', '').strip()
+    if _valid_key(openai_key, ['YOUR']):
+        providers.append({
+            "provider": "openai",
+            "model": os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+            "base_url": os.getenv('OPENAI_BASE_URL') or None,
+            "api_key": openai_key,
+        })
+    
+    return providers
+
+def get_provider_settings():
+    """
+    Resolve the highest-priority LLM provider from the environment.
+    
+    Returns:
+        Dict with provider, model, base_url and api_key, or None if nothing is configured
+    """
+    providers = get_all_provider_settings()
+    return providers[0] if providers else None
+
 def get_llm_config():
     """
     Get LLM configuration based on available API keys.
@@ -34,73 +110,156 @@ def get_llm_config():
     Returns:
         CrewAI LLM object or default model string
     """
-    # Check for Ollama (Local LLM) - Prioritize this if configured
-    ollama_model = os.getenv('OLLAMA_MODEL', 'llama3.2')
-    use_ollama = os.getenv('USE_OLLAMA', 'false').lower() == 'true'
+    settings = get_provider_settings()
     
-    if use_ollama:
+    # Check for Ollama (Local LLM) - Prioritize this if configured
+    if settings and settings["provider"] == "ollama":
+        ollama_model = settings["model"]
         print(f"✓ Using Local Ollama: {ollama_model}")
         try:
             from crewai import LLM
             llm = LLM(
                 model=f"ollama/{ollama_model}",
-                base_url=os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+                base_url=settings["base_url"]
             )
             print(f"   ✓ Using CrewAI LLM wrapper for agent orchestration")
             return llm
         except ImportError:
             # Fallback to custom wrapper if CrewAI is missing
             print("   ⚠️  CrewAI not found, using direct Ollama connection")
-            return OllamaWrapper(
-                model=ollama_model,
-                base_url=os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
-            )
+            return OllamaWrapper(model=ollama_model, base_url=settings["base_url"])
         except Exception as e:
             print(f"   ⚠️  CrewAI LLM initialization failed: {e}")
             print("   Falling back to direct Ollama connection")
-            return OllamaWrapper(
-                model=ollama_model,
-                base_url=os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
-            )
+            return OllamaWrapper(model=ollama_model, base_url=settings["base_url"])
 
     try:
         from crewai import LLM
     except ImportError:
         return "gpt-4o-mini"
     
-    # Check for Mistral API key first
-    mistral_key = os.getenv('MISTRAL_API_KEY', '').strip()
-    print(f"Debug: Mistral key starts with: {mistral_key[:10]}..." if mistral_key else "Debug: No Mistral key")
+    if settings is None:
+        # No valid API key found - return None to skip CrewAI agents
+        print("⚠️  No valid API key found. Using pure Python fallback mode (no LLM).")
+        print("   Get Mistral key (recommended): https://console.mistral.ai/api-keys/")
+        print("   Get OpenAI key: https://platform.openai.com/account/api-keys")
+        return None
     
-    if mistral_key and len(mistral_key) > 20 and mistral_key not in ['your-mistral-api-key-here']:
-        model = os.getenv('MISTRAL_MODEL', 'mistral-small-latest')
-        print(f"✓ Using Mistral AI: {model}")
-        try:
-            return LLM(
-                model=f"mistral/{model}",
-                api_key=mistral_key
-            )
-        except Exception as e:
-            print(f"⚠️  Mistral LLM initialization failed: {e}")
+    label = "Mistral AI" if settings["provider"] == "mistral" else "OpenAI"
+    print(f"✓ Using {label}: {settings['model']}")
+    try:
+        return LLM(
+            model=f"{settings['provider']}/{settings['model']}",
+            api_key=settings["api_key"]
+        )
+    except Exception as e:
+        print(f"⚠️  {label} LLM initialization failed: {e}")
+        if settings["provider"] == "mistral":
             print(f"   Falling back to pure Python mode")
-            return None
+        return None
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """
+    Get the process-wide LLM response cache configured from the environment.
     
-    # Fallback to OpenAI
-    openai_key = os.getenv('OPENAI_API_KEY', '').strip()
-    if openai_key and len(openai_key) > 20 and not openai_key.startswith('YOUR'):
-        model = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
-        print(f"✓ Using OpenAI: {model}")
+    Environment:
+        LLM_CACHE_ENABLED: 'false' disables caching (default: true)
+        LLM_CACHE_SIZE: In-memory LRU capacity (default: 1024)
+        LLM_CACHE_TTL: Entry time-to-live in seconds (default: 86400)
+        LLM_CACHE_PATH: SQLite file for the persistent tier; empty for memory only
+        LLM_CACHE_DISK_SIZE: Maximum entries kept on disk (default: 10000)
+    
+    Returns:
+        LLMCache instance or None if caching is disabled
+    """
+    global _llm_cache
+    load_environment()
+    if os.getenv('LLM_CACHE_ENABLED', 'true').lower() != 'true':
+        return None
+    
+    if _llm_cache is not None:
+        return _llm_cache
+    
+    with _llm_cache_lock:
+        if _llm_cache is not None:
+            return _llm_cache
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kb", "llm_cache.sqlite3")
+        db_path = os.getenv('LLM_CACHE_PATH', default_path).strip() or None
         try:
-            return LLM(
-                model=f"openai/{model}",
-                api_key=openai_key
+            _llm_cache = LLMCache(
+                max_entries=int(os.getenv('LLM_CACHE_SIZE', '1024')),
+                ttl_seconds=float(os.getenv('LLM_CACHE_TTL', '86400')),
+                db_path=db_path,
+                max_disk_entries=int(os.getenv('LLM_CACHE_DISK_SIZE', '10000'))
             )
         except Exception as e:
-            print(f"⚠️  OpenAI LLM initialization failed: {e}")
-            return None
-    
-    # No valid API key found - return None to skip CrewAI agents
-    print("⚠️  No valid API key found. Using pure Python fallback mode (no LLM).")
-    print("   Get Mistral key (recommended): https://console.mistral.ai/api-keys/")
-    print("   Get OpenAI key: https://platform.openai.com/account/api-keys")
-    return None
+            print(f"⚠️  LLM disk cache unavailable ({e}), using memory-only cache")
+            _llm_cache = LLMCache(
+                max_entries=int(os.getenv('LLM_CACHE_SIZE', '1024')),
+                ttl_seconds=float(os.getenv('LLM_CACHE_TTL', '86400'))
+            )
+    return _llm_cache
+
+def _build_backend(settings):
+    """Shared keep-alive client for one provider, throttled by its rate limiter."""
+    client = get_provider_client(
+        settings["provider"], settings["model"],
+        base_url=settings["base_url"], api_key=settings["api_key"],
+        pool_size=_pool_size(), timeout=_request_timeout()
+    )
+    return RateLimitedLLM(
+        client, get_rate_limiter(settings["provider"]),
+        max_wait=float(os.getenv('LLM_QUEUE_TIMEOUT', '30'))
+    )
+
+_llm_router = None
+_llm_router_lock = threading.Lock()
+
+def get_agent_llm():
+    """
+    Get the LLM used by agent classes for their direct calls.
+    
+    Uses the same provider priority as get_llm_config(), but talks to the
+    provider through the shared keep-alive client (see llm_clients) so TCP
+    connections are reused across agents and requests. Calls are throttled
+    by the provider's process-wide rate limiter (see rate_limiter) and
+    responses are cached when caching is enabled. With LLM_ROUTING=true and
+    several providers configured, calls go through a shared LatencyRouter
+    (see llm_router) instead of the highest-priority provider only. Every
+    call is recorded as an "llm.call" tracing span (see tracing).
+    CrewAI agents keep using get_llm_config().
+    
+    Environment:
+        LLM_POOL_SIZE: Maximum open connections per provider host (default: 4)
+        LLM_TIMEOUT: Socket timeout in seconds (default: 60)
+        LLM_QUEUE_TIMEOUT: Maximum seconds a call waits for rate-limit capacity (default: 30)
+        LLM_ROUTING: 'true' routes across all configured providers (default: false)
+        LLM_HEDGE_AFTER: Seconds before a hedged duplicate request is sent (unset disables)
+    
+    Returns:
+        LLM object with call/predict, or None if no provider is configured
+    """
+    global _llm_router
+    providers = get_all_provider_settings()
+    if not providers:
+        return None
+    
+    if os.getenv('LLM_ROUTING', 'false').lower() == 'true' and len(providers) > 1:
+        if _llm_router is None:
+            with _llm_router_lock:
+                # Concurrent first requests must share one router and its latency stats
+                if _llm_router is None:
+                    hedge_after = os.getenv('LLM_HEDGE_AFTER', '').strip()
+                    _llm_router = LatencyRouter(
+                        [_build_backend(settings) for settings in providers],
+                        hedge_after=float(hedge_after) if hedge_after else None
+                    )
+        llm = _llm_router
+    else:
+        llm = _build_backend(providers[0])
+    
+    cache = get_llm_cache()
+    return TracedLLM(CachedLLM(llm, cache) if cache else llm)
@@ -0,0 +1,219 @@
+"""
+LLM Router
+
+Routes each LLM call to the fastest healthy backend based on rolling
+latency percentiles and error rates, and can hedge slow calls by sending
+a duplicate request to the next-best backend after a latency threshold.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+import threading
+import time
+
+
+class BackendStats:
+    """Rolling latency and error statistics for one backend."""
+
+    def __init__(self, window: int = 50):
+        """
+        Initialize the stats window.
+
+        Args:
+            window: Number of recent calls to keep
+        """
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.last_failure = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Record the latency and outcome of one call."""
+        with self._lock:
+            self.samples.append((latency, ok))
+            if not ok:
+                self.last_failure = time.monotonic()
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """
+        Latency percentile over successful calls in the window.
+
+        Args:
+            pct: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds, or None without successful samples
+        """
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(pct / 100.0 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def error_rate(self) -> float:
+        """Fraction of failed calls in the window."""
+        with self._lock:
+            if not self.samples:
+                return 0.0
+            return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def count(self) -> int:
+        """Number of calls in the window."""
+        with self._lock:
+            return len(self.samples)
+
+
+class LatencyRouter:
+    """Sends calls to the fastest healthy backend, optionally hedging."""
+
+    provider = "router"
+
+    def __init__(self, backends: List[Any], window: int = 50, min_samples: int = 3,
+                 max_error_rate: float = 0.5, retry_unhealthy_after: float = 30.0,
+                 hedge_after: Optional[float] = None):
+        """
+        Initialize the router.
+
+        Args:
+            backends: LLM clients with call/predict, in fallback priority order
+            window: Calls kept per backend for latency/error statistics
+            min_samples: Calls needed before a backend is ranked by latency
+                (backends with fewer samples are tried first, in priority order)
+            max_error_rate: Error rate above which a backend is unhealthy
+            retry_unhealthy_after: Seconds after its last failure an unhealthy
+                backend is given traffic again
+            hedge_after: Seconds to wait before sending a duplicate request to
+                the next-best backend (None disables hedging)
+        """
+        if not backends:
+            raise ValueError("LatencyRouter needs at least one backend")
+
+        self.backends = backends
+        self.names: List[str] = []
+        for i, backend in enumerate(backends):
+            name = self._backend_name(backend)
+            self.names.append(name if name not in self.names else f"{name}#{i}")
+        self.model = ",".join(self.names)
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.retry_unhealthy_after = retry_unhealthy_after
+        self.hedge_after = hedge_after
+        self.stats_by_backend = {name: BackendStats(window) for name in self.names}
+        self.metrics = {"hedged": 0, "hedge_wins": 0}
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(2, 2 * len(backends)), thread_name_prefix="llm-router"
+        )
+
+    def call(self, messages: List[Dict[str, str]]) -> str:
+        return self._dispatch(lambda backend: backend.call(messages))
+
+    def predict(self, prompt: str) -> str:
+        return self._dispatch(lambda backend: backend.predict(prompt))
+
+    def ranked_backends(self) -> List[int]:
+        """
+        Order backends for the next call.
+
+        Returns:
+            Backend indexes: unmeasured first, then healthy ones by p50
+            latency, then unhealthy ones as a last resort
+        """
+        now = time.monotonic()
+        unmeasured, healthy, unhealthy = [], [], []
+
+        for i, name in enumerate(self.names):
+            stats = self.stats_by_backend[name]
+            p50 = stats.percentile(50)
+            # Checked first: a backend that only fails never gets a latency sample
+            if (stats.error_rate() > self.max_error_rate
+                    and now - stats.last_failure < self.retry_unhealthy_after):
+                unhealthy.append(i)
+            elif stats.count() < self.min_samples or p50 is None:
+                unmeasured.append(i)
+            else:
+                healthy.append((p50, i))
+
+        healthy.sort()
+        return unmeasured + [i for _, i in healthy] + unhealthy
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-backend latency and error statistics.
+
+        Returns:
+            Mapping of backend name to p50/p95 latency, error rate and sample count
+        """
+        report: Dict[str, Dict[str, Any]] = {}
+        for name, stats in self.stats_by_backend.items():
+            report[name] = {
+                "p50": stats.percentile(50),
+                "p95": stats.percentile(95),
+                "error_rate": stats.error_rate(),
+                "samples": stats.count(),
+            }
+        return report
+
+    def _dispatch(self, fn: Callable[[Any], str]) -> str:
+        order = self.ranked_backends()
+
+        if self.hedge_after is not None and len(order) > 1:
+            try:
+                return self._hedged(fn, order[0], order[1])
+            except Exception as e:
+                last_error: Exception = e
+            remaining = order[2:]
+        else:
+            last_error = RuntimeError("No LLM backend available")
+            remaining = order
+
+        for i in remaining:
+            try:
+                return self._timed(i, fn)
+            except Exception as e:
+                last_error = e
+        raise last_error
+
+    def _hedged(self, fn: Callable[[Any], str], primary: int, secondary: int) -> str:
+        """Run on the primary; if it is slower than hedge_after, race the secondary."""
+        # Each attempt runs in a copy of the caller's context so the request
+        # deadline and the active tracing span follow it to the worker thread
+        first = self._executor.submit(copy_context().run, self._timed, primary, fn)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done and first.exception() is None:
+            return first.result()
+
+        self.metrics["hedged"] += 1
+        hedge = self._executor.submit(copy_context().run, self._timed, secondary, fn)
+        pending = {first, hedge}
+        last_error: Optional[BaseException] = None
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.metrics["hedge_wins"] += 1
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
+
+    def _timed(self, index: int, fn: Callable[[Any], str]) -> str:
+        """Call one backend and record its latency and outcome."""
+        stats = self.stats_by_backend[self.names[index]]
+        start = time.monotonic()
+        try:
+            result = fn(self.backends[index])
+        except Exception:
+            stats.record(time.monotonic() - start, ok=False)
+            raise
+        stats.record(time.monotonic() - start, ok=True)
+        return result
+
+    @staticmethod
+    def _backend_name(backend: Any) -> str:
+        return f"{getattr(backend, 'provider', type(backend).__name__)}/{getattr(backend, 'model', '')}"
+
+    def __repr__(self) -> str:
+        return f"LatencyRouter(backends={self.names})"
@@ -0,0 +1,281 @@
+"""
+Metrics
+
+Process-wide metrics registry rendered in the Prometheus text format and
+served on a local HTTP scrape endpoint beside the Streamlit app.
+
+Counters are incremented on the request path without taking a lock: each
+thread adds to its own cell and a scrape sums the cells. Gauges and
+externally kept counters (cache statistics, queue depths, active sessions)
+are read through callbacks at scrape time, and the tracer's latency
+histograms are exported as Prometheus histograms.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import os
+import threading
+import weakref
+
+LabelValues = Tuple[str, ...]
+CallbackResult = Union[float, Dict[LabelValues, float]]
+
+# Upper bounds (seconds) of the exported latency histogram buckets
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+
+class _Cells:
+    """Per-thread accumulators: writers never contend, readers sum every cell."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._cells: List[Tuple[weakref.ref, List[float]]] = []
+        self._retired = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, amount: float) -> None:
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = self._register()
+        cell[0] += amount
+
+    def value(self) -> float:
+        with self._lock:
+            self._fold_dead_threads()
+            return self._retired + sum(cell[0] for _, cell in self._cells)
+
+    def _register(self) -> List[float]:
+        cell = [0.0]
+        self._local.cell = cell
+        with self._lock:
+            self._fold_dead_threads()
+            self._cells.append((weakref.ref(threading.current_thread()), cell))
+        return cell
+
+    def _fold_dead_threads(self) -> None:
+        """Merge cells of finished threads into one total (lock held)."""
+        live = []
+        for ref, cell in self._cells:
+            thread = ref()
+            if thread is None or not thread.is_alive():
+                self._retired += cell[0]
+            else:
+                live.append((ref, cell))
+        self._cells = live
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, _Cells] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        Increment the counter.
+
+        Args:
+            amount: Non-negative increment
+            **labels: One value per label name
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        cells = self._children.get(key)
+        if cells is None:
+            with self._lock:
+                cells = self._children.setdefault(key, _Cells())
+        cells.add(amount)
+
+    def value(self, **labels: str) -> float:
+        """Get the current value for one label set."""
+        cells = self._children.get(tuple(str(labels[name]) for name in self.labelnames))
+        return cells.value() if cells else 0.0
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, float]]:
+        with self._lock:
+            children = list(self._children.items())
+        for key, cells in children:
+            yield "", key, cells.value()
+
+
+class CallbackMetric:
+    """Gauge or counter whose value is read from a callback at scrape time."""
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], CallbackResult],
+                 labelnames: Sequence[str] = (), metric_type: str = "gauge"):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.type = metric_type
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, float]]:
+        result = self.fn()
+        if isinstance(result, dict):
+            for key, value in result.items():
+                yield "", key, value
+        else:
+            yield "", (), result
+
+
+class SpanHistograms:
+    """Exports the tracer's per-span latency histograms as one labelled histogram."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = ("span",)
+        self.bounds = list(bounds)
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, float]]:
+        # Imported here: tracing depends on rate_limiter, which reports errors here
+        from tracing import get_tracer
+
+        for span_name, histogram in get_tracer().histogram_items():
+            cumulative, count, total = histogram.cumulative(self.bounds)
+            for bound, seen in zip(self.bounds, cumulative):
+                yield "_bucket", (span_name, _format_value(bound)), seen
+            yield "_bucket", (span_name, "+Inf"), count
+            yield "_sum", (span_name,), total
+            yield "_count", (span_name,), count
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Get or create a counter."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Counter(name, help_text, labelnames)
+            return metric
+
+    def register(self, metric) -> None:
+        """Add or replace a metric (e.g. a CallbackMetric) under its name."""
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """
+        Render every metric.
+
+        Returns:
+            Prometheus text exposition format (version 0.0.4)
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+
+        lines = []
+        for name, metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                print(f"⚠️  Metric {name} could not be collected: {e}")
+                continue
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for suffix, key, value in samples:
+                labelnames = metric.labelnames + (("le",) if suffix == "_bucket" else ())
+                labels = ",".join(f'{label}="{_escape(label_value)}"'
+                                  for label, label_value in zip(labelnames, key))
+                lines.append(f"{name}{suffix}{{{labels}}} {_format_value(value)}" if labels
+                             else f"{name}{suffix} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+REGISTRY = MetricsRegistry()
+
+QUERIES = REGISTRY.counter(
+    "health_queries_total", "Queries handled, by final status", ["status"])
+PIPELINE_FALLBACKS = REGISTRY.counter(
+    "health_pipeline_fallbacks_total", "Queries served by the Python pipeline instead of CrewAI",
+    ["reason"])
+LLM_ERRORS = REGISTRY.counter(
+    "health_llm_errors_total", "Failed LLM calls, by provider and error type",
+    ["provider", "error"])
+REGISTRY.register(SpanHistograms(
+    "health_span_duration_seconds", "Latency of traced stages, agents and LLM calls"))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are frequent; keep them out of the console
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /metrics from a background thread (idempotent per process).
+
+    Args:
+        port: Port to listen on (METRICS_PORT; unset disables the endpoint)
+        host: Interface to bind (METRICS_HOST, default 127.0.0.1)
+
+    Returns:
+        The running server, or None if no port is configured or it cannot bind
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+
+        if port is None:
+            configured = os.getenv('METRICS_PORT', '').strip()
+            if not configured:
+                return None
+            port = int(configured)
+        host = host or os.getenv('METRICS_HOST', '127.0.0.1')
+
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            print(f"⚠️  Metrics endpoint could not bind {host}:{port}: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"📈 Metrics available at http://{host}:{_server.server_address[1]}/metrics")
+        return _server
+
+
+def stop_metrics_server() -> None:
+    """Stop the scrape endpoint if it is running."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
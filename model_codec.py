@@ -0,0 +1,155 @@
+"""
+Model Codec
+
+Compact binary serialization for the data models. A model is encoded as a
+positional array of its field values in declaration order (no keys), with
+datetimes as epoch seconds and nested models as nested arrays, packed with
+msgpack when it is installed and marshal otherwise.
+
+Rows are positional: new model fields must be appended after the existing
+ones so older payloads still decode (missing trailing fields take their
+defaults). marshal payloads are only portable between identical Python
+versions; install msgpack for payloads that outlive the process.
+"""
+from datetime import datetime
+from functools import partial
+from typing import (Any, Callable, Dict, List, Optional, Sequence, Tuple, Type, TypeVar, Union,
+                    get_type_hints)
+import marshal
+import typing
+
+from models import (Document, Query, QueryResponse, ReflectionReport, SessionState,
+                    Summary, UserFeedback)
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+T = TypeVar("T")
+
+MODELS = (Query, Summary, UserFeedback, ReflectionReport, QueryResponse, SessionState, Document)
+
+if MSGPACK_AVAILABLE:
+    _pack = partial(msgpack.packb, use_bin_type=True)
+
+    def _unpack(data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+else:
+    _pack = marshal.dumps
+    _unpack = marshal.loads
+
+# Per-model (encode, decode) functions, built once from the type hints
+_codecs: Dict[type, Tuple[Callable[[Any], list], Callable[[Sequence], Any]]] = {}
+
+
+def _field_codec(hint: Any) -> Optional[Tuple[Callable[[Any], Any], Callable[[Any], Any]]]:
+    """Build the (encode, decode) pair for one field type, or None for plain values."""
+    if hint is datetime:
+        return datetime.timestamp, datetime.fromtimestamp
+
+    if hint in MODELS:
+        return _codec(hint)
+
+    origin = typing.get_origin(hint)
+    args = typing.get_args(hint)
+    if origin is Union and type(None) in args:
+        inner = _field_codec(next(arg for arg in args if arg is not type(None)))
+        if inner is None:
+            return None
+        encode, decode = inner
+        return (lambda value: None if value is None else encode(value),
+                lambda value: None if value is None else decode(value))
+
+    if args and args[0] in MODELS and origin is not dict:
+        encode, decode = _codec(args[0])
+        return (lambda values: [encode(value) for value in values],
+                lambda values: [decode(value) for value in values])
+
+    return None
+
+
+def _codec(cls: type) -> Tuple[Callable[[Any], list], Callable[[Sequence], Any]]:
+    """Get or build the positional (encode, decode) pair for a model class."""
+    cached = _codecs.get(cls)
+    if cached is not None:
+        return cached
+
+    hints = get_type_hints(cls)
+    names = [f.name for f in cls.__dataclass_fields__.values() if f.init]
+    converters = [_field_codec(hints[name]) for name in names]
+    getters = [(name, None if conv is None else conv[0]) for name, conv in zip(names, converters)]
+    setters = [None if conv is None else conv[1] for conv in converters]
+
+    def encode(obj: Any) -> list:
+        row = []
+        for name, convert in getters:
+            value = getattr(obj, name)
+            row.append(value if convert is None else convert(value))
+        return row
+
+    def decode(row: Sequence) -> Any:
+        return cls(*[value if convert is None else convert(value)
+                     for convert, value in zip(setters, row)])
+
+    _codecs[cls] = (encode, decode)
+    return encode, decode
+
+
+def encode(obj: Any) -> bytes:
+    """
+    Serialize one model instance.
+
+    Args:
+        obj: Instance of one of the models
+
+    Returns:
+        Binary payload
+    """
+    return _pack(_codec(type(obj))[0](obj))
+
+
+def decode(data: bytes, cls: Type[T]) -> T:
+    """
+    Deserialize one model instance.
+
+    Args:
+        data: Payload produced by encode()
+        cls: Model class it was encoded from
+
+    Returns:
+        Model instance
+    """
+    return _codec(cls)[1](_unpack(data))
+
+
+def encode_batch(objs: Sequence[Any]) -> bytes:
+    """
+    Serialize a list of instances of the same model as one payload.
+
+    Args:
+        objs: Model instances (all of one class)
+
+    Returns:
+        Binary payload
+    """
+    if not objs:
+        return _pack([])
+    encode_one = _codec(type(objs[0]))[0]
+    return _pack([encode_one(obj) for obj in objs])
+
+
+def decode_batch(data: bytes, cls: Type[T]) -> List[T]:
+    """
+    Deserialize a payload produced by encode_batch().
+
+    Args:
+        data: Binary payload
+        cls: Model class of the instances
+
+    Returns:
+        Model instances in their original order
+    """
+    decode_one = _codec(cls)[1]
+    return [decode_one(row) for row in _unpack(data)]
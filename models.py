@@ -3,20 +3,41 @@ Data Models for Health Research Agentic System
 
 Contains all data classes used throughout the system for structured data handling.
 """
-from dataclasses import dataclass, field
-from typing import Dict, List, Any, Optional
+from collections import deque
+from dataclasses import dataclass, field, fields
+from itertools import islice
+from typing import Deque, Dict, List, Any, Optional
 from datetime import datetime
 from enum import Enum
 
 
+def _slotted(cls):
+    """
+    Rebuild a dataclass with __slots__ so instances carry no per-instance __dict__.
+    
+    Equivalent to dataclass(slots=True), which needs Python 3.10.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = dict(cls.__dict__)
+    for name in names:
+        # Defaults are class attributes; they would clash with the slot descriptors
+        namespace.pop(name, None)
+    namespace.pop('__dict__', None)
+    namespace.pop('__weakref__', None)
+    namespace['__slots__'] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
 class QueryStatus(Enum):
     """Status of a query processing."""
     PENDING = "pending"
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+    REJECTED = "rejected"
 
 
+@_slotted
 @dataclass
 class Query:
     """Represents a user query."""
@@ -45,6 +66,7 @@ class Query:
         return cls(**data_copy)
 
 
+@_slotted
 @dataclass
 class Summary:
     """Represents a generated summary."""
@@ -72,6 +94,7 @@ class Summary:
         self.created_at = datetime.now()
 
 
+@_slotted
 @dataclass
 class UserFeedback:
     """Represents user feedback on a summary."""
@@ -98,8 +121,17 @@ class UserFeedback:
             "improvement_requested": self.improvement_requested,
             "specific_concerns": self.specific_concerns
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'UserFeedback':
+        """Create UserFeedback from dictionary."""
+        data_copy = data.copy()
+        if isinstance(data_copy.get('timestamp'), str):
+            data_copy['timestamp'] = datetime.fromisoformat(data_copy['timestamp'])
+        return cls(**data_copy)
 
 
+@_slotted
 @dataclass
 class ReflectionReport:
     """Represents a quality evaluation report from the Reflective Agent."""
@@ -131,6 +163,7 @@ class ReflectionReport:
         }
 
 
+@_slotted
 @dataclass
 class QueryResponse:
     """Complete response to a user query."""
@@ -142,6 +175,7 @@ class QueryResponse:
     execution_time: float = 0.0
     agent_logs: List[str] = field(default_factory=list)
     error_message: str = ""
+    stage_timings: Dict[str, float] = field(default_factory=dict)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert response to dictionary."""
@@ -153,7 +187,8 @@ class QueryResponse:
             "status": self.status,
             "execution_time": self.execution_time,
             "agent_logs": self.agent_logs,
-            "error_message": self.error_message
+            "error_message": self.error_message,
+            "stage_timings": self.stage_timings
         }
     
     def is_successful(self) -> bool:
@@ -161,31 +196,114 @@ class QueryResponse:
         return self.status == QueryStatus.COMPLETED.value and not self.error_message
 
 
+@_slotted
 @dataclass
 class SessionState:
-    """Tracks a user session."""
+    """
+    Tracks a user session.
+    
+    Query and feedback histories are ring buffers holding the most recent
+    history_limit entries; older entries are only kept by the session store.
+    Entries are serialized once when added, so history views slice cached
+    dicts instead of re-serializing the whole history.
+    """
     session_id: str
-    query_history: List[Query] = field(default_factory=list)
-    feedback_history: List[UserFeedback] = field(default_factory=list)
+    query_history: Deque[Query] = field(default_factory=deque)
+    feedback_history: Deque[UserFeedback] = field(default_factory=deque)
+    reflections: Dict[str, str] = field(default_factory=dict)
     created_at: datetime = field(default_factory=datetime.now)
     last_activity: datetime = field(default_factory=datetime.now)
+    history_limit: int = 100
+    total_queries: int = 0
+    total_feedback: int = 0
+    _query_dicts: Deque[Dict[str, Any]] = field(default_factory=deque, init=False,
+                                                repr=False, compare=False)
+    _feedback_dicts: Deque[Dict[str, Any]] = field(default_factory=deque, init=False,
+                                                   repr=False, compare=False)
+    
+    def __post_init__(self):
+        if self.history_limit < 1:
+            raise ValueError(f"history_limit must be at least 1, got {self.history_limit}")
+        self.query_history = deque(self.query_history, maxlen=self.history_limit)
+        self.feedback_history = deque(self.feedback_history, maxlen=self.history_limit)
+        self.total_queries = max(self.total_queries, len(self.query_history))
+        self.total_feedback = max(self.total_feedback, len(self.feedback_history))
+        self._query_dicts = deque((q.to_dict() for q in self.query_history),
+                                  maxlen=self.history_limit)
+        self._feedback_dicts = deque((f.to_dict() for f in self.feedback_history),
+                                     maxlen=self.history_limit)
     
     def add_query(self, query: Query) -> None:
         """Add a query to the session history."""
-        self.query_history.append(query)
+        self.restore_query(query)
+        self.total_queries += 1
         self.last_activity = datetime.now()
     
     def add_feedback(self, feedback: UserFeedback) -> None:
         """Add feedback to the session history."""
-        self.feedback_history.append(feedback)
+        self.restore_feedback(feedback)
+        self.total_feedback += 1
         self.last_activity = datetime.now()
     
+    def restore_query(self, query: Query, data: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Append a query to the ring buffer without counting it as new activity.
+        
+        Args:
+            query: Query to append
+            data: Its serialized form, if already available
+        """
+        if len(self.query_history) == self.history_limit:
+            # Reflections follow their query out of memory
+            self.reflections.pop(self.query_history[0].query_id, None)
+        self.query_history.append(query)
+        self._query_dicts.append(data if data is not None else query.to_dict())
+    
+    def restore_feedback(self, feedback: UserFeedback, data: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Append feedback to the ring buffer without counting it as new activity.
+        
+        Args:
+            feedback: Feedback to append
+            data: Its serialized form, if already available
+        """
+        self.feedback_history.append(feedback)
+        self._feedback_dicts.append(data if data is not None else feedback.to_dict())
+    
+    def recent_queries(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get serialized queries from the in-memory window, newest last.
+        
+        Args:
+            offset: Number of most recent queries to skip
+            limit: Maximum number of queries (None for the rest of the window)
+            
+        Returns:
+            Query dicts in chronological order
+        """
+        return self._page(self._query_dicts, offset, limit)
+    
+    def recent_feedback(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get serialized feedback from the in-memory window (see recent_queries)."""
+        return self._page(self._feedback_dicts, offset, limit)
+    
+    @staticmethod
+    def _page(entries: Deque[Dict[str, Any]], offset: int, limit: Optional[int]) -> List[Dict[str, Any]]:
+        end = max(0, len(entries) - offset)
+        start = 0 if limit is None else max(0, end - limit)
+        return list(islice(entries, start, end))
+    
+    def add_reflection(self, query_id: str, report: str) -> None:
+        """Attach a background reflection report to a query in this session."""
+        self.reflections[query_id] = report
+    
     def is_expired(self, timeout_minutes: int = 30) -> bool:
         """Check if session has expired."""
         elapsed = (datetime.now() - self.last_activity).total_seconds() / 60
         return elapsed > timeout_minutes
 
 
+@_slotted
 @dataclass
 class Document:
     """Represents a document from the knowledge base."""
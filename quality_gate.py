@@ -0,0 +1,154 @@
+"""
+Quality Gate
+
+Decides per query whether expensive pipeline stages (LLM planning, LLM
+reflection, re-summarization) can be skipped because cheaper signals are
+already confident, and records every decision with the latency it saved
+so the savings can be measured per query class.
+"""
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+import logging
+import os
+import threading
+import time
+
+from agent_logging import get_agent_logger
+from tracing import Span, get_tracer
+
+
+class QualityGate:
+    """Confidence-based stage skipping with per-class decision accounting."""
+
+    def __init__(self, retrieval_threshold: Optional[float] = None, smoothing: float = 0.2,
+                 max_decisions: int = 500):
+        """
+        Initialize the gate.
+
+        Args:
+            retrieval_threshold: Top retrieval relevance (0-1) needed to trust a
+                template plan instead of the LLM planner (GATE_RETRIEVAL_THRESHOLD)
+            smoothing: Weight of each new sample in the stage latency averages
+            max_decisions: Number of recent decisions kept for inspection
+        """
+        if retrieval_threshold is None:
+            retrieval_threshold = float(os.getenv('GATE_RETRIEVAL_THRESHOLD', '0.6'))
+        self.retrieval_threshold = retrieval_threshold
+        self.smoothing = smoothing
+        self.stage_latency: Dict[str, float] = {}
+        self.counters: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=max_decisions)
+        self._lock = threading.Lock()
+        # Decisions are logged at DEBUG through the queued agent log writer
+        self._log = get_agent_logger("Quality Gate")
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """
+        Record how long a stage took when it ran.
+
+        Args:
+            stage: Stage name
+            seconds: Measured latency
+        """
+        with self._lock:
+            previous = self.stage_latency.get(stage)
+            self.stage_latency[stage] = (
+                seconds if previous is None
+                else (1 - self.smoothing) * previous + self.smoothing * seconds
+            )
+
+    @contextmanager
+    def timed(self, stage: str, timings: Optional[Dict[str, float]] = None) -> Iterator[Span]:
+        """
+        Context manager that observes the latency of the enclosed stage.
+
+        The stage also runs in a tracing span of the same name, which is
+        yielded so the stage can attach attributes.
+
+        Args:
+            stage: Stage name
+            timings: Per-query dict the latency is also added to (optional)
+        """
+        start = time.perf_counter()
+        try:
+            with get_tracer().span(stage) as span:
+                yield span
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe(stage, seconds)
+            if timings is not None:
+                timings[stage] = timings.get(stage, 0.0) + seconds
+
+    def decide(self, stage: str, skip: bool, query_class: str = "general",
+               reason: str = "") -> bool:
+        """
+        Log a gating decision and account for the latency it saved.
+
+        Args:
+            stage: Stage being gated (e.g. "planner", "reflection")
+            skip: Whether the stage is skipped
+            query_class: Query class the savings are attributed to
+            reason: Why the decision was made
+
+        Returns:
+            The skip decision, so calls can be used inline in conditions
+        """
+        with self._lock:
+            saved = self.stage_latency.get(stage, 0.0) if skip else 0.0
+            counter = self.counters.setdefault(
+                (query_class, stage), {"decisions": 0, "skipped": 0, "saved_seconds": 0.0}
+            )
+            counter["decisions"] += 1
+            counter["skipped"] += int(skip)
+            counter["saved_seconds"] += saved
+            self.decisions.append({
+                "time": time.time(),
+                "stage": stage,
+                "query_class": query_class,
+                "skipped": skip,
+                "reason": reason,
+                "saved_seconds": saved,
+            })
+
+        if self._log.isEnabledFor(logging.DEBUG):
+            self._log.debug("🚦 [%s] %s %s: %s (saved ~%.2fs)", query_class,
+                            "skip" if skip else "run", stage, reason, saved,
+                            extra={"agent": "Quality Gate"})
+        return skip
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Get gating totals per query class and stage.
+
+        Returns:
+            One row per (query_class, stage) with decisions, skipped,
+            skip_rate and saved_seconds
+        """
+        with self._lock:
+            rows = [
+                {
+                    "query_class": query_class,
+                    "stage": stage,
+                    "decisions": counter["decisions"],
+                    "skipped": counter["skipped"],
+                    "skip_rate": counter["skipped"] / counter["decisions"],
+                    "saved_seconds": counter["saved_seconds"],
+                }
+                for (query_class, stage), counter in self.counters.items()
+            ]
+        return sorted(rows, key=lambda row: (row["query_class"], row["stage"]))
+
+
+# Shared gate - created lazily so latency estimates accumulate across queries
+_quality_gate: Optional[QualityGate] = None
+_gate_lock = threading.Lock()
+
+
+def get_quality_gate() -> QualityGate:
+    """Get or create the shared quality gate."""
+    global _quality_gate
+    with _gate_lock:
+        if _quality_gate is None:
+            _quality_gate = QualityGate()
+        return _quality_gate
@@ -0,0 +1,261 @@
+"""
+LLM Rate Limiter
+
+Process-wide limiter for LLM calls. Each provider gets a requests-per-minute
+bucket, a tokens-per-minute bucket and a cap on calls in flight. Waiting
+callers are served first-come first-served and give up once their deadline
+passes, so bursts queue up at the provider's limits instead of failing.
+"""
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+import itertools
+import os
+import threading
+import time
+
+from admission import remaining_time
+from metrics import LLM_ERRORS
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised when a caller's deadline passes before capacity frees up."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a fixed rate."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        """
+        Initialize the bucket (starts full).
+
+        Args:
+            capacity: Maximum tokens the bucket holds
+            refill_per_second: Tokens added per second
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` tokens are available.
+
+        Args:
+            amount: Tokens needed (capped at capacity)
+            now: Current monotonic time
+
+        Returns:
+            0.0 if available now, otherwise the wait in seconds
+        """
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount: float, now: float) -> None:
+        """Take tokens from the bucket (may go negative to account for overruns)."""
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+            self.updated_at = now
+
+
+class ProviderLimiter:
+    """Request/token buckets plus a max-in-flight cap for one provider."""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_in_flight: int = 4):
+        """
+        Initialize the limiter.
+
+        Args:
+            requests_per_minute: Request budget (0 for unlimited)
+            tokens_per_minute: Token budget (0 for unlimited)
+            max_in_flight: Maximum concurrent calls
+        """
+        self.request_bucket = (TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+                               if requests_per_minute > 0 else None)
+        self.token_bucket = (TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+                             if tokens_per_minute > 0 else None)
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight = 0
+
+        self._cond = threading.Condition()
+        self._waiters: Deque[int] = deque()
+        self._tickets = itertools.count()
+        self.metrics = {"acquired": 0, "rejected": 0, "total_wait": 0.0}
+
+    def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> None:
+        """
+        Wait for a slot to make one call of about `tokens` tokens.
+
+        Args:
+            tokens: Estimated prompt plus completion tokens
+            timeout: Maximum seconds to wait (None waits forever)
+
+        Raises:
+            RateLimitExceeded: If the deadline passes while queued
+        """
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+
+        with self._cond:
+            ticket = next(self._tickets)
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    # FIFO: only the head of the queue may take capacity
+                    if self._waiters[0] == ticket and self.in_flight < self.max_in_flight:
+                        wait = self._bucket_wait(tokens, now)
+                        if wait == 0.0:
+                            self._take(tokens, now)
+                            self.metrics["total_wait"] += now - start
+                            return
+
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self.metrics["rejected"] += 1
+                            raise RateLimitExceeded(
+                                f"LLM rate limit: no capacity within {timeout:.1f}s"
+                            )
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+    def release(self) -> None:
+        """Return the in-flight slot taken by acquire()."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tokens: int = 1, timeout: Optional[float] = None) -> Iterator[None]:
+        """Context manager around acquire()/release()."""
+        self.acquire(tokens, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue and throughput counters."""
+        with self._cond:
+            stats: Dict[str, Any] = dict(self.metrics)
+            stats["in_flight"] = self.in_flight
+            stats["queued"] = len(self._waiters)
+        return stats
+
+    def _bucket_wait(self, tokens: int, now: float) -> float:
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.wait_time(1, now))
+        if self.token_bucket:
+            wait = max(wait, self.token_bucket.wait_time(tokens, now))
+        return wait
+
+    def _take(self, tokens: int, now: float) -> None:
+        if self.request_bucket:
+            self.request_bucket.consume(1, now)
+        if self.token_bucket:
+            self.token_bucket.consume(tokens, now)
+        self.in_flight += 1
+        self.metrics["acquired"] += 1
+
+
+class RateLimitedLLM:
+    """Wraps an LLM client so every call goes through a ProviderLimiter."""
+
+    def __init__(self, llm: Any, limiter: ProviderLimiter, max_wait: Optional[float] = None,
+                 completion_tokens: int = 512):
+        """
+        Initialize the rate-limited LLM.
+
+        Args:
+            llm: Underlying client with call/predict
+            limiter: Limiter for the client's provider
+            max_wait: Maximum seconds a call may queue (None waits forever)
+            completion_tokens: Tokens reserved for the response
+        """
+        self.llm = llm
+        self.limiter = limiter
+        self.max_wait = max_wait
+        self.completion_tokens = completion_tokens
+        self.provider = getattr(llm, 'provider', '')
+        self.model = getattr(llm, 'model', '')
+
+    def call(self, messages: List[Dict[str, str]]) -> str:
+        tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+        return self._limited(tokens, lambda: self.llm.call(messages))
+
+    def predict(self, prompt: str) -> str:
+        return self._limited(estimate_tokens(prompt), lambda: self.llm.predict(prompt))
+
+    def _limited(self, prompt_tokens: int, invoke) -> str:
+        try:
+            # Never queue past the deadline of the request being served
+            with self.limiter.slot(prompt_tokens + self.completion_tokens,
+                                   remaining_time(self.max_wait)):
+                return invoke()
+        except Exception as e:
+            LLM_ERRORS.inc(provider=self.provider or "unknown", error=type(e).__name__)
+            raise
+
+    def __repr__(self) -> str:
+        return f"RateLimitedLLM({self.llm!r})"
+
+
+# Defaults per provider: (requests/min, tokens/min, max in flight); 0 means unlimited
+DEFAULT_LIMITS = {
+    "ollama": (0, 0, 2),
+    "mistral": (60, 500000, 4),
+    "openai": (500, 200000, 8),
+}
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> ProviderLimiter:
+    """
+    Get the process-wide limiter for a provider.
+
+    Limits come from DEFAULT_LIMITS and can be overridden with
+    <PROVIDER>_RPM, <PROVIDER>_TPM and <PROVIDER>_MAX_IN_FLIGHT
+    (e.g. MISTRAL_RPM=30).
+
+    Args:
+        provider: Provider name
+
+    Returns:
+        Shared ProviderLimiter
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            rpm, tpm, in_flight = DEFAULT_LIMITS.get(provider, (0, 0, 4))
+            prefix = provider.upper()
+            limiter = ProviderLimiter(
+                requests_per_minute=float(os.getenv(f'{prefix}_RPM', rpm)),
+                tokens_per_minute=float(os.getenv(f'{prefix}_TPM', tpm)),
+                max_in_flight=int(os.getenv(f'{prefix}_MAX_IN_FLIGHT', in_flight))
+            )
+            _limiters[provider] = limiter
+        return limiter
@@ -0,0 +1,135 @@
+"""
+Reflection Worker
+
+Runs Reflective Agent evaluations in the background so the summary can be
+returned to the user without waiting for an extra LLM round-trip. Completed
+reports are attached to the session through the SessionManager.
+"""
+from typing import Callable, List, Optional
+import queue
+import threading
+
+from session_manager import SessionManager
+
+
+class ReflectionWorker:
+    """Background worker that evaluates summaries from a bounded queue."""
+
+    # Seconds an idle thread waits for work before checking for stop()
+    POLL_INTERVAL = 0.2
+
+    def __init__(self, session_manager: SessionManager, max_queue_size: int = 32,
+                 num_workers: int = 1,
+                 evaluator: Optional[Callable[[str, Optional[List[str]]], str]] = None):
+        """
+        Initialize the reflection worker.
+
+        Args:
+            session_manager: Session manager the reports are attached to
+            max_queue_size: Maximum number of pending evaluations
+            num_workers: Number of background threads
+            evaluator: Optional callable mapping (summary text, source chunks) to a
+                report. Defaults to ReflectiveAgent.evaluate_summary (one agent per thread).
+        """
+        self.session_manager = session_manager
+        self.num_workers = max(1, num_workers)
+        self.evaluator = evaluator
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._threads: List[threading.Thread] = []
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the background threads (no-op if already running)."""
+        with self._lock:
+            if self._threads:
+                return
+            # Each generation of threads gets its own stop signal, so a restart
+            # after stop() is not cancelled by threads still draining
+            self._stop_event = threading.Event()
+            for i in range(self.num_workers):
+                thread = threading.Thread(
+                    target=self._run,
+                    args=(self._stop_event,),
+                    name=f"reflection-worker-{i}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, session_id: str, query_id: str, summary_text: str,
+               sources: Optional[List[str]] = None,
+               evaluator: Optional[Callable[[str, Optional[List[str]]], str]] = None) -> bool:
+        """
+        Queue a summary for background evaluation.
+
+        Args:
+            session_id: Session the query belongs to
+            query_id: Query the summary answers
+            summary_text: Summary to evaluate
+            sources: Retrieved chunks the summary was built from (optional)
+            evaluator: Evaluator for this item only (defaults to the worker's)
+
+        Returns:
+            True if queued, False if the queue is full
+        """
+        self.start()
+        try:
+            self._queue.put_nowait((session_id, query_id, summary_text, sources, evaluator))
+        except queue.Full:
+            return False
+        return True
+
+    def pending_count(self) -> int:
+        """Get the number of evaluations waiting in the queue."""
+        return self._queue.qsize()
+
+    def join(self) -> None:
+        """Block until every queued evaluation has been processed."""
+        self._queue.join()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background threads after the queued work is done.
+
+        Never blocks on a full queue, so it is safe to call from a finalizer.
+
+        Args:
+            timeout: Maximum seconds to wait for each thread (0 returns at once)
+        """
+        with self._lock:
+            threads = self._threads
+            self._threads = []
+            self._stop_event.set()
+
+        for thread in threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def _run(self, stop_event: threading.Event) -> None:
+        """Worker loop: evaluate queued summaries until stopped and drained."""
+        evaluate = self.evaluator
+
+        while True:
+            try:
+                item = self._queue.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                if stop_event.is_set():
+                    return
+                continue
+            try:
+                session_id, query_id, summary_text, sources, item_evaluator = item
+                if item_evaluator is None and evaluate is None:
+                    # Imported lazily so the agent (and its LLM client) is only
+                    # created inside the worker thread that uses it
+                    from agents.reflective_agent import ReflectiveAgent
+                    evaluate = ReflectiveAgent().evaluate_summary
+
+                try:
+                    report = (item_evaluator or evaluate)(summary_text, sources)
+                except Exception as e:
+                    report = f"Reflection failed: {e}"
+
+                self.session_manager.attach_reflection(session_id, query_id, report)
+            finally:
+                self._queue.task_done()
@@ -2,26 +2,76 @@
 Session Manager
 
 Manages user sessions and tracks query/feedback history.
+
+Sessions are spread over independently locked shards (lock striping) so
+concurrent requests for different sessions rarely contend. Each shard has
+its own expiry heap.
+
+With a SessionStore, every change is also recorded on the store (written
+behind the request path), the shards become an LRU cache of hot sessions,
+and sessions missing from memory are rehydrated from the store on access.
 """
-from typing import Dict, Optional
-from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import heapq
+import threading
+import time
 import uuid
+import zlib
 
 from models import SessionState, Query, UserFeedback
+from session_store import SessionStore
+
+
+class _Shard:
+    """One lock-protected slice of the session store."""
+    
+    def __init__(self):
+        # Ordered by recency of use when the manager has a store (LRU)
+        self.sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        # Min-heap of (expiry timestamp, session ID). Entries are invalidated
+        # lazily: only the one matching scheduled[session_id] is current.
+        self.expiry_heap: List[Tuple[float, str]] = []
+        self.scheduled: Dict[str, float] = {}
+        self.lock = threading.Lock()
 
 
 class SessionManager:
     """Manages user sessions."""
     
-    def __init__(self, default_timeout: int = 30):
+    def __init__(self, default_timeout: int = 30, num_shards: int = 16,
+                 store: Optional[SessionStore] = None, max_cached_sessions: int = 10000,
+                 history_limit: int = 100):
         """
         Initialize the session manager.
         
         Args:
             default_timeout: Default session timeout in minutes
+            num_shards: Number of independently locked shards
+            store: Durable session store (None keeps sessions in memory only)
+            max_cached_sessions: Sessions kept in memory when a store is used;
+                the least recently used are evicted and reloaded on demand
+            history_limit: Queries (and feedback entries) kept in memory per
+                session, at least 1; older ones are only available from the store
         """
-        self.sessions: Dict[str, SessionState] = {}
+        if history_limit < 1:
+            raise ValueError(f"history_limit must be at least 1, got {history_limit}")
         self.timeout = default_timeout
+        self.store = store
+        self.history_limit = history_limit
+        self._shards = [_Shard() for _ in range(max(1, num_shards))]
+        self._shard_capacity = max(1, -(-max_cached_sessions // len(self._shards)))
+        self._last_purge = 0.0
+    
+    @property
+    def sessions(self) -> Dict[str, SessionState]:
+        """Snapshot of all sessions (includes expired ones not yet cleaned up)."""
+        snapshot: Dict[str, SessionState] = {}
+        for shard in self._shards:
+            with shard.lock:
+                snapshot.update(shard.sessions)
+        return snapshot
     
     def create_session(self) -> str:
         """
@@ -31,8 +81,12 @@ class SessionManager:
             Session ID
         """
         session_id = str(uuid.uuid4())
-        session = SessionState(session_id=session_id)
-        self.sessions[session_id] = session
+        session = SessionState(session_id=session_id, history_limit=self.history_limit)
+        shard = self._shard(session_id)
+        with shard.lock:
+            self._cache(shard, session)
+        if self.store:
+            self.store.save_session(session)
         return session_id
     
     def get_session(self, session_id: str) -> Optional[SessionState]:
@@ -45,16 +99,10 @@ class SessionManager:
         Returns:
             SessionState if found and not expired, None otherwise
         """
-        session = self.sessions.get(session_id)
-        
-        if not session:
-            return None
-        
-        if session.is_expired(self.timeout):
-            self.sessions.pop(session_id, None)
-            return None
-        
-        return session
+        shard = self._shard(session_id)
+        loaded = self._preload(shard, session_id)
+        with shard.lock:
+            return self._live_session(shard, session_id, loaded)
     
     def update_session(self, session_id: str, query: Optional[Query] = None, 
                       feedback: Optional[UserFeedback] = None) -> bool:
@@ -69,35 +117,121 @@ class SessionManager:
         Returns:
             True if successful, False if session not found
         """
-        session = self.get_session(session_id)
-        
-        if not session:
-            return False
-        
-        if query:
-            session.add_query(query)
+        shard = self._shard(session_id)
+        loaded = self._preload(shard, session_id)
+        with shard.lock:
+            session = self._live_session(shard, session_id, loaded)
+            
+            if not session:
+                return False
+            
+            if query:
+                session.add_query(query)
+                if self.store:
+                    self.store.append_query(session_id, query, session.last_activity)
+            
+            if feedback:
+                session.add_feedback(feedback)
+                if self.store:
+                    self.store.append_feedback(session_id, feedback, session.last_activity)
+            
+            if query or feedback:
+                self._schedule(shard, session)
         
-        if feedback:
-            session.add_feedback(feedback)
+        return True
+    
+    def attach_reflection(self, session_id: str, query_id: str, report: str) -> bool:
+        """
+        Attach a reflection report produced in the background to a query.
         
+        Args:
+            session_id: Session the query belongs to
+            query_id: Query the report evaluates
+            report: Reflection report text
+            
+        Returns:
+            True if successful, False if session not found
+        """
+        shard = self._shard(session_id)
+        loaded = self._preload(shard, session_id)
+        with shard.lock:
+            session = self._live_session(shard, session_id, loaded)
+            
+            if not session:
+                return False
+            
+            session.add_reflection(query_id, report)
+            if self.store:
+                self.store.attach_reflection(session_id, query_id, report)
         return True
     
+    def get_reflection(self, session_id: str, query_id: str) -> Optional[str]:
+        """
+        Get the reflection report for a query, if it has completed.
+        
+        Args:
+            session_id: Session the query belongs to
+            query_id: Query to look up
+            
+        Returns:
+            Reflection report text, or None if not available yet
+        """
+        shard = self._shard(session_id)
+        loaded = self._preload(shard, session_id)
+        with shard.lock:
+            session = self._live_session(shard, session_id, loaded)
+            
+            if not session:
+                return None
+            
+            return session.reflections.get(query_id)
+    
     def cleanup_expired(self) -> int:
         """
         Remove expired sessions.
         
+        Only heap entries that are due are examined, so the cost is
+        proportional to the number of sessions expiring (plus superseded
+        entries), not to the number of live sessions.
+        
         Returns:
             Number of sessions removed
         """
-        expired_ids = [
-            sid for sid, session in self.sessions.items()
-            if session.is_expired(self.timeout)
-        ]
+        now = time.time()
+        removed = 0
+        
+        for shard in self._shards:
+            with shard.lock:
+                while shard.expiry_heap and shard.expiry_heap[0][0] < now:
+                    expires_at, sid = heapq.heappop(shard.expiry_heap)
+                    if shard.scheduled.get(sid) != expires_at:
+                        continue  # superseded by later activity, or already removed
+                    
+                    session = shard.sessions.get(sid)
+                    if session is not None and not session.is_expired(self.timeout):
+                        # Activity recorded without going through the manager
+                        self._schedule(shard, session)
+                        continue
+                    
+                    self._remove(shard, sid)
+                    removed += 1
         
-        for sid in expired_ids:
-            self.sessions.pop(sid)
+        # Sessions evicted from memory expire in the store; purge them at most once a minute
+        if self.store and now - self._last_purge > 60:
+            self._last_purge = now
+            self.store.purge_expired(datetime.now() - timedelta(minutes=self.timeout))
         
-        return len(expired_ids)
+        return removed
+    
+    def flush(self) -> None:
+        """Block until every recorded session change is durable in the store."""
+        if self.store:
+            self.store.flush()
+    
+    def close(self) -> None:
+        """Flush pending session changes and close the store."""
+        if self.store:
+            self.store.close()
     
     def get_active_session_count(self) -> int:
         """
@@ -107,27 +241,164 @@ class SessionManager:
             Number of active sessions
         """
         self.cleanup_expired()
-        return len(self.sessions)
+        total = 0
+        for shard in self._shards:
+            with shard.lock:
+                total += len(shard.sessions)
+        return total
+    
+    def _shard(self, session_id: str) -> _Shard:
+        """Shard that owns a session ID."""
+        return self._shards[zlib.crc32(session_id.encode("utf-8")) % len(self._shards)]
+    
+    def _preload(self, shard: _Shard, session_id: str) -> Optional[SessionState]:
+        """
+        Get a session, loading it from the store into its shard if uncached.
+        
+        Called without the shard lock held, so a store read never stalls
+        the other sessions of the shard. A cached session that looks expired
+        is reloaded too, since other processes may have used it since.
+        
+        Returns:
+            The session (possibly expired), or None if it is unknown
+        """
+        if not self.store:
+            return None
+        with shard.lock:
+            session = shard.sessions.get(session_id)
+            if session is not None:
+                if not session.is_expired(self.timeout):
+                    return session
+                # Another process sharing the store may have kept it alive:
+                # drop the stale copy and let the store decide
+                self._remove(shard, session_id)
+        
+        session = self.store.load_session(session_id, self.history_limit)
+        if session is None:
+            return None
+        with shard.lock:
+            # Another thread may have loaded (and since updated) it meanwhile
+            cached = shard.sessions.get(session_id)
+            if cached is not None:
+                return cached
+            self._cache(shard, session)
+        return session
+    
+    def _live_session(self, shard: _Shard, session_id: str,
+                      loaded: Optional[SessionState] = None) -> Optional[SessionState]:
+        """
+        Look up a session in its shard, dropping it if expired (shard lock held).
+        
+        Args:
+            shard: Shard owning the session
+            session_id: Session to look up
+            loaded: Session returned by _preload(), re-cached if it was evicted since
+        """
+        session = shard.sessions.get(session_id)
+        
+        if session is None and loaded is not None:
+            session = loaded
+            self._cache(shard, session)
+        
+        if not session:
+            return None
+        
+        if self.store:
+            shard.sessions.move_to_end(session_id)
+        
+        if session.is_expired(self.timeout):
+            self._remove(shard, session_id)
+            return None
+        
+        return session
     
-    def get_session_history(self, session_id: str) -> Dict:
+    def _cache(self, shard: _Shard, session: SessionState) -> None:
+        """Add a session to its shard, evicting the least recently used (shard lock held)."""
+        shard.sessions[session.session_id] = session
+        self._schedule(shard, session)
+        if self.store:
+            while len(shard.sessions) > self._shard_capacity:
+                evicted_id = next(iter(shard.sessions))
+                self._remove(shard, evicted_id)
+    
+    def _expires_at(self, session: SessionState) -> float:
+        """Expiry time of a session as a Unix timestamp."""
+        return session.last_activity.timestamp() + self.timeout * 60
+    
+    def _schedule(self, shard: _Shard, session: SessionState) -> None:
+        """Record a session's current expiry time in its shard's heap (shard lock held)."""
+        expires_at = self._expires_at(session)
+        shard.scheduled[session.session_id] = expires_at
+        heapq.heappush(shard.expiry_heap, (expires_at, session.session_id))
+        
+        # Rebuild once superseded entries outnumber the live ones
+        if len(shard.expiry_heap) > 2 * len(shard.scheduled) + 64:
+            shard.expiry_heap = [(t, sid) for sid, t in shard.scheduled.items()]
+            heapq.heapify(shard.expiry_heap)
+    
+    def _remove(self, shard: _Shard, session_id: str) -> None:
+        """Drop a session; its heap entries become stale (shard lock held)."""
+        shard.sessions.pop(session_id, None)
+        shard.scheduled.pop(session_id, None)
+    
+    def get_session_history(self, session_id: str, offset: int = 0,
+                            limit: Optional[int] = None) -> Dict:
         """
-        Get complete history for a session.
+        Get a page of a session's history.
+        
+        Pages count back from the most recent entry. Without a limit the
+        whole in-memory window is returned; pages reaching past it are
+        completed from the session store.
         
         Args:
             session_id: Session ID
+            offset: Number of most recent queries (and feedback entries) to skip
+            limit: Maximum entries per list (None for the in-memory window)
             
         Returns:
-            Dictionary with query and feedback history
+            Dictionary with query and feedback history in chronological
+            order, the total number of each recorded in the session, and
+            how many of each can still be paged ("available_queries",
+            "available_feedback": the totals with a store, else the
+            in-memory window)
         """
-        session = self.get_session(session_id)
+        shard = self._shard(session_id)
+        loaded = self._preload(shard, session_id)
+        with shard.lock:
+            session = self._live_session(shard, session_id, loaded)
+            
+            if not session:
+                return {"queries": [], "feedback": [], "reflections": {},
+                        "total_queries": 0, "total_feedback": 0,
+                        "available_queries": 0, "available_feedback": 0}
+            
+            history = {
+                "session_id": session.session_id,
+                "created_at": session.created_at.isoformat(),
+                "last_activity": session.last_activity.isoformat(),
+                "queries": session.recent_queries(offset, limit),
+                "feedback": session.recent_feedback(offset, limit),
+                "reflections": dict(session.reflections),
+                "total_queries": session.total_queries,
+                "total_feedback": session.total_feedback,
+                # Without a store, entries older than the window are gone
+                "available_queries": (session.total_queries if self.store
+                                      else len(session.query_history)),
+                "available_feedback": (session.total_feedback if self.store
+                                       else len(session.feedback_history))
+            }
         
-        if not session:
-            return {"queries": [], "feedback": []}
-        
-        return {
-            "session_id": session.session_id,
-            "created_at": session.created_at.isoformat(),
-            "last_activity": session.last_activity.isoformat(),
-            "queries": [q.to_dict() for q in session.query_history],
-            "feedback": [f.to_dict() for f in session.feedback_history]
-        }
+        if self.store and limit is not None:
+            history["queries"] = self._complete_page(
+                session_id, "query", history["queries"], offset, limit, history["total_queries"])
+            history["feedback"] = self._complete_page(
+                session_id, "feedback", history["feedback"], offset, limit, history["total_feedback"])
+        return history
+    
+    def _complete_page(self, session_id: str, kind: str, page: List[Dict], offset: int,
+                       limit: int, total: int) -> List[Dict]:
+        """Prepend entries older than the in-memory window from the store."""
+        missing = min(limit - len(page), total - offset - len(page))
+        if missing <= 0:
+            return page
+        return self.store.load_history(session_id, kind, offset + len(page), missing) + page
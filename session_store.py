@@ -0,0 +1,360 @@
+"""
+Session Store
+
+Persistence backends for SessionManager. The manager keeps hot sessions in
+memory and records every change as an event on the store; the SQLite
+backend writes those events behind the request path in batched
+transactions, in WAL mode so several worker processes on one host can
+share the same database file.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from models import Query, SessionState, UserFeedback
+
+
+class SessionStore(ABC):
+    """Interface for durable session storage."""
+
+    @abstractmethod
+    def save_session(self, session: SessionState) -> None:
+        """Record a new session."""
+
+    @abstractmethod
+    def append_query(self, session_id: str, query: Query, last_activity: datetime) -> None:
+        """Record a query added to a session."""
+
+    @abstractmethod
+    def append_feedback(self, session_id: str, feedback: UserFeedback,
+                        last_activity: datetime) -> None:
+        """Record feedback added to a session."""
+
+    @abstractmethod
+    def attach_reflection(self, session_id: str, query_id: str, report: str) -> None:
+        """Record a reflection report for a query."""
+
+    @abstractmethod
+    def load_session(self, session_id: str, history_limit: int = 100) -> Optional[SessionState]:
+        """Rebuild a session (its most recent history_limit entries), or None if it is unknown."""
+
+    @abstractmethod
+    def load_history(self, session_id: str, kind: str, offset: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Read a page of a session's history.
+
+        Args:
+            session_id: Session to read
+            kind: "query" or "feedback"
+            offset: Number of most recent entries to skip
+            limit: Maximum number of entries
+
+        Returns:
+            Serialized entries in chronological order
+        """
+
+    @abstractmethod
+    def purge_expired(self, inactive_since: datetime) -> None:
+        """Delete sessions with no activity since the given time."""
+
+    def flush(self) -> None:
+        """Block until every recorded change is durable."""
+
+    def close(self) -> None:
+        """Flush and release resources."""
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite (WAL) session store with batched write-behind."""
+
+    def __init__(self, db_path: str, batch_size: int = 256, flush_interval: float = 0.5,
+                 max_pending: int = 10000):
+        """
+        Initialize the store and start its writer thread.
+
+        Args:
+            db_path: SQLite database file (shared by every process using it)
+            batch_size: Maximum events written per transaction
+            flush_interval: Seconds the writer waits to fill a batch
+            max_pending: Events buffered before callers block (backpressure)
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.metrics = {"events": 0, "batches": 0, "loads": 0}
+
+        self._pending: queue.Queue = queue.Queue(maxsize=max_pending)
+        # Queued-but-uncommitted event count per session, so loads only wait
+        # for the writer when the session they read has changes in flight
+        self._unwritten: Dict[str, int] = {}
+        self._unwritten_lock = threading.Lock()
+        self._closed = False
+        self._reader = self._connect()
+        self._reader_lock = threading.Lock()
+        self._create_schema(self._reader)
+
+        self._writer = threading.Thread(target=self._write_loop, name="session-store-writer",
+                                        daemon=True)
+        self._writer.start()
+
+    def save_session(self, session: SessionState) -> None:
+        self._enqueue(("session", session.session_id, session.created_at.timestamp(),
+                       session.last_activity.timestamp()))
+
+    def append_query(self, session_id: str, query: Query, last_activity: datetime) -> None:
+        self._enqueue(("event", session_id, "query", json.dumps(query.to_dict()),
+                       last_activity.timestamp()))
+
+    def append_feedback(self, session_id: str, feedback: UserFeedback,
+                        last_activity: datetime) -> None:
+        self._enqueue(("event", session_id, "feedback", json.dumps(feedback.to_dict()),
+                       last_activity.timestamp()))
+
+    def attach_reflection(self, session_id: str, query_id: str, report: str) -> None:
+        self._enqueue(("event", session_id, "reflection",
+                       json.dumps({"query_id": query_id, "report": report}), None))
+
+    def purge_expired(self, inactive_since: datetime) -> None:
+        self._pending.put(("purge", inactive_since.timestamp()))
+
+    def load_session(self, session_id: str, history_limit: int = 100) -> Optional[SessionState]:
+        # Make this process's own pending writes to the session visible first;
+        # unknown and settled sessions are read without waiting on the writer
+        self._flush_session(session_id)
+        with self._reader_lock:
+            row = self._reader.execute(
+                "SELECT created_at, last_activity FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            counts = dict(self._reader.execute(
+                "SELECT kind, COUNT(*) FROM session_events WHERE session_id = ? GROUP BY kind",
+                (session_id,)
+            ).fetchall())
+            queries = self._recent_events(session_id, "query", 0, history_limit)
+            feedback = self._recent_events(session_id, "feedback", 0, history_limit)
+            reflections = self._reader.execute(
+                "SELECT payload FROM session_events WHERE session_id = ? AND kind = 'reflection' "
+                "ORDER BY id",
+                (session_id,)
+            ).fetchall()
+        self.metrics["loads"] += 1
+
+        session = SessionState(
+            session_id=session_id,
+            created_at=datetime.fromtimestamp(row[0]),
+            last_activity=datetime.fromtimestamp(row[1]),
+            history_limit=history_limit,
+            total_queries=counts.get("query", 0),
+            total_feedback=counts.get("feedback", 0),
+        )
+        for data in queries:
+            session.restore_query(Query.from_dict(data), data)
+        for data in feedback:
+            session.restore_feedback(UserFeedback.from_dict(data), data)
+        in_memory = {q.query_id for q in session.query_history}
+        for (payload,) in reflections:
+            data = json.loads(payload)
+            if data["query_id"] in in_memory:
+                session.reflections[data["query_id"]] = data["report"]
+        return session
+
+    def load_history(self, session_id: str, kind: str, offset: int, limit: int) -> List[Dict[str, Any]]:
+        self._flush_session(session_id)
+        with self._reader_lock:
+            return self._recent_events(session_id, kind, offset, limit)
+
+    def flush(self) -> None:
+        if self._closed:
+            return
+        done = threading.Event()
+        self._pending.put(("flush", done))
+        # Stop waiting if the writer is gone (store closed meanwhile)
+        while not done.wait(0.1):
+            if not self._writer.is_alive():
+                return
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._pending.put(None)
+        self._writer.join()
+        with self._reader_lock:
+            self._reader.close()
+
+    def pending_count(self) -> int:
+        """Get the number of events waiting to be written."""
+        return self._pending.qsize()
+
+    def _enqueue(self, item: Tuple) -> None:
+        """Queue a session change for the writer, counting it against its session."""
+        with self._unwritten_lock:
+            self._unwritten[item[1]] = self._unwritten.get(item[1], 0) + 1
+        self._pending.put(item)
+
+    def _settle(self, items: List[Tuple]) -> None:
+        """Uncount session changes the writer has finished with."""
+        with self._unwritten_lock:
+            for item in items:
+                if item[0] in ("session", "event"):
+                    left = self._unwritten[item[1]] - 1
+                    if left:
+                        self._unwritten[item[1]] = left
+                    else:
+                        del self._unwritten[item[1]]
+
+    def _flush_session(self, session_id: str) -> None:
+        """Flush only if the session has changes still queued or being written."""
+        with self._unwritten_lock:
+            pending = session_id in self._unwritten
+        if pending:
+            self.flush()
+
+    def _recent_events(self, session_id: str, kind: str, offset: int,
+                       limit: int) -> List[Dict[str, Any]]:
+        """Read a page of events, newest first in SQL, chronological in the result (reader lock held)."""
+        rows = self._reader.execute(
+            "SELECT payload FROM session_events WHERE session_id = ? AND kind = ? "
+            "ORDER BY id DESC LIMIT ? OFFSET ?",
+            (session_id, kind, limit, offset)
+        ).fetchall()
+        return [json.loads(payload) for (payload,) in reversed(rows)]
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        # WAL with synchronous=NORMAL is durable across process crashes
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @staticmethod
+    def _create_schema(db: sqlite3.Connection) -> None:
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, created_at REAL NOT NULL, last_activity REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sessions_activity ON sessions(last_activity)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS session_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+            "kind TEXT NOT NULL, payload TEXT NOT NULL)"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_session_events_kind ON session_events(session_id, kind, id)"
+        )
+        db.commit()
+
+    def _write_loop(self) -> None:
+        """Writer thread: drain pending events into batched transactions."""
+        db = self._connect()
+        stop = False
+
+        while not stop:
+            item = self._pending.get()
+            batch: List[Tuple] = [item]
+            deadline = time.monotonic() + self.flush_interval
+            # Gather more events until the batch is full, a flush or stop is
+            # requested, or the interval ends
+            while (len(batch) < self.batch_size and batch[-1] is not None
+                   and batch[-1][0] != "flush"):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            events = [item for item in batch if item is not None and item[0] != "flush"]
+            try:
+                with db:
+                    for event in events:
+                        self._apply(db, event)
+                self.metrics["batches"] += 1
+            except sqlite3.Error as e:
+                print(f"❌ Session store write failed, {len(events)} events lost: {e}")
+            self._settle(events)
+
+            for item in batch:
+                if item is not None and item[0] == "flush":
+                    item[1].set()
+
+        db.close()
+
+    def _apply(self, db: sqlite3.Connection, item: Tuple) -> None:
+        """Apply one event inside the writer's transaction."""
+        self.metrics["events"] += 1
+        kind = item[0]
+        if kind == "session":
+            _, session_id, created_at, last_activity = item
+            db.execute(
+                "INSERT INTO sessions (session_id, created_at, last_activity) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET "
+                "last_activity = MAX(last_activity, excluded.last_activity)",
+                (session_id, created_at, last_activity)
+            )
+        elif kind == "event":
+            _, session_id, event_kind, payload, last_activity = item
+            db.execute(
+                "INSERT INTO session_events (session_id, kind, payload) VALUES (?, ?, ?)",
+                (session_id, event_kind, payload)
+            )
+            if last_activity is not None:
+                db.execute(
+                    "UPDATE sessions SET last_activity = MAX(last_activity, ?) WHERE session_id = ?",
+                    (last_activity, session_id)
+                )
+        elif kind == "purge":
+            cutoff = item[1]
+            db.execute(
+                "DELETE FROM session_events WHERE session_id IN "
+                "(SELECT session_id FROM sessions WHERE last_activity < ?)",
+                (cutoff,)
+            )
+            db.execute("DELETE FROM sessions WHERE last_activity < ?", (cutoff,))
+
+
+# Shared stores keyed by database path - one writer thread and one pair of
+# connections per file, however many controllers use it
+_session_stores: Dict[str, SQLiteSessionStore] = {}
+_session_stores_lock = threading.Lock()
+
+
+def get_session_store() -> Optional[SessionStore]:
+    """
+    Get or create the shared session store configured by SESSION_STORE_PATH.
+
+    The store is opened once per database file and process, and flushed and
+    closed at interpreter exit; callers must not close it themselves.
+
+    Returns:
+        SQLiteSessionStore for the configured file, or None to keep
+        sessions in memory only
+    """
+    db_path = os.getenv('SESSION_STORE_PATH')
+    if not db_path:
+        return None
+    key = os.path.abspath(db_path)
+    with _session_stores_lock:
+        store = _session_stores.get(key)
+        if store is None or store._closed:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            store = SQLiteSessionStore(db_path)
+            _session_stores[key] = store
+            atexit.register(store.close)
+        return store
@@ -0,0 +1,77 @@
+"""
+Single Flight
+
+Coalesces concurrent calls for the same key: the first caller runs the
+work and every caller that arrives while it is in flight waits for and
+shares the same result instead of repeating it.
+"""
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple
+import re
+import threading
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!]+$")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a sanitized query so trivially different duplicates share a key.
+
+    Args:
+        text: Sanitized query text
+
+    Returns:
+        Lowercased text with whitespace collapsed and trailing punctuation removed
+    """
+    return _TRAILING_PUNCTUATION.sub("", " ".join(text.lower().split()))
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its result."""
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"executed": 0, "shared": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn for a key, or wait for the call already in flight for it.
+
+        Args:
+            key: Coalescing key
+            fn: Work to run if no call for the key is in flight
+
+        Returns:
+            Tuple of (result, whether it was shared from another caller).
+            An exception raised by fn is raised to every waiting caller.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.stats["executed"] += 1
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return result, False
+
+    def in_flight(self) -> int:
+        """Get the number of keys currently being computed."""
+        with self._lock:
+            return len(self._calls)
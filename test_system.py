@@ -60,6 +60,50 @@ def test_models():
     return True
 
 
+def test_model_codec():
+    """Test slotted models and the binary model codec."""
+    print("\n" + "="*50)
+    print("Testing Model Codec")
+    print("="*50)
+    
+    import json
+    import model_codec
+    from models import Query, Summary, UserFeedback, QueryResponse, SessionState
+    
+    query = Query(query_id="q1", text="What causes diabetes?", session_id="s1",
+                  user_context={"source": "test"})
+    assert not hasattr(query, "__dict__")
+    print("✓ Models are slotted (no per-instance __dict__)")
+    
+    payload = model_codec.encode(query)
+    assert model_codec.decode(payload, Query) == query
+    assert len(payload) < len(json.dumps(query.to_dict()))
+    print(f"✓ Query round trip: {len(payload)} bytes vs {len(json.dumps(query.to_dict()))} as JSON")
+    
+    response = QueryResponse(
+        response_id="r1", query=query,
+        summary=Summary(summary_id="s1", content="Summary", source_docs=["doc1"]),
+        stage_timings={"search": 0.1}
+    )
+    assert model_codec.decode(model_codec.encode(response), QueryResponse) == response
+    print("✓ Nested models and optional fields round trip")
+    
+    session = SessionState(session_id="s1", history_limit=3)
+    for i in range(5):
+        session.add_query(Query(query_id=f"q{i}", text=f"Query {i}"))
+    restored = model_codec.decode(model_codec.encode(session), SessionState)
+    assert restored == session and restored.total_queries == 5
+    assert restored.recent_queries() == session.recent_queries()
+    print("✓ Session state round trip keeps the bounded history")
+    
+    feedback = [UserFeedback(feedback_id=f"f{i}", summary_id="s1", rating=i % 5 + 1) for i in range(10)]
+    assert model_codec.decode_batch(model_codec.encode_batch(feedback), UserFeedback) == feedback
+    assert model_codec.decode_batch(model_codec.encode_batch([]), UserFeedback) == []
+    print("✓ Batch encode/decode")
+    
+    return True
+
+
 def test_validator():
     """Test input validator."""
     print("\n" + "="*50)
@@ -85,6 +129,17 @@ def test_validator():
     clean = validator.sanitize_input(dirty_input)
     print(f"✓ Sanitization test: '{clean}'")
     
+    # Test single-pass validation and the batch API
+    assert validator.validate_and_sanitize("  <b>What</b> is\x00  diabetes? ") == "What is diabetes?"
+    assert validator.validate_and_sanitize("Visit javascript:alert(1) now") is None
+    assert validator.validate_and_sanitize("ONCLICK = steal()") is None
+    batch = ["What is asthma?", "Hi", "x" * 2000, "  " + "y" * 999, dirty_input]
+    results = validator.validate_batch(batch)
+    assert results == [validator.sanitize_input(q) if validator.validate_query(q) else None
+                       for q in batch]
+    assert results[:4] == ["What is asthma?", None, None, "y" * 999]
+    print(f"✓ Batch validation: {sum(r is not None for r in results)}/{len(batch)} valid")
+    
     # Test rating validation
     print(f"✓ Rating 3 valid: {validator.validate_rating(3)}")
     print(f"✓ Rating 6 valid: {validator.validate_rating(6)} (expected False)")
@@ -154,6 +209,50 @@ def test_agents():
     return True
 
 
+def test_agent_logging():
+    """Test bounded, lazily formatted agent activity logging."""
+    print("\n" + "="*50)
+    print("Testing Agent Logging")
+    print("="*50)
+    
+    import logging
+    from base_agent import BaseAgent
+    
+    class EchoAgent(BaseAgent):
+        def process(self, input_data):
+            return input_data
+    
+    class CountingArg:
+        formatted = 0
+        
+        def __str__(self):
+            CountingArg.formatted += 1
+            return "arg"
+    
+    agent = EchoAgent("echo_001", "Echo Agent", "Echo", verbose=False, max_log_entries=10)
+    for i in range(25):
+        agent.execute(i)
+    log = agent.get_activity_log()
+    assert len(log) == 10 and log[-1].endswith("Task completed successfully")
+    print(f"✓ Activity log bounded to {len(log)} of 50 entries")
+    
+    agent.logger.setLevel(logging.WARNING)
+    try:
+        agent.log_activity("Filtered: %s", CountingArg())
+        assert CountingArg.formatted == 0 and len(agent.activity_log) == 10
+        agent.log_activity("Kept: %s", CountingArg(), level=logging.WARNING)
+        assert CountingArg.formatted == 0
+    finally:
+        agent.logger.setLevel(logging.NOTSET)
+    assert agent.get_activity_log()[-1].endswith("Kept: arg") and CountingArg.formatted == 1
+    print("✓ Filtered messages are never formatted; kept ones only when read")
+    
+    agent.clear_log()
+    assert agent.get_activity_log() == []
+    
+    return True
+
+
 def test_controller():
     """Test system controller."""
     print("\n" + "="*50)
@@ -177,6 +276,10 @@ def test_controller():
         print(f"  Log entries: {len(response.agent_logs)}")
         print(f"  First log preview: {response.agent_logs[0][:100]}...")
     
+    histograms = controller.get_latency_histograms()
+    print(f"✓ Traced stages: {', '.join(histograms)}")
+    assert histograms["query"]["count"] >= 1 and "validation" in histograms
+    
     # Test feedback handling
     feedback_response = controller.handle_feedback(
         summary_id=response.response_id,
@@ -190,6 +293,129 @@ def test_controller():
     return True
 
 
+def test_tracing():
+    """Test tracing spans, latency histograms and the JSONL exporter."""
+    print("\n" + "="*50)
+    print("Testing Tracing")
+    print("="*50)
+    
+    import json
+    import os
+    import tempfile
+    from tracing import JsonlSpanExporter, LatencyHistogram, Tracer, TracedLLM, add_span_attributes
+    from llm_cache import CachedLLM, LLMCache
+    
+    histogram = LatencyHistogram()
+    for ms in range(1, 10001):
+        histogram.record(ms / 1000)
+    for pct, expected in ((50, 5.0), (90, 9.0), (99, 9.9)):
+        assert abs(histogram.percentile(pct) - expected) / expected < 0.01
+    assert histogram.snapshot()["count"] == 10000 and len(histogram.counts) < 1000
+    print(f"✓ Histogram percentiles within 1% using {len(histogram.counts)} buckets")
+    
+    class EchoLLM:
+        model = "echo"
+        
+        def predict(self, prompt):
+            return prompt.upper()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "spans.jsonl")
+        exporter = JsonlSpanExporter(path)
+        tracer = Tracer(exporter)
+        llm = TracedLLM(CachedLLM(EchoLLM(), LLMCache()), tracer=tracer)
+        
+        with tracer.span("query") as root:
+            with tracer.span("summarize"):
+                add_span_attributes(chunks=3)
+                llm.predict("first prompt")
+                llm.predict("first prompt")
+            root.set(status="completed")
+        try:
+            with tracer.span("search"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+        exporter.close()
+        
+        with open(path, encoding="utf-8") as f:
+            spans = [json.loads(line) for line in f]
+    
+    by_name = {}
+    for span in spans:
+        by_name.setdefault(span["name"], []).append(span)
+    query, summarize = by_name["query"][0], by_name["summarize"][0]
+    calls = by_name["llm.call"]
+    assert summarize["parent_id"] == query["span_id"] and summarize["attributes"]["chunks"] == 3
+    assert all(c["parent_id"] == summarize["span_id"] and c["trace_id"] == query["trace_id"] for c in calls)
+    assert [c["attributes"]["cache_hit"] for c in calls] == [False, True]
+    assert calls[0]["attributes"]["prompt_tokens"] > 0
+    assert by_name["search"][0]["error"] == "ValueError" and by_name["search"][0]["parent_id"] is None
+    print(f"✓ {len(spans)} spans exported with nesting, attributes and errors")
+    
+    stats = tracer.stats()
+    assert stats["llm.call"]["count"] == 2 and stats["query"]["p50"] > 0
+    print(f"✓ Histograms per span: {', '.join(stats)}")
+    
+    return True
+
+
+def test_metrics():
+    """Test the metrics registry, Prometheus rendering and the scrape endpoint."""
+    print("\n" + "="*50)
+    print("Testing Metrics")
+    print("="*50)
+    
+    import threading
+    import urllib.request
+    import controller  # registers the controller gauges
+    from metrics import (MetricsRegistry, CallbackMetric, SpanHistograms,
+                         start_metrics_server, stop_metrics_server)
+    from tracing import get_tracer
+    
+    registry = MetricsRegistry()
+    requests_total = registry.counter("test_requests_total", "Requests", ["status"])
+    
+    def hammer():
+        for _ in range(1000):
+            requests_total.inc(status="ok")
+    
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    requests_total.inc(status='say "hi"')
+    assert requests_total.value(status="ok") == 8000
+    print("✓ 8000 increments from 8 threads counted without locking")
+    
+    registry.register(CallbackMetric("test_queue_depth", "Queue depth", lambda: 3))
+    with get_tracer().span("test.stage"):
+        pass
+    registry.register(SpanHistograms("test_span_seconds", "Span latency"))
+    text = registry.render()
+    assert 'test_requests_total{status="ok"} 8000' in text
+    assert 'test_requests_total{status="say \\"hi\\""} 1' in text
+    assert "# TYPE test_queue_depth gauge" in text and "test_queue_depth 3" in text
+    assert 'test_span_seconds_bucket{span="test.stage",le="+Inf"} 1' in text
+    assert 'test_span_seconds_count{span="test.stage"} 1' in text
+    print("✓ Counters, gauges and span histograms rendered in Prometheus format")
+    
+    server = start_metrics_server(port=0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as reply:
+            body = reply.read().decode("utf-8")
+            assert reply.headers["Content-Type"].startswith("text/plain")
+        assert "# TYPE health_queries_total counter" in body
+        assert "health_active_sessions" in body and "health_span_duration_seconds" in body
+        print(f"✓ Scrape endpoint served {len(body.splitlines())} lines on port {port}")
+    finally:
+        stop_metrics_server()
+    
+    return True
+
+
 def test_session_manager():
     """Test session manager."""
     print("\n" + "="*50)
@@ -223,6 +449,1358 @@ def test_session_manager():
     return True
 
 
+def test_session_expiry():
+    """Test heap-based session expiry."""
+    print("\n" + "="*50)
+    print("Testing Session Expiry")
+    print("="*50)
+    
+    import time
+    from datetime import datetime
+    from session_manager import SessionManager
+    from models import Query
+    
+    manager = SessionManager(default_timeout=0.01)  # 0.6 seconds
+    session_ids = [manager.create_session() for _ in range(200)]
+    assert manager.cleanup_expired() == 0
+    
+    time.sleep(0.35)
+    # 50 sessions stay active through the manager, one by direct activity
+    for i, session_id in enumerate(session_ids[:50]):
+        manager.update_session(session_id, query=Query(query_id=f"q{i}", text="Test query"))
+    manager.sessions[session_ids[50]].last_activity = datetime.now()
+    
+    time.sleep(0.35)
+    removed = manager.cleanup_expired()
+    print(f"✓ Removed {removed} expired sessions, {len(manager.sessions)} active")
+    assert removed == 149
+    assert manager.get_active_session_count() == 51
+    assert manager.get_session(session_ids[0]) is not None
+    assert manager.get_session(session_ids[199]) is None
+    # Superseded heap entries were discarded along the way
+    assert sum(len(shard.expiry_heap) for shard in manager._shards) == 51
+    
+    return True
+
+
+def test_session_store():
+    """Test SQLite session persistence, rehydration and LRU eviction."""
+    print("\n" + "="*50)
+    print("Testing Session Store")
+    print("="*50)
+    
+    import os
+    import tempfile
+    from session_manager import SessionManager
+    from session_store import SQLiteSessionStore
+    from models import Query, UserFeedback
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "sessions.sqlite3")
+        
+        # Writer process: only two sessions stay in memory
+        writer = SessionManager(num_shards=1, store=SQLiteSessionStore(db_path),
+                                max_cached_sessions=2)
+        session_ids = [writer.create_session() for _ in range(5)]
+        for i, session_id in enumerate(session_ids):
+            writer.update_session(session_id, query=Query(
+                query_id=f"q{i}", text=f"Query {i}", session_id=session_id))
+        writer.update_session(session_ids[0], feedback=UserFeedback(
+            feedback_id="f1", summary_id="q0", rating=5, comments="Helpful"))
+        writer.attach_reflection(session_ids[0], "q0", "Grounded")
+        assert len(writer.sessions) == 2
+        print("✓ In-memory cache bounded to 2 sessions")
+        
+        # Evicted sessions are reloaded from the store
+        history = writer.get_session_history(session_ids[0])
+        assert [q["query_id"] for q in history["queries"]] == ["q0"]
+        assert history["feedback"][0]["rating"] == 5
+        assert history["reflections"] == {"q0": "Grounded"}
+        print("✓ Evicted session rehydrated with queries, feedback and reflection")
+        writer.close()
+        
+        # A second process sharing the file sees the same sessions
+        reader = SessionManager(store=SQLiteSessionStore(db_path))
+        assert not reader.sessions
+        for i, session_id in enumerate(session_ids):
+            session = reader.get_session(session_id)
+            assert session and session.query_history[0].text == f"Query {i}"
+        assert reader.get_session("missing") is None
+        print(f"✓ {len(session_ids)} sessions restored by a new manager")
+        reader.close()
+        
+        # Sessions past the timeout are purged from the store
+        purger = SessionManager(default_timeout=0, store=SQLiteSessionStore(db_path))
+        purger.cleanup_expired()
+        purger.close()
+        restarted = SessionManager(store=SQLiteSessionStore(db_path))
+        assert restarted.get_session(session_ids[1]) is None
+        print("✓ Expired sessions purged from the store")
+        restarted.close()
+        restarted.flush()  # Returns instead of waiting on the stopped writer
+        
+        # Loads only wait for the writer when their own session has queued changes
+        import time
+        settled = SessionManager(store=SQLiteSessionStore(db_path))
+        settled_id = settled.create_session()
+        settled.close()
+        slow = SessionManager(store=SQLiteSessionStore(db_path, flush_interval=5.0))
+        busy_id = slow.create_session()
+        start = time.monotonic()
+        assert slow.get_session("unknown") is None
+        assert slow.get_session(settled_id) is not None
+        elapsed = time.monotonic() - start
+        print(f"✓ Loads beside a pending write took {elapsed * 1000:.0f} ms")
+        assert elapsed < 1.0 and slow.store.metrics["batches"] == 0
+        slow.close()
+        reopened = SessionManager(store=SQLiteSessionStore(db_path))
+        assert reopened.get_session(busy_id) is not None
+        reopened.close()
+        
+        # A session kept alive by another process is not expired from a stale copy
+        from datetime import datetime, timedelta
+        process_a = SessionManager(store=SQLiteSessionStore(db_path))
+        process_b = SessionManager(store=SQLiteSessionStore(db_path))
+        shared_id = process_a.create_session()
+        process_a.flush()
+        assert process_b.update_session(shared_id, query=Query(query_id="b1", text="From B"))
+        process_b.flush()
+        process_a.get_session(shared_id).last_activity = datetime.now() - timedelta(hours=2)
+        assert process_a.update_session(shared_id, query=Query(query_id="a1", text="From A"))
+        assert process_a.get_session(shared_id).total_queries == 2
+        print("✓ Stale cached session refreshed from the shared store")
+        process_a.close()
+        process_b.close()
+
+        # Controllers in one process share a single store for the configured file
+        import threading
+        from unittest import mock
+        import llm_config
+        from controller import SystemController
+        from session_store import get_session_store
+        llm_config.load_environment()
+        with mock.patch.dict(os.environ, {"SESSION_STORE_PATH": db_path}):
+            threads_before = threading.active_count()
+            controllers = [SystemController(async_reflection=False) for _ in range(5)]
+            shared = get_session_store()
+            assert all(c.session_manager.store is shared for c in controllers)
+            assert threading.active_count() <= threads_before + 1
+            print("✓ 5 controllers share one session store")
+            shared.close()
+            assert get_session_store() is not shared
+            get_session_store().close()
+
+    return True
+
+
+def test_session_history():
+    """Test the bounded session history and its paginated view."""
+    print("\n" + "="*50)
+    print("Testing Session History Pagination")
+    print("="*50)
+    
+    import os
+    import tempfile
+    from session_manager import SessionManager
+    from session_store import SQLiteSessionStore
+    from models import Query
+    
+    # In memory only: the window is bounded and older entries are dropped
+    manager = SessionManager(history_limit=5)
+    session_id = manager.create_session()
+    for i in range(12):
+        manager.update_session(session_id, query=Query(query_id=f"q{i}", text=f"Query {i}"))
+        manager.attach_reflection(session_id, f"q{i}", "ok")
+    session = manager.get_session(session_id)
+    assert len(session.query_history) == 5 and session.total_queries == 12
+    assert sorted(session.reflections) == ["q10", "q11", "q7", "q8", "q9"]
+    page = manager.get_session_history(session_id, offset=1, limit=2)
+    assert [q["query_id"] for q in page["queries"]] == ["q9", "q10"]
+    assert page["total_queries"] == 12 and page["available_queries"] == 5
+    assert not manager.get_session_history(session_id, offset=5, limit=2)["queries"]
+    print("✓ Ring buffer keeps 5 of 12 queries; pages served from the cached window")
+    
+    # With a store: pages past the window are read back from it
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = SessionManager(store=SQLiteSessionStore(os.path.join(tmp, "sessions.sqlite3")),
+                                 history_limit=5)
+        session_id = manager.create_session()
+        for i in range(12):
+            manager.update_session(session_id, query=Query(query_id=f"q{i}", text=f"Query {i}"))
+        
+        page = manager.get_session_history(session_id, offset=3, limit=4)
+        assert [q["query_id"] for q in page["queries"]] == ["q5", "q6", "q7", "q8"]
+        page = manager.get_session_history(session_id, offset=10, limit=4)
+        assert [q["query_id"] for q in page["queries"]] == ["q0", "q1"]
+        assert page["available_queries"] == 12
+        print("✓ Older pages spilled to and read back from the store")
+        
+        restarted = SessionManager(store=manager.store, history_limit=5)
+        session = restarted.get_session(session_id)
+        assert [q.query_id for q in session.query_history] == ["q7", "q8", "q9", "q10", "q11"]
+        assert session.total_queries == 12
+        print("✓ Rehydration loads only the most recent window")
+        manager.close()
+    
+    # A one-entry window still evicts (with its reflection); zero is rejected
+    from models import SessionState
+    tiny = SessionManager(history_limit=1)
+    session_id = tiny.create_session()
+    tiny.update_session(session_id, query=Query(query_id="a", text="First query"))
+    tiny.attach_reflection(session_id, "a", "Grounded")
+    tiny.update_session(session_id, query=Query(query_id="b", text="Second query"))
+    session = tiny.get_session(session_id)
+    assert [q.query_id for q in session.query_history] == ["b"]
+    assert session.total_queries == 2 and session.reflections == {}
+    for make in (lambda: SessionManager(history_limit=0),
+                 lambda: SessionState(session_id="s", history_limit=0)):
+        try:
+            make()
+            assert False, "history_limit=0 accepted"
+        except ValueError:
+            pass
+    print("✓ history_limit 1 evicts, 0 is rejected")
+    
+    return True
+
+
+def test_session_concurrency():
+    """Stress the sharded session manager from many threads."""
+    print("\n" + "="*50)
+    print("Testing Session Manager Concurrency")
+    print("="*50)
+    
+    import random
+    import threading
+    import time
+    from session_manager import SessionManager
+    from models import Query, UserFeedback
+    
+    manager = SessionManager(default_timeout=30)
+    shared_ids = [manager.create_session() for _ in range(64)]
+    num_threads = 16
+    ops_per_thread = 2000
+    updates = [0] * num_threads
+    errors = []
+    
+    def hammer(worker: int):
+        rng = random.Random(worker)
+        own_ids = []
+        try:
+            for i in range(ops_per_thread):
+                op = rng.random()
+                if op < 0.1:
+                    own_ids.append(manager.create_session())
+                elif op < 0.5:
+                    session_id = rng.choice(shared_ids + own_ids)
+                    query = Query(query_id=f"{worker}-{i}", text="Test query", session_id=session_id)
+                    if manager.update_session(session_id, query=query):
+                        updates[worker] += 1
+                elif op < 0.6:
+                    feedback = UserFeedback(feedback_id=f"f{worker}-{i}", summary_id="s1", rating=4)
+                    manager.update_session(rng.choice(shared_ids), feedback=feedback)
+                elif op < 0.7:
+                    manager.attach_reflection(rng.choice(shared_ids), f"{worker}-{i}", "ok")
+                elif op < 0.95:
+                    manager.get_session_history(rng.choice(shared_ids + own_ids))
+                else:
+                    manager.cleanup_expired()
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=hammer, args=(i,)) for i in range(num_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    total_ops = num_threads * ops_per_thread
+    recorded = sum(session.total_queries for session in manager.sessions.values())
+    print(f"✓ {total_ops} ops from {num_threads} threads: {total_ops / elapsed:,.0f} ops/sec")
+    print(f"✓ {recorded} queries recorded across {manager.get_active_session_count()} sessions")
+    assert not errors, errors
+    assert recorded == sum(updates)
+    
+    return True
+
+
+def test_reflection_worker():
+    """Test background reflection worker."""
+    print("\n" + "="*50)
+    print("Testing Reflection Worker")
+    print("="*50)
+    
+    from session_manager import SessionManager
+    from reflection_worker import ReflectionWorker
+    
+    manager = SessionManager(default_timeout=30)
+    session_id = manager.create_session()
+    
+    worker = ReflectionWorker(manager, max_queue_size=4,
+                              evaluator=lambda text, sources: f"Report for: {text}")
+    print(f"✓ Reflection pending before submit: {manager.get_reflection(session_id, 'q1')}")
+    
+    queued = worker.submit(session_id, "q1", "Diabetes summary")
+    worker.join()
+    report = manager.get_reflection(session_id, "q1")
+    print(f"✓ Reflection queued: {queued}")
+    print(f"✓ Reflection attached: {report}")
+    assert report == "Report for: Diabetes summary"
+    
+    history = manager.get_session_history(session_id)
+    print(f"✓ Reflections in history: {len(history['reflections'])}")
+    worker.stop(timeout=1)
+    assert worker.submit(session_id, "q2", "Restarted") and not worker.stop(timeout=1)
+    assert manager.get_reflection(session_id, "q2") == "Report for: Restarted"
+    print("✓ Queued work drained on stop, worker restarts on submit")
+
+    # Discarded controllers stop their worker threads
+    import gc
+    import threading
+    import time
+    import llm_config
+    from controller import SystemController
+    llm_config.load_environment()
+    threads_before = threading.active_count()
+    for _ in range(20):
+        controller = SystemController()
+        controller.reflection_worker.submit("s", "q", "Summary",
+                                            evaluator=lambda text, sources: "ok")
+    del controller
+    gc.collect()
+    deadline = time.monotonic() + 5
+    while threading.active_count() > threads_before and time.monotonic() < deadline:
+        time.sleep(0.05)
+    print(f"✓ Threads after 20 discarded controllers: {threads_before} -> {threading.active_count()}")
+    assert threading.active_count() <= threads_before
+
+    return True
+
+
+def test_llm_cache():
+    """Test LLM response cache."""
+    print("\n" + "="*50)
+    print("Testing LLM Cache")
+    print("="*50)
+    
+    import os
+    import tempfile
+    from llm_cache import LLMCache, CachedLLM
+    
+    class CountingLLM:
+        model = "ollama/test-model"
+        calls = 0
+        
+        def call(self, messages):
+            CountingLLM.calls += 1
+            return f"Answer to: {messages[-1]['content']}"
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.sqlite3")
+        llm = CachedLLM(CountingLLM(), LLMCache(max_entries=2, db_path=db_path))
+        print(f"✓ Cached LLM created: {llm}")
+        
+        prompt = [{"role": "user", "content": "Plan research for diabetes"}]
+        first = llm.call(prompt)
+        second = llm.call(prompt)
+        print(f"✓ Repeated call served from cache: {first == second}")
+        assert CountingLLM.calls == 1
+        
+        # A fresh memory tier is rehydrated from the SQLite tier
+        reloaded = CachedLLM(CountingLLM(), LLMCache(max_entries=2, db_path=db_path))
+        assert reloaded.call(prompt) == first
+        assert CountingLLM.calls == 1
+        
+        stats = reloaded.cache.stats()
+        print(f"✓ Disk hits after reload: {stats['disk_hits']}")
+        print(f"  Hit rate: {stats['hit_rate']:.2f}")
+        
+        # Memory hits do not wait for disk I/O in progress
+        import threading
+        cache = reloaded.cache
+        key = next(iter(cache._memory))
+        hits = []
+        with cache._db_lock:
+            reader = threading.Thread(target=lambda: hits.append(cache.get(key)))
+            reader.start()
+            reader.join(timeout=1.0)
+        assert hits == [first]
+        print("✓ Memory hit served while the disk tier was busy")
+        
+        # A locked database file (another worker process writing) skips the disk tier
+        import sqlite3
+        locked = CachedLLM(CountingLLM(), LLMCache(db_path=db_path, busy_timeout=0.05))
+        other_process = sqlite3.connect(db_path)
+        other_process.execute("BEGIN EXCLUSIVE")
+        try:
+            answer = locked.call([{"role": "user", "content": "Plan research for asthma"}])
+        finally:
+            other_process.rollback()
+            other_process.close()
+        assert answer == "Answer to: Plan research for asthma"
+        assert locked.cache.stats()["disk_errors"] >= 1
+        assert locked.call([{"role": "user", "content": "Plan research for asthma"}]) == answer
+        print(f"✓ Locked disk tier skipped: {locked.cache.stats()['disk_errors']} disk error(s)")
+    
+    # Concurrent first requests share one process-wide cache
+    import threading
+    import llm_config
+    from unittest import mock
+    llm_config.load_environment()
+    with mock.patch.object(llm_config, "_llm_cache", None), \
+            mock.patch.dict(os.environ, {"LLM_CACHE_ENABLED": "true", "LLM_CACHE_PATH": ""}):
+        caches = []
+        threads = [threading.Thread(target=lambda: caches.append(llm_config.get_llm_cache()))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len({id(cache) for cache in caches}) == 1
+    print("✓ One shared cache built under concurrent first use")
+    
+    return True
+
+
+def _start_stub_llm_server(delay=0.0, connections=None):
+    """Start a local Ollama-compatible stub server. Returns (server, base_url)."""
+    import json
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class StubOllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+        
+        def setup(self):
+            super().setup()
+            if connections is not None:
+                connections.append(self.client_address)
+        
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(delay)
+            body = json.dumps({"message": {"content": f"echo {request['model']}"}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllamaHandler)
+    server.daemon_threads = True
+    server.block_on_close = False
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_llm_clients():
+    """Test pooled keep-alive provider clients against a local stub server."""
+    print("\n" + "="*50)
+    print("Testing LLM Provider Clients")
+    print("="*50)
+    
+    from llm_clients import get_provider_client
+    
+    connections = []
+    server, base_url = _start_stub_llm_server(connections=connections)
+    
+    try:
+        # Two "agents" with different models share one pool per base URL
+        planner_llm = get_provider_client("ollama", "model-a", base_url=base_url)
+        summarizer_llm = get_provider_client("ollama", "model-b", base_url=base_url)
+        assert planner_llm.pool is summarizer_llm.pool
+        
+        for _ in range(10):
+            assert planner_llm.predict("plan") == "echo model-a"
+            assert summarizer_llm.call([{"role": "user", "content": "sum"}]) == "echo model-b"
+        
+        stats = planner_llm.pool.stats()
+        print(f"✓ Requests sent: {stats['requests']}")
+        print(f"✓ TCP connections opened by server: {len(connections)}")
+        assert len(connections) == 1
+        assert stats["connections_created"] == 1
+    finally:
+        planner_llm.pool.close()
+        server.shutdown()
+        server.server_close()
+    
+    # A provider client without chat() fails when constructed
+    from llm_clients import ConnectionPool, ProviderClient
+    
+    class IncompleteClient(ProviderClient):
+        provider = "incomplete"
+    
+    try:
+        IncompleteClient("model", ConnectionPool("http://127.0.0.1:1"))
+        assert False, "incomplete client constructed"
+    except TypeError:
+        print("✓ Incomplete provider client rejected at construction")
+    
+    return True
+
+
+def test_rate_limiter():
+    """Test token-bucket rate limiter and concurrency cap."""
+    print("\n" + "="*50)
+    print("Testing Rate Limiter")
+    print("="*50)
+    
+    import threading
+    import time
+    from rate_limiter import ProviderLimiter, RateLimitExceeded
+    
+    # 600 requests/min refills one request every 0.1s after the burst of 600
+    limiter = ProviderLimiter(requests_per_minute=600, tokens_per_minute=0, max_in_flight=2)
+    limiter.request_bucket.tokens = 1
+    
+    limiter.acquire()
+    limiter.release()
+    start = time.monotonic()
+    limiter.acquire()
+    limiter.release()
+    waited = time.monotonic() - start
+    print(f"✓ Second request waited for refill: {waited:.3f}s")
+    assert waited >= 0.05
+    
+    # Max in flight: a third caller with a short deadline is rejected
+    limiter = ProviderLimiter(max_in_flight=2)
+    limiter.acquire()
+    limiter.acquire()
+    try:
+        limiter.acquire(timeout=0.05)
+        rejected = False
+    except RateLimitExceeded:
+        rejected = True
+    print(f"✓ Caller rejected past deadline: {rejected}")
+    assert rejected
+    
+    # Queued callers are served in arrival order
+    limiter = ProviderLimiter(max_in_flight=1)
+    limiter.acquire()
+    order = []
+    
+    def worker(n):
+        with limiter.slot():
+            order.append(n)
+    
+    threads = []
+    for n in range(3):
+        thread = threading.Thread(target=worker, args=(n,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.02)
+    limiter.release()
+    for thread in threads:
+        thread.join(timeout=1)
+    print(f"✓ FIFO order: {order}")
+    assert order == [0, 1, 2]
+    print(f"  Stats: {limiter.stats()}")
+    
+    return True
+
+
+def test_llm_router():
+    """Test latency-aware routing and hedged requests against local stub servers."""
+    print("\n" + "="*50)
+    print("Testing LLM Router")
+    print("="*50)
+    
+    import time
+    from llm_clients import get_provider_client
+    from llm_router import LatencyRouter
+    
+    slow_server, slow_url = _start_stub_llm_server(delay=0.3)
+    fast_server, fast_url = _start_stub_llm_server(delay=0.0)
+    
+    try:
+        slow = get_provider_client("ollama", "slow-model", base_url=slow_url)
+        fast = get_provider_client("ollama", "fast-model", base_url=fast_url)
+        
+        # Once both backends are measured, calls go to the faster one
+        router = LatencyRouter([slow, fast], min_samples=1)
+        router.predict("warm up slow")
+        router.predict("warm up fast")
+        print(f"✓ Routing order after warm-up: {[router.names[i] for i in router.ranked_backends()]}")
+        assert router.predict("which?") == "echo fast-model"
+        stats = router.stats()
+        print(f"  p50 slow={stats['ollama/slow-model']['p50']:.3f}s "
+              f"fast={stats['ollama/fast-model']['p50']:.3f}s")
+        
+        # Hedging: the slow primary is raced by the fast backend after 50ms
+        hedged = LatencyRouter([slow, fast], hedge_after=0.05)
+        start = time.monotonic()
+        result = hedged.predict("hedge me")
+        elapsed = time.monotonic() - start
+        print(f"✓ Hedged result: {result} in {elapsed:.3f}s")
+        assert result == "echo fast-model"
+        assert elapsed < 0.25
+        assert hedged.metrics["hedge_wins"] == 1
+        
+        # A backend that only fails is ranked last, behind unmeasured ones
+        class DeadBackend:
+            provider, model = "stub", "dead"
+            
+            def predict(self, prompt):
+                raise ConnectionError("backend down")
+        
+        failover = LatencyRouter([DeadBackend(), fast], min_samples=3)
+        assert failover.predict("fail over") == "echo fast-model"
+        print(f"✓ Order with a dead backend: {[failover.names[i] for i in failover.ranked_backends()]}")
+        assert failover.ranked_backends() == [1, 0]
+        
+        # Hedged attempts keep the caller's request deadline
+        from admission import Deadline, deadline_scope, remaining_time
+        
+        class DeadlineEcho:
+            provider = "stub"
+            
+            def __init__(self, model, delay):
+                self.model, self.delay = model, delay
+            
+            def predict(self, prompt):
+                time.sleep(self.delay)
+                return remaining_time()
+        
+        hedged = LatencyRouter([DeadlineEcho("slow", 0.2), DeadlineEcho("fast", 0.0)], hedge_after=0.05)
+        with deadline_scope(Deadline(10.0)):
+            remaining = hedged.predict("deadline")
+        print(f"✓ Deadline seen by the hedged backend: {remaining:.2f}s left")
+        assert remaining is not None and 9.0 < remaining <= 10.0
+    finally:
+        for server in (slow_server, fast_server):
+            server.shutdown()
+            server.server_close()
+    
+    return True
+
+
+def test_context_packer():
+    """Test token-budgeted packing of retrieved chunks."""
+    print("\n" + "="*50)
+    print("Testing Context Packer")
+    print("="*50)
+    
+    from tools.context_packer import count_tokens, fit_context, pack_chunks, split_chunks
+    
+    retrieved = (
+        "Retrieved 3 document chunks:\n\n"
+        "Type 2 Diabetes affects blood sugar. Symptoms include thirst.\n\n"
+        + "Sleep is essential for good health. " * 40 + "\n\n"
+        "Regular physical activity reduces risk of diabetes."
+    )
+    chunks = split_chunks(retrieved)
+    print(f"✓ Chunks recovered: {len(chunks)}")
+    assert len(chunks) == 3
+    
+    # The long second chunk does not fit, the shorter third one still does
+    budget = count_tokens(chunks[0]) + count_tokens(chunks[2]) + 10
+    packed, used = pack_chunks(chunks, budget)
+    print(f"✓ Packed {len(packed)} whole chunks in {used}/{budget} tokens")
+    assert packed == [chunks[0], chunks[2]]
+    
+    context, prompt_tokens = fit_context("Summarize:\n", chunks, context_window=60, reserve_output=20)
+    print(f"✓ Prompt fits window: {prompt_tokens} <= 40 tokens")
+    assert prompt_tokens <= 40 and context.endswith(".")
+    
+    # The traced agent LLM still reports its provider-qualified model
+    from unittest import mock
+    from llm_config import get_agent_llm, load_environment
+    from tools.context_packer import get_context_window, model_name
+    load_environment()  # So .env does not override the patched settings
+    with mock.patch.dict(os.environ, {"USE_OLLAMA": "true", "OLLAMA_MODEL": "llama3.2",
+                                      "OLLAMA_NUM_CTX": "2048"}):
+        name = model_name(get_agent_llm())
+        print(f"✓ Agent LLM model name: {name} ({get_context_window(name)} tokens)")
+        assert name == "ollama/llama3.2"
+        assert get_context_window(name) == 2048
+    
+    # Routed and cached, the smallest backend window still applies
+    from llm_cache import CachedLLM, LLMCache
+    from llm_router import LatencyRouter
+    from tracing import TracedLLM
+    
+    class Backend:
+        def __init__(self, provider, model):
+            self.provider, self.model = provider, model
+    
+    router = LatencyRouter([Backend("ollama", "mistral:latest"),
+                            Backend("mistral", "mistral-small-latest")])
+    with mock.patch.dict(os.environ, {"OLLAMA_NUM_CTX": "2048"}):
+        name = model_name(TracedLLM(CachedLLM(router, LLMCache())))
+        print(f"✓ Routed, cached LLM model name: {name} ({get_context_window(name)} tokens)")
+        assert name == "ollama/mistral:latest,mistral/mistral-small-latest"
+        assert get_context_window(name) == 2048
+    
+    return True
+
+
+def test_map_reduce_summary():
+    """Test parallel map-reduce summarization with cached partials."""
+    print("\n" + "="*50)
+    print("Testing Map-Reduce Summarization")
+    print("="*50)
+    
+    import threading
+    import time
+    from agents.summarize_agent import SummarizationAgent
+    
+    class SlowLLM:
+        provider = "ollama"
+        model = "stub"
+        
+        def __init__(self):
+            self.calls = 0
+            self.lock = threading.Lock()
+        
+        def call(self, messages):
+            with self.lock:
+                self.calls += 1
+            time.sleep(0.1)
+            return "Partial or merged summary."
+    
+    summarizer = SummarizationAgent(mode="auto", map_reduce_min_chunks=10, max_workers=20)
+    summarizer.verbose = False
+    summarizer.llm = SlowLLM()
+    
+    chunks = [f"Health fact number {i} about diabetes prevention." for i in range(20)]
+    retrieved = "Retrieved 20 document chunks:\n\n" + "\n\n".join(chunks)
+    print(f"✓ Map-reduce selected: {summarizer.use_map_reduce(chunks)}")
+    
+    start = time.monotonic()
+    summary = summarizer.summarize(retrieved)
+    elapsed = time.monotonic() - start
+    print(f"✓ 20 chunks summarized in {elapsed:.2f}s with {summarizer.llm.calls} LLM calls")
+    assert "Generated by AI" in summary
+    assert summarizer.llm.calls == 21
+    assert elapsed < 0.6
+    
+    # Partials are cached by chunk id: only the reduce call runs again
+    summarizer.summarize(retrieved)
+    print(f"✓ Repeat run LLM calls: {summarizer.llm.calls - 21}")
+    assert summarizer.llm.calls == 22
+    
+    return True
+
+
+def test_extractive_summary():
+    """Test TextRank extractive summarization for the no-LLM path."""
+    print("\n" + "="*50)
+    print("Testing Extractive Summarizer")
+    print("="*50)
+    
+    import time
+    from tools.extractive import extractive_summary
+    
+    retrieved = (
+        "Retrieved 3 document chunks:\n\n"
+        "Sleep is essential for good health. Adults generally need 7 or more hours of sleep. "
+        "Poor sleep is linked to diabetes and heart disease.\n\n"
+        "Type 2 Diabetes affects the way the body processes blood sugar. "
+        "Symptoms of diabetes include increased thirst, frequent urination, and fatigue. "
+        "Risk factors for diabetes include obesity and inactivity.\n\n"
+        "Hand hygiene prevents many infectious diseases. Wash hands for at least 20 seconds."
+    )
+    
+    extractive_summary(retrieved, query="warm up")
+    start = time.perf_counter()
+    sentences = extractive_summary(retrieved, query="What are the symptoms of diabetes?",
+                                   max_sentences=2)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"✓ Selected sentences ({elapsed_ms:.2f} ms):")
+    for sentence in sentences:
+        print(f"  - {sentence}")
+    assert len(sentences) == 2
+    assert any("Symptoms of diabetes" in s for s in sentences)
+    
+    # A failed embedding call falls back once; only a failed model load disables it
+    from unittest import mock
+    import tools.extractive as extractive
+    import tools.rag_tool as rag_tool
+    
+    class FlakyEmbeddings:
+        def __init__(self):
+            self.calls = 0
+        
+        def embed_documents(self, texts):
+            self.calls += 1
+            if self.calls == 1:
+                raise RuntimeError("temporarily unavailable")
+            return [[1.0, 0.0, 0.0] for _ in texts]
+    
+    flaky = FlakyEmbeddings()
+    with mock.patch.object(extractive, "_model_available", True), \
+            mock.patch.object(extractive, "_embedding_cache", extractive.OrderedDict()), \
+            mock.patch.object(rag_tool, "get_embeddings", lambda: flaky):
+        assert extractive.embed_texts(["first try"]).shape[1] == extractive.HASH_DIM
+        assert extractive._model_available
+        assert extractive.embed_texts(["second try"]).shape == (1, 3)
+        print("✓ Transient embedding failure fell back for one call only")
+        
+        def missing_model():
+            raise OSError("model files not found")
+        
+        with mock.patch.object(rag_tool, "get_embeddings", missing_model):
+            extractive.embed_texts(["third try"])
+            assert not extractive._model_available
+        print("✓ Unloadable model disabled for the process")
+    
+    return True
+
+
+def test_groundedness():
+    """Test embedding-based groundedness scoring in the Reflective Agent."""
+    print("\n" + "="*50)
+    print("Testing Groundedness Scorer")
+    print("="*50)
+    
+    from agents.reflective_agent import ReflectiveAgent
+    
+    sources = [
+        "Type 2 Diabetes affects the way the body processes blood sugar. "
+        "Symptoms include increased thirst, frequent urination, hunger, and fatigue.",
+        "Hand hygiene such as washing hands with soap prevents infectious diseases.",
+    ]
+    grounded = (
+        "Health Research Summary\n"
+        "=====\n\n"
+        "Symptoms of type 2 diabetes include increased thirst, frequent urination, and fatigue.\n"
+        "Washing hands with soap prevents infectious diseases.\n"
+    )
+    ungrounded = "Quantum computers use qubits arranged in superconducting circuits for cryptography."
+    
+    reflector = ReflectiveAgent()
+    reflector.verbose = False
+    good = reflector.check_groundedness(grounded, sources)
+    bad = reflector.check_groundedness(ungrounded, sources)
+    print(f"✓ Grounded summary: support {good['support_rate']:.0%}, "
+          f"coverage {good['coverage']:.0%}, factuality {good['factuality']:.1f}")
+    print(f"✓ Ungrounded summary: support {bad['support_rate']:.0%}, "
+          f"factuality {bad['factuality']:.1f}")
+    assert len(good["sentences"]) == 2
+    assert good["factuality"] > bad["factuality"]
+    assert reflector.is_well_grounded(good) and not reflector.is_well_grounded(bad)
+    
+    # Well-grounded summaries are evaluated locally without an LLM call
+    class FailingLLM:
+        def call(self, messages):
+            raise AssertionError("LLM should not be called")
+    
+    reflector.llm = FailingLLM()
+    report = reflector.evaluate_summary(grounded, sources=sources)
+    print(f"✓ Local report generated ({len(report)} chars)")
+    assert "Grounding: 2/2" in report
+    
+    return True
+
+
+def test_quality_gate():
+    """Test confidence-based stage skipping in the pipeline."""
+    print("\n" + "="*50)
+    print("Testing Quality Gate")
+    print("="*50)
+    
+    import app
+    from quality_gate import QualityGate
+    from agents.reflective_agent import ReflectiveAgent
+    from agents.summarize_agent import SummarizationAgent
+    
+    gate = QualityGate(retrieval_threshold=0.6)
+    gate.observe("planner", 2.0)
+    
+    # Planner is skipped only for a templated intent with confident retrieval
+    query = "What are the symptoms of diabetes?"
+    plan = app.gate_planner(query, [0.82, 0.5], "symptoms", gate=gate)
+    print(f"✓ Template plan used ({len(plan)} chars)")
+    assert plan and query in plan
+    assert app.gate_planner(query, [0.3], "symptoms", gate=gate) is None
+    assert app.gate_planner("Tell me about the liver", [0.9], "general", gate=gate) is None
+    
+    planner_stats = [row for row in gate.stats() if row["stage"] == "planner"]
+    print(f"✓ Planner stats: {planner_stats}")
+    assert sum(row["skipped"] for row in planner_stats) == 1
+    assert sum(row["saved_seconds"] for row in planner_stats) == 2.0
+
+    # The crew's search task works from the passages already retrieved
+    description = app._search_task_description(query, "Passage about diabetes.", plan)
+    assert "Passage about diabetes." in description and plan in description
+    assert "Do not search again" in app._search_task_description(query, "Passage.")
+    print("✓ Crew search task reuses the scored retrieval")
+
+    # Decisions go to the agent log at DEBUG, not to stdout
+    import logging
+    records = []
+    capture = logging.Handler(logging.DEBUG)
+    capture.emit = records.append
+    gate._log.addHandler(capture)
+    previous = gate._log.level
+    try:
+        gate.decide("planner", False, "general", "quiet")
+        gate._log.setLevel(logging.DEBUG)
+        gate.decide("planner", True, "general", "logged")
+    finally:
+        gate._log.removeHandler(capture)
+        gate._log.setLevel(previous)
+    assert [r.getMessage().endswith("logged (saved ~2.00s)") for r in records] == [True]
+    print(f"✓ Gate decision logged at DEBUG: {records[0].getMessage()}")
+    
+    class FailingLLM:
+        def call(self, messages):
+            raise AssertionError("LLM should not be called")
+    
+    class StubLLM:
+        def __init__(self):
+            self.calls = 0
+        def call(self, messages):
+            self.calls += 1
+            return "Reflection from the LLM."
+    
+    sources = [
+        "Type 2 Diabetes affects the way the body processes blood sugar. "
+        "Symptoms include increased thirst, frequent urination, hunger, and fatigue.",
+        "Hand hygiene such as washing hands with soap prevents infectious diseases.",
+    ]
+    grounded = (
+        "Health Research Summary\n"
+        "=====\n\n"
+        "Key findings: symptoms of type 2 diabetes include increased thirst, frequent urination, "
+        "and fatigue, because diabetes affects the way the body processes blood sugar.\n"
+        "Washing hands with soap prevents infectious diseases, an important hygiene measure.\n"
+    )
+    
+    reflector = ReflectiveAgent()
+    reflector.verbose = False
+    summarizer = SummarizationAgent()
+    summarizer.verbose = False
+    summarizer.llm = None
+    app._thread_agents.reflective = reflector
+    app._thread_agents.summarizer = summarizer
+    try:
+        # Scores clear the thresholds: no LLM reflection and no re-summarization
+        reflector.llm = FailingLLM()
+        report, revised = app.reflect_summary(grounded, sources, "symptoms", gate=gate)
+        print(f"✓ Grounded summary reflected locally ({len(report)} chars)")
+        assert revised is None
+        
+        # Below threshold: LLM reflection runs and the summary is revised
+        reflector.llm = StubLLM()
+        report, revised = app.reflect_summary("Quantum computers use qubits.", sources,
+                                              "general", gate=gate)
+        print(f"✓ Weak summary revised ({len(revised)} chars)")
+        assert reflector.llm.calls == 1 and "Reflection from the LLM." in report
+        assert revised and "Incorporated Improvements" in revised
+    finally:
+        del app._thread_agents.reflective
+        del app._thread_agents.summarizer
+    
+    stages = {(row["query_class"], row["stage"]): row for row in gate.stats()}
+    assert stages[("symptoms", "reflection")]["skipped"] == 1
+    assert stages[("general", "reflection")]["skipped"] == 0
+    assert stages[("general", "resummarize")]["skipped"] == 0
+    
+    return True
+
+
+def test_plan_templates():
+    """Test intent clustering and the plan template cache in the Planner Agent."""
+    print("\n" + "="*50)
+    print("Testing Plan Template Cache")
+    print("="*50)
+    
+    import agents.planner_agent as planner_module
+    from agents.planner_agent import PlannerAgent
+    from tools.intent_index import query_topic
+    
+    assert query_topic("What are the symptoms of type 2 diabetes?") == "type 2 diabetes"
+    
+    class StubLLM:
+        def __init__(self):
+            self.calls = 0
+        def call(self, messages):
+            self.calls += 1
+            return "1. List foods that support the liver\n2. Check guidance on the liver"
+    
+    saved_index = planner_module._intent_index
+    planner_module._intent_index = None
+    try:
+        planner = PlannerAgent()
+        planner.verbose = False
+        planner.llm = StubLLM()
+        
+        # Known intent: filled in locally from the template
+        plan = planner.create_plan("What are the symptoms of asthma?")
+        print(f"✓ Intent: {planner.classify_intent('What are the symptoms of asthma?')}")
+        assert planner.llm.calls == 0
+        assert "asthma" in plan and "symptoms" in plan
+        
+        # Unseen intent: the LLM plans once and the plan becomes a new intent
+        unseen = planner.create_plan("What foods are good for the liver?")
+        assert planner.llm.calls == 1 and "liver" in unseen
+        learned = planner.create_plan("What foods are good for the kidneys?")
+        print(f"✓ Learned template reused:\n{learned}")
+        assert planner.llm.calls == 1
+        assert "kidneys" in learned and "liver" not in learned
+        
+        counts = planner_module.get_intent_index().stats()
+        print(f"✓ Intent counts: {counts}")
+        assert counts["symptoms"] == 6 and counts["learned_1"] == 2
+    finally:
+        planner_module._intent_index = saved_index
+    
+    return True
+
+
+def test_batch_queries():
+    """Test batch query handling on the system controller."""
+    print("\n" + "="*50)
+    print("Testing Batch Query Processing")
+    print("="*50)
+    
+    import controller as controller_module
+    from controller import SystemController
+    
+    pipeline_calls = []
+    original_pipeline = controller_module.run_pipeline
+    
+    def counting_pipeline(user_query, reflect=True, retrieved=None):
+        pipeline_calls.append(user_query)
+        assert retrieved is not None, "retrieval should come from the batch search"
+        return original_pipeline(user_query, reflect=reflect, retrieved=retrieved)
+    
+    controller = SystemController(async_reflection=False)
+    queries = [
+        "What are diabetes symptoms?",
+        "",
+        "What are diabetes symptoms?",
+        "How can I prevent heart disease?",
+    ]
+    controller_module.run_pipeline = counting_pipeline
+    try:
+        responses = controller.handle_batch(queries, concurrency=2)
+    finally:
+        controller_module.run_pipeline = original_pipeline
+    
+    print(f"✓ {len(responses)} responses, {len(pipeline_calls)} pipeline runs")
+    assert len(responses) == len(queries)
+    assert len(pipeline_calls) == 2
+    assert [r.status for r in responses] == ["completed", "failed", "completed", "completed"]
+    assert responses[0].query.text == queries[0] and responses[3].query.text == queries[3]
+    assert responses[0].agent_logs == responses[2].agent_logs
+    assert responses[0].query.query_id != responses[2].query.query_id
+
+    # The batch's query embeddings are reused for intent matching, not recomputed
+    import numpy as np
+    from tools import extractive
+    unique = ["What causes asthma attacks?", "How is asthma treated?"]
+    vectors = np.arange(2 * 4, dtype=np.float32).reshape(2, 4) + 1
+    original_search_agent = controller_module.SearchAgent
+    
+    class VectorSearchAgent:
+        def retrieve_batch(self, queries):
+            return [("", []) for _ in queries], vectors
+    
+    def no_embedding(texts):
+        raise AssertionError("queries embedded twice")
+    
+    controller_module.SearchAgent = VectorSearchAgent
+    controller_module.embed_texts = no_embedding
+    controller_module.run_pipeline = lambda user_query, reflect=True, retrieved=None: {
+        "output": user_query, "retrieved": "", "summary": ""}
+    try:
+        controller.handle_batch(unique, concurrency=1)
+    finally:
+        controller_module.SearchAgent = original_search_agent
+        controller_module.embed_texts = extractive.embed_texts
+        controller_module.run_pipeline = original_pipeline
+    assert all(np.array_equal(extractive._embedding_cache[q], v) for q, v in zip(unique, vectors))
+    print("✓ Batch query embeddings seeded into the intent embedding cache")
+
+    return True
+
+
+def test_rag_vector_search():
+    """Test the FAISS vector search helper against LangChain's public search."""
+    print("\n" + "="*50)
+    print("Testing RAG Vector Search")
+    print("="*50)
+
+    try:
+        from langchain_community.vectorstores import FAISS
+        from langchain_core.embeddings import Embeddings
+        import faiss  # noqa: F401
+    except ImportError as e:
+        print(f"  RAG vector search test skipped (FAISS not installed): {e}")
+        return True
+
+    import numpy as np
+    from tools.rag_tool import _search_by_vectors
+
+    class HashEmbeddings(Embeddings):
+        def embed_documents(self, texts):
+            return [self.embed_query(text) for text in texts]
+
+        def embed_query(self, text):
+            rng = np.random.default_rng(sum(map(ord, text)))
+            return rng.random(16).tolist()
+
+    texts = [f"Health document number {i} about topic {i % 3}" for i in range(12)]
+    embeddings = HashEmbeddings()
+    queries = ["diabetes symptoms", "heart disease prevention"]
+    for normalize in (False, True):
+        store = FAISS.from_texts(texts, embeddings, normalize_L2=normalize)
+        vectors = np.asarray(embeddings.embed_documents(queries), dtype=np.float32)
+        batch = _search_by_vectors(store, vectors, k=4)
+        for query, hits in zip(queries, batch):
+            expected = [(d.page_content, score) for d, score
+                        in store.similarity_search_with_relevance_scores(query, k=4)]
+            assert [doc for doc, _ in hits] == [doc for doc, _ in expected]
+            assert np.allclose([s for _, s in hits], [s for _, s in expected], atol=1e-5)
+        print(f"✓ Batch search matches LangChain relevance search (normalize_L2={normalize})")
+
+    return True
+
+
+def test_lazy_imports():
+    """Test that a cold controller import defers CrewAI, LangChain and dotenv."""
+    print("\n" + "="*50)
+    print("Testing Lazy Imports")
+    print("="*50)
+    
+    import json
+    import subprocess
+    
+    deferred = ["crewai", "langchain_community", "langchain_core", "sentence_transformers", "dotenv"]
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import controller\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps([elapsed, [m for m in {deferred!r} if m in sys.modules]]))"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0, result.stderr
+    elapsed, loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    print(f"✓ Cold import of controller: {elapsed * 1000:.0f} ms")
+    assert loaded == [], f"imported eagerly: {loaded}"
+    print(f"✓ Deferred until first use: {', '.join(deferred)}")
+    
+    from llm_config import load_environment
+    load_environment()
+    load_environment()
+    assert "dotenv" in sys.modules
+    print("✓ .env loaded on demand")
+    
+    return True
+
+
+def test_batch_runner():
+    """Test the offline JSONL batch runner, including resuming from a checkpoint."""
+    print("\n" + "="*50)
+    print("Testing Batch Runner")
+    print("="*50)
+    
+    import json
+    import tempfile
+    from batch_runner import run, percentile
+    
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "queries.jsonl")
+        output_path = os.path.join(tmp, "results.jsonl")
+        with open(input_path, "w") as f:
+            f.write(json.dumps({"id": "q1", "query": "What are diabetes symptoms?"}) + "\n")
+            f.write(json.dumps({"id": "q2", "query": "How can I prevent the flu?"}) + "\n")
+            f.write(json.dumps("What causes high blood pressure?") + "\n")
+        
+        # Simulate a crashed run: line 1 finished, line 2 cut off mid-write
+        with open(output_path, "w") as f:
+            f.write(json.dumps({"line": 1, "status": "completed"}) + "\n")
+            f.write('{"line": 2, "sta')
+        
+        report = run(input_path, output_path, workers=1, batch_size=2, concurrency=2)
+        print(f"✓ Report: processed {report['processed']}, resumed {report['resumed']}, "
+              f"{report['throughput']:.2f} queries/s")
+        print(f"✓ Stages: {sorted(report['latency'])}")
+        
+        with open(output_path) as f:
+            records = [json.loads(line) for line in f]
+        assert report["processed"] == 2 and report["resumed"] == 1
+        assert sorted(r["line"] for r in records) == [1, 2, 3]
+        assert {r["id"] for r in records if r["line"] > 1} == {"q2", None}
+        assert "total" in report["latency"] and "search" in report["latency"]
+    
+    return True
+
+
+def test_single_flight():
+    """Test coalescing of concurrent identical queries."""
+    print("\n" + "="*50)
+    print("Testing Single-Flight Coalescing")
+    print("="*50)
+    
+    import threading
+    import time
+    import controller as controller_module
+    from controller import SystemController
+    from single_flight import SingleFlight, normalize_query
+    
+    assert normalize_query("What is  the FLU? ") == normalize_query("what is the flu")
+    
+    # Failures are shared with every waiting caller
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+    
+    def failing():
+        release.wait(5)
+        raise RuntimeError("backend down")
+    
+    def call():
+        try:
+            flight.do("key", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+    
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads:
+        t.start()
+    while flight.stats["shared"] < 2:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+    assert errors == ["backend down"] * 3 and flight.in_flight() == 0
+    
+    # Concurrent duplicates in the controller share one pipeline run
+    pipeline_calls = []
+    gate = threading.Event()
+    
+    def slow_pipeline(user_query, reflect=True, retrieved=None):
+        pipeline_calls.append(user_query)
+        gate.wait(5)
+        return {"output": f"Answer: {user_query}", "retrieved": "", "summary": ""}
+    
+    controller = SystemController(async_reflection=False)
+    session_id = controller.session_manager.create_session()
+    responses = []
+    original_pipeline = controller_module.run_pipeline
+    controller_module.run_pipeline = slow_pipeline
+    try:
+        queries = ["What causes the flu?", "what causes the flu", "What causes  the flu?"]
+        threads = [
+            threading.Thread(target=lambda q=q: responses.append(controller.handle_query(q, session_id)))
+            for q in queries
+        ]
+        for t in threads:
+            t.start()
+        while controller.single_flight.stats["shared"] < 2:
+            time.sleep(0.01)
+        gate.set()
+        for t in threads:
+            t.join()
+    finally:
+        controller_module.run_pipeline = original_pipeline
+    
+    print(f"✓ {len(responses)} responses from {len(pipeline_calls)} pipeline run(s)")
+    assert len(pipeline_calls) == 1
+    assert all(r.status == "completed" for r in responses)
+    assert len({r.response_id for r in responses}) == 3
+    assert len(controller.session_manager.get_session(session_id).query_history) == 3
+    
+    return True
+
+
+def test_admission_control():
+    """Test bounded concurrency, fast rejection and request deadlines."""
+    print("\n" + "="*50)
+    print("Testing Admission Control")
+    print("="*50)
+    
+    import threading
+    import time
+    import controller as controller_module
+    from admission import (AdmissionController, AdmissionRejected, Deadline,
+                           DeadlineExceeded, check_deadline, deadline_scope)
+    from controller import SystemController
+    from models import QueryStatus
+    
+    admission = AdmissionController(max_concurrency=1, max_queue_depth=1)
+    admission.acquire()
+    
+    # One caller may queue; it gives up when its deadline passes
+    waiter_errors = []
+    def wait_for_slot():
+        try:
+            admission.acquire(Deadline(0.2))
+        except AdmissionRejected as e:
+            waiter_errors.append(str(e))
+    waiter = threading.Thread(target=wait_for_slot)
+    waiter.start()
+    while admission.stats()["waiting"] == 0:
+        time.sleep(0.01)
+    
+    # The queue is full: the next caller is rejected without waiting
+    start = time.perf_counter()
+    try:
+        admission.acquire(Deadline(5))
+        assert False, "expected a rejection"
+    except AdmissionRejected:
+        rejected_after = time.perf_counter() - start
+    waiter.join()
+    admission.release()
+    print(f"✓ Rejected in {rejected_after * 1000:.1f}ms; stats {admission.stats()}")
+    assert rejected_after < 0.1
+    assert len(waiter_errors) == 1
+    assert admission.stats() == {"running": 0, "waiting": 0, "admitted": 1,
+                                 "rejected": 1, "timed_out": 1}
+    
+    # Deadlines are checked before each stage
+    with deadline_scope(Deadline(0)):
+        try:
+            check_deadline("summarize")
+            assert False, "expected the deadline to be exceeded"
+        except DeadlineExceeded:
+            pass
+    check_deadline("summarize")  # no current deadline
+    
+    # The controller rejects queries once saturated
+    release = threading.Event()
+    def slow_pipeline(user_query, reflect=True, retrieved=None):
+        release.wait(5)
+        return {"output": "done", "retrieved": "", "summary": ""}
+    
+    controller = SystemController(async_reflection=False, max_concurrency=1, max_queue_depth=0)
+    original_pipeline = controller_module.run_pipeline
+    controller_module.run_pipeline = slow_pipeline
+    try:
+        first = []
+        busy = threading.Thread(
+            target=lambda: first.append(controller.handle_query("What causes asthma?"))
+        )
+        busy.start()
+        while controller.get_admission_stats()["running"] == 0:
+            time.sleep(0.01)
+        rejected = controller.handle_query("How is asthma treated?")
+        release.set()
+        busy.join()
+    finally:
+        controller_module.run_pipeline = original_pipeline
+    
+    print(f"✓ Saturated controller: {rejected.status} ({rejected.execution_time * 1000:.1f}ms)")
+    assert rejected.status == QueryStatus.REJECTED.value
+    assert first[0].status == QueryStatus.COMPLETED.value
+    
+    return True
+
+
 def run_all_tests():
     """Run all tests."""
     print("\n" + "="*70)
@@ -231,10 +1809,35 @@ def run_all_tests():
     
     tests = [
         ("Data Models", test_models),
+        ("Model Codec", test_model_codec),
         ("Input Validator", test_validator),
         ("Session Manager", test_session_manager),
+        ("Session Expiry", test_session_expiry),
+        ("Session Manager Concurrency", test_session_concurrency),
+        ("Session Store", test_session_store),
+        ("Session History", test_session_history),
+        ("Reflection Worker", test_reflection_worker),
+        ("LLM Cache", test_llm_cache),
+        ("LLM Provider Clients", test_llm_clients),
+        ("Rate Limiter", test_rate_limiter),
+        ("LLM Router", test_llm_router),
+        ("Context Packer", test_context_packer),
+        ("Map-Reduce Summarization", test_map_reduce_summary),
+        ("Extractive Summarizer", test_extractive_summary),
+        ("Groundedness Scorer", test_groundedness),
+        ("Quality Gate", test_quality_gate),
+        ("Plan Template Cache", test_plan_templates),
         ("Agent Classes", test_agents),
+        ("Agent Logging", test_agent_logging),
+        ("Tracing", test_tracing),
+        ("Metrics", test_metrics),
         ("System Controller", test_controller),
+        ("Batch Query Processing", test_batch_queries),
+        ("RAG Vector Search", test_rag_vector_search),
+        ("Batch Runner", test_batch_runner),
+        ("Lazy Imports", test_lazy_imports),
+        ("Single-Flight Coalescing", test_single_flight),
+        ("Admission Control", test_admission_control),
     ]
     
     results = []
@@ -0,0 +1,210 @@
+"""Token counting and prompt-context packing for the LLM-backed agents.
+
+Chunks retrieved by the Search Agent are packed whole, in rank order, into
+the model's context window after reserving room for the prompt template and
+the response, instead of cutting the joined text at a fixed character count.
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+# Context windows (tokens) for the models this project is configured with.
+# Ollama serves models with a small default num_ctx regardless of the model's
+# trained context length, so it is sized separately via OLLAMA_NUM_CTX.
+CONTEXT_WINDOWS = {
+    "mistral-small-latest": 32000,
+    "mistral-small": 32000,
+    "mistral-large-latest": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _approximate_tokenize(text: str) -> List[str]:
+    """BPE-like approximation: punctuation is one token, words ~4 characters per token."""
+    tokens = []
+    for piece in _WORD_PATTERN.findall(text):
+        tokens.extend(piece[i:i + 4] for i in range(0, len(piece), 4))
+    return tokens
+
+
+@lru_cache(maxsize=8)
+def get_tokenizer(model: str = "") -> Callable[[str], List]:
+    """
+    Get a tokenizer function for a model (cached per model).
+
+    Uses tiktoken when it is installed and falls back to an approximation
+    otherwise, which is close enough for budgeting.
+
+    Args:
+        model: Model name
+
+    Returns:
+        Function mapping text to a list of tokens
+    """
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return encoding.encode
+    except ImportError:
+        return _approximate_tokenize
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str, model: str = "") -> int:
+    """
+    Count the tokens in a text (cached, since the same chunks recur across queries).
+
+    Args:
+        text: Text to count
+        model: Model name
+
+    Returns:
+        Number of tokens
+    """
+    return len(get_tokenizer(model)(text))
+
+
+def get_context_window(model: str) -> int:
+    """
+    Get the context window for a model.
+
+    Args:
+        model: Model name, optionally provider-prefixed ("ollama/llama3.2") or a
+            comma-separated list of routed backends (the smallest window wins)
+
+    Returns:
+        Context window in tokens
+    """
+    if "," in model:
+        return min(get_context_window(m) for m in model.split(","))
+
+    provider, _, name = model.rpartition("/")
+    if provider == "ollama":
+        return int(os.getenv('OLLAMA_NUM_CTX', '2048'))
+    return CONTEXT_WINDOWS.get(name, DEFAULT_CONTEXT_WINDOW)
+
+
+def model_name(llm) -> str:
+    """
+    Provider-qualified model name of an agent LLM, for get_context_window().
+
+    Args:
+        llm: LLM object (client, cache/limiter wrapper or router)
+
+    Returns:
+        Name such as "ollama/llama3.2", or a comma-separated list for a router
+    """
+    provider = getattr(llm, 'provider', '') or ''
+    model = str(getattr(llm, 'model', '') or '')
+    if provider and provider != "router" and not model.startswith(f"{provider}/"):
+        return f"{provider}/{model}"
+    return model
+
+
+def split_chunks(retrieved_text: str) -> List[str]:
+    """
+    Recover the ranked chunks from the Search Agent's formatted output.
+
+    Args:
+        retrieved_text: "Retrieved N document chunks:" header followed by
+            chunks separated by blank lines (or any plain text)
+
+    Returns:
+        Chunks in rank order
+    """
+    text = retrieved_text.strip()
+    if text.startswith("Retrieved ") and ":" in text.split("\n", 1)[0]:
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+    return [chunk.strip() for chunk in text.split("\n\n") if chunk.strip()]
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "") -> str:
+    """
+    Trim text to whole sentences that fit within a token budget.
+
+    Args:
+        text: Text to trim
+        max_tokens: Token budget
+        model: Model name
+
+    Returns:
+        Longest prefix of whole sentences within budget (empty if none fits)
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_END.split(text):
+        tokens = count_tokens(sentence, model) + 1
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept)
+
+
+def pack_chunks(chunks: List[str], budget: int, model: str = "") -> Tuple[List[str], int]:
+    """
+    Greedily pack the highest-ranked whole chunks into a token budget.
+
+    Chunks that do not fit are skipped so a lower-ranked, shorter chunk may
+    still use the remaining space.
+
+    Args:
+        chunks: Chunks in rank order
+        budget: Token budget for the chunks
+        model: Model name
+
+    Returns:
+        Tuple of (packed chunks in rank order, tokens used)
+    """
+    packed = []
+    used = 0
+    separator = count_tokens("\n\n", model)
+
+    for chunk in chunks:
+        tokens = count_tokens(chunk, model) + (separator if packed else 0)
+        if used + tokens <= budget:
+            packed.append(chunk)
+            used += tokens
+
+    if not packed and chunks and budget > 0:
+        # Nothing fits whole: keep the top chunk, cut at a sentence boundary
+        top = truncate_to_tokens(chunks[0], budget, model)
+        if top:
+            packed.append(top)
+            used = count_tokens(top, model)
+
+    return packed, used
+
+
+def fit_context(prompt_template: str, chunks: List[str], model: str = "",
+                reserve_output: int = 512, context_window: Optional[int] = None) -> Tuple[str, int]:
+    """
+    Pack chunks into whatever the model's window leaves after the prompt and output.
+
+    Args:
+        prompt_template: Prompt text excluding the chunks
+        chunks: Chunks in rank order
+        model: Model name
+        reserve_output: Tokens kept free for the response
+        context_window: Override for the model's context window
+
+    Returns:
+        Tuple of (packed context text, total prompt tokens)
+    """
+    window = context_window or get_context_window(model)
+    overhead = count_tokens(prompt_template, model)
+    budget = max(0, window - overhead - reserve_output)
+    packed, used = pack_chunks(chunks, budget, model)
+    return "\n\n".join(packed), overhead + used
@@ -0,0 +1,202 @@
+"""Extractive summarization (TextRank) for the no-LLM fallback path.
+
+Sentences are embedded with the MiniLM model already used for retrieval,
+a cosine similarity matrix is built with NumPy and a query-personalized
+PageRank picks the most central, relevant sentences. Without the embedding
+model a hashed bag-of-words vector is used instead.
+"""
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from tools.context_packer import split_chunks
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to was what "
+    "when where which who why with".split()
+)
+
+HASH_DIM = 512
+_embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+EMBEDDING_CACHE_SIZE = 4096
+_cache_lock = threading.Lock()
+_model_available = True
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split retrieved text into sentences, chunk by chunk.
+
+    Args:
+        text: Search Agent output or plain text
+
+    Returns:
+        Sentences in document order
+    """
+    sentences = []
+    for chunk in split_chunks(text):
+        for sentence in _SENTENCE_END.split(" ".join(chunk.split())):
+            if len(sentence) > 15:
+                sentences.append(sentence)
+    return sentences
+
+
+def _hashed_vectors(texts: List[str]) -> np.ndarray:
+    """Hashed, log-scaled bag-of-words vectors (fallback when MiniLM is unavailable)."""
+    vectors = np.zeros((len(texts), HASH_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in _WORD.findall(text.lower()):
+            if word in _STOPWORDS:
+                continue
+            vectors[row, zlib.crc32(word.encode("utf-8")) % HASH_DIM] += 1.0
+    return np.log1p(vectors)
+
+
+def _load_model():
+    """Get the MiniLM embeddings, disabling them for good if they cannot be loaded."""
+    global _model_available
+    from tools.rag_tool import get_embeddings
+    try:
+        return get_embeddings()
+    except (ImportError, OSError):
+        # Embedding model not installed or its files are missing: stop retrying
+        _model_available = False
+        raise
+
+
+def cache_embeddings(texts: List[str], vectors) -> None:
+    """
+    Seed the embedding cache with MiniLM vectors computed elsewhere.
+
+    Args:
+        texts: Embedded texts
+        vectors: Their embeddings from the retrieval model, one row per text
+    """
+    with _cache_lock:
+        for text, vector in zip(texts, vectors):
+            _embedding_cache[text] = np.asarray(vector, dtype=np.float32)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """
+    Embed texts as L2-normalized rows, reusing cached sentence embeddings.
+
+    Args:
+        texts: Texts to embed
+
+    Returns:
+        Array of shape (len(texts), dim)
+    """
+    matrix = None
+    if _model_available and texts:
+        with _cache_lock:
+            cached = {t: _embedding_cache[t] for t in texts if t in _embedding_cache}
+        missing = [t for t in dict.fromkeys(texts) if t not in cached]
+        try:
+            if missing:
+                vectors = _load_model().embed_documents(missing)
+                fresh = dict(zip(missing, np.asarray(vectors, dtype=np.float32)))
+                cached.update(fresh)
+                cache_embeddings(missing, list(fresh.values()))
+            matrix = np.stack([cached[t] for t in texts])
+        except Exception as e:
+            # Other failures may be transient: fall back for this call only
+            if _model_available:
+                print(f"⚠️  Sentence embedding failed, using hashed vectors: {e}")
+
+    if matrix is None:
+        matrix = _hashed_vectors(texts)
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def textrank(similarity: np.ndarray, personalization: Optional[np.ndarray] = None,
+             damping: float = 0.85, max_iter: int = 100, tol: float = 1e-6) -> np.ndarray:
+    """
+    Power-iteration PageRank over a sentence similarity graph.
+
+    Args:
+        similarity: Symmetric non-negative similarity matrix
+        personalization: Teleport distribution (uniform if None)
+        damping: Damping factor
+        max_iter: Maximum iterations
+        tol: L1 convergence tolerance
+
+    Returns:
+        Score per sentence (sums to 1)
+    """
+    n = similarity.shape[0]
+    weights = similarity.copy()
+    np.fill_diagonal(weights, 0.0)
+    row_sums = weights.sum(axis=1, keepdims=True)
+    # Row-normalize; sentences with no edges teleport uniformly
+    transition = np.divide(weights, row_sums, out=np.full_like(weights, 1.0 / n),
+                           where=row_sums > 0)
+
+    teleport = np.full(n, 1.0 / n) if personalization is None else personalization
+    scores = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        updated = (1 - damping) * teleport + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+
+def extractive_summary(text: str, query: Optional[str] = None, max_sentences: int = 7,
+                       query_weight: float = 0.5, redundancy_threshold: float = 0.9) -> List[str]:
+    """
+    Select the most central and query-relevant sentences.
+
+    Args:
+        text: Retrieved text to summarize
+        query: User query used to bias the ranking (optional)
+        max_sentences: Maximum sentences to return
+        query_weight: Weight of query relevance against TextRank centrality
+        redundancy_threshold: Skip sentences this similar to one already selected
+
+    Returns:
+        Selected sentences in their original order
+    """
+    sentences = split_sentences(text)
+    if len(sentences) <= 1:
+        return sentences
+
+    vectors = embed_texts(sentences + ([query] if query else []))
+    sentence_vectors = vectors[:len(sentences)]
+    similarity = np.clip(sentence_vectors @ sentence_vectors.T, 0.0, None)
+
+    relevance = None
+    personalization = None
+    if query:
+        relevance = np.clip(sentence_vectors @ vectors[-1], 0.0, None)
+        if relevance.max() > 0:
+            # Bias the random walk towards query-relevant sentences
+            personalization = relevance / relevance.sum()
+        else:
+            relevance = None
+
+    scores = textrank(similarity, personalization)
+    if relevance is not None:
+        # Blend centrality with direct relevance to the query
+        scores = ((1 - query_weight) * scores / scores.max()
+                  + query_weight * relevance / relevance.max())
+
+    selected: List[int] = []
+    for index in np.argsort(-scores):
+        if len(selected) >= max_sentences:
+            break
+        if any(similarity[index, j] >= redundancy_threshold for j in selected):
+            continue
+        selected.append(int(index))
+
+    return [sentences[i] for i in sorted(selected)]
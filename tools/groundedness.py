@@ -0,0 +1,90 @@
+"""Embedding-based groundedness scoring for summaries.
+
+Summary sentences and retrieved source chunks are embedded in one batch and
+compared with a cosine similarity matrix: each sentence's best match is its
+support, and each source's best match tells whether the summary covers it.
+"""
+import re
+from typing import Any, Dict, List
+
+import numpy as np
+
+from tools.extractive import embed_texts
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Template text added by the Summarization Agent, not claims to verify
+TEMPLATE_PHRASES = (
+    "Health Research Summary",
+    "This summary presents health-related information",
+    "This information is for research purposes",
+    "Please consult with qualified healthcare professionals",
+    "Incorporated Improvements",
+)
+
+
+def summary_claims(summary_text: str) -> List[str]:
+    """
+    Extract the factual sentences of a summary, skipping headings and boilerplate.
+
+    Args:
+        summary_text: Formatted summary
+
+    Returns:
+        Claim sentences in order
+    """
+    claims = []
+    for line in summary_text.splitlines():
+        line = line.strip().lstrip("-*• ").strip()
+        if not line or line.startswith(("#", "=")):
+            continue
+        for sentence in _SENTENCE_END.split(line):
+            if len(sentence) > 15 and not any(p in sentence for p in TEMPLATE_PHRASES):
+                claims.append(sentence)
+    return claims
+
+
+def score_groundedness(summary_text: str, sources: List[str],
+                       support_threshold: float = 0.5) -> Dict[str, Any]:
+    """
+    Score how well a summary is supported by its source chunks.
+
+    Args:
+        summary_text: Summary to check
+        sources: Retrieved source chunks
+        support_threshold: Similarity at which a sentence counts as supported
+
+    Returns:
+        Dict with per-sentence support, support_rate, coverage (share of
+        sources reflected in the summary) and factuality on a 0-5 scale
+    """
+    claims = summary_claims(summary_text)
+    sources = [s for s in sources if s.strip()]
+    if not claims or not sources:
+        return {"sentences": [], "support_rate": 0.0, "coverage": 0.0, "factuality": 0.0}
+
+    vectors = embed_texts(claims + sources)
+    similarity = vectors[:len(claims)] @ vectors[len(claims):].T
+
+    support = similarity.max(axis=1)
+    best_source = similarity.argmax(axis=1)
+    supported = support >= support_threshold
+    covered = similarity.max(axis=0) >= support_threshold
+
+    # Partial credit below the threshold, full credit at or above it
+    factuality = 5.0 * float(np.clip(support / support_threshold, 0.0, 1.0).mean())
+
+    return {
+        "sentences": [
+            {
+                "text": claim,
+                "support": float(support[i]),
+                "source_index": int(best_source[i]),
+                "supported": bool(supported[i]),
+            }
+            for i, claim in enumerate(claims)
+        ],
+        "support_rate": float(supported.mean()),
+        "coverage": float(covered.mean()),
+        "factuality": factuality,
+    }
@@ -0,0 +1,205 @@
+"""Query-intent clustering with a cache of parameterized plan templates.
+
+Each intent is a centroid in the embedding space shared with retrieval
+(see tools.extractive.embed_texts). A query is assigned to the nearest
+centroid; centroids move incrementally (running mean) as queries are
+assigned, and a query no centroid is close to starts a new intent once
+the LLM has produced a plan for it. Templates hold "{query}" and "{topic}"
+placeholders that are filled in locally.
+"""
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tools.extractive import embed_texts
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Question phrasing and intent cue words that are not part of the topic
+_NON_TOPIC_WORDS = frozenset(
+    "a an and are as at be by can could do does for from how i in is it me my of on or "
+    "should that the there this to was what when where which who why will with would you your "
+    "about tell explain know best ways way get getting main common early "
+    "symptom symptoms sign signs warning prevent prevention preventing avoid reduce risk risks "
+    "protect against treat treatment treatments treating cure cures medication medications "
+    "therapy therapies manage managing cause causes causing factor factors people".split()
+)
+_TOPIC_PREPOSITIONS = frozenset("of for about against with".split())
+
+
+def query_topic(query: str) -> str:
+    """
+    Strip question phrasing and intent cue words to get the query's topic.
+
+    The topic is taken from after the last preposition when there is one
+    ("symptoms of type 2 diabetes", "foods that are good for the liver").
+
+    Args:
+        query: User query
+
+    Returns:
+        Topic words (e.g. "type 2 diabetes"), or the query itself if nothing remains
+    """
+    words = _WORD.findall(query.lower())
+    for i in range(len(words) - 1, -1, -1):
+        if words[i] in _TOPIC_PREPOSITIONS:
+            tail = [w for w in words[i + 1:] if w not in _NON_TOPIC_WORDS]
+            if tail:
+                return " ".join(tail)
+            break
+    topic = [w for w in words if w not in _NON_TOPIC_WORDS]
+    return " ".join(topic) or query.strip()
+
+
+def fill_template(template: str, query: str) -> str:
+    """
+    Fill a plan template's placeholders for a query.
+
+    Args:
+        template: Template with "{query}" and/or "{topic}" placeholders
+        query: User query
+
+    Returns:
+        Plan text
+    """
+    # str.replace rather than format(): learned templates may contain braces
+    return template.replace("{query}", query).replace("{topic}", query_topic(query))
+
+
+def parameterize_plan(plan: str, query: str) -> str:
+    """
+    Turn a generated plan into a template by replacing the query and its topic.
+
+    Args:
+        plan: Plan generated for the query
+        query: Query the plan was generated for
+
+    Returns:
+        Template with "{query}" and "{topic}" placeholders
+    """
+    template = plan.replace(query, "{query}")
+    topic = query_topic(query)
+    if topic != query:
+        template = re.sub(rf"\b{re.escape(topic)}\b", "{topic}", template, flags=re.IGNORECASE)
+    return template
+
+
+class IntentIndex:
+    """Nearest-centroid intent classifier with plan templates per intent."""
+
+    def __init__(self, match_threshold: float = 0.3, max_intents: int = 64):
+        """
+        Initialize an empty index.
+
+        Args:
+            match_threshold: Cosine similarity to a centroid needed to assign a
+                query to that intent
+            max_intents: Maximum number of intents (learned intents beyond this
+                are not added)
+        """
+        self.match_threshold = match_threshold
+        self.max_intents = max_intents
+        self.names: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        self.counts: List[int] = []
+        self.templates: Dict[str, str] = {}
+        self._learned = 0
+        self._lock = threading.Lock()
+
+    def add_intent(self, name: str, examples: List[str], template: Optional[str] = None) -> None:
+        """
+        Add an intent seeded from example queries.
+
+        Args:
+            name: Intent name
+            examples: Example queries for the intent
+            template: Plan template for the intent (optional)
+        """
+        vectors = embed_texts(examples)
+        with self._lock:
+            self._append(name, vectors.mean(axis=0), len(examples), template)
+
+    def classify(self, query: str) -> Tuple[Optional[str], float]:
+        """
+        Find the nearest intent centroid.
+
+        Args:
+            query: User query
+
+        Returns:
+            Tuple of (intent name or None if no centroid is close enough, similarity)
+        """
+        vector = embed_texts([query])[0]
+        with self._lock:
+            if self.centroids is None:
+                return None, 0.0
+            similarity = self.centroids @ vector
+            best = int(similarity.argmax())
+            score = float(similarity[best])
+            if score < self.match_threshold:
+                return None, score
+            return self.names[best], score
+
+    def template_for(self, intent: Optional[str]) -> Optional[str]:
+        """Get the plan template for an intent (None if unknown or untemplated)."""
+        with self._lock:
+            return self.templates.get(intent) if intent else None
+
+    def observe(self, query: str, plan: Optional[str] = None) -> Optional[str]:
+        """
+        Update the index with a planned query.
+
+        The query moves its nearest centroid towards it (running mean). If no
+        centroid is close enough and a plan is given, the query starts a new
+        intent whose template is the parameterized plan.
+
+        Args:
+            query: Planned query
+            plan: Newly generated plan for the query (optional)
+
+        Returns:
+            Intent the query was assigned to, or None
+        """
+        vector = embed_texts([query])[0]
+        with self._lock:
+            if self.centroids is not None:
+                similarity = self.centroids @ vector
+                best = int(similarity.argmax())
+                if similarity[best] >= self.match_threshold:
+                    count = self.counts[best]
+                    # Centroids are kept normalized; the running mean is taken on
+                    # the normalized centroid weighted by its assignment count
+                    self._set_centroid(best, (self.centroids[best] * count + vector) / (count + 1))
+                    self.counts[best] = count + 1
+                    name = self.names[best]
+                    if plan and name not in self.templates:
+                        self.templates[name] = parameterize_plan(plan, query)
+                    return name
+
+            if plan is None or len(self.names) >= self.max_intents:
+                return None
+            self._learned += 1
+            name = f"learned_{self._learned}"
+            self._append(name, vector, 1, parameterize_plan(plan, query))
+            return name
+
+    def stats(self) -> Dict[str, int]:
+        """Get the number of queries assigned to each intent."""
+        with self._lock:
+            return dict(zip(self.names, self.counts))
+
+    def _append(self, name: str, vector: np.ndarray, count: int, template: Optional[str]) -> None:
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        if self.centroids is None:
+            self.centroids = vector[np.newaxis, :].astype(np.float32)
+        else:
+            self.centroids = np.vstack([self.centroids, vector])
+        self.names.append(name)
+        self.counts.append(count)
+        if template is not None:
+            self.templates[name] = template
+
+    def _set_centroid(self, index: int, vector: np.ndarray) -> None:
+        self.centroids[index] = vector / max(float(np.linalg.norm(vector)), 1e-12)
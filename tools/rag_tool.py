@@ -1,9 +1,37 @@
 import os
-from typing import List
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import threading
+from typing import Any, List, Optional, Tuple
+from tracing import get_tracer
 
 FAISS_PATH = os.path.join(os.path.dirname(__file__), "..", "kb", "faiss_store")
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+_embeddings = None
+_vectorstore = None
+_load_lock = threading.Lock()
+
+def get_embeddings():
+    """Load the MiniLM embedding model once per process and reuse it."""
+    global _embeddings
+    with _load_lock:
+        if _embeddings is None:
+            # Imported on first use: LangChain takes most of a second to import
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+
+            _embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        return _embeddings
+
+def get_vectorstore():
+    """Load the FAISS index once per process and reuse it."""
+    global _vectorstore
+    embeddings = get_embeddings()
+    with _load_lock:
+        if _vectorstore is None:
+            from langchain_community.vectorstores import FAISS
+
+            # allow_dangerous_deserialization is set to True because we created the index ourselves
+            _vectorstore = FAISS.load_local(FAISS_PATH, embeddings, allow_dangerous_deserialization=True)
+        return _vectorstore
 
 def rag_search_fallback(query: str, k: int = 4) -> List[str]:
     """Search the FAISS index for relevant documents."""
@@ -12,11 +40,88 @@ def rag_search_fallback(query: str, k: int = 4) -> List[str]:
         return []
 
     try:
-        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        # allow_dangerous_deserialization is set to True because we created the index ourselves
-        vectorstore = FAISS.load_local(FAISS_PATH, embeddings, allow_dangerous_deserialization=True)
+        vectorstore = get_vectorstore()
         docs = vectorstore.similarity_search(query, k=k)
         return [d.page_content for d in docs]
     except Exception as e:
         print(f"Error searching FAISS index: {e}")
         return []
+
+def _search_by_vectors(vectorstore, vectors, k: int) -> List[List[Tuple[str, float]]]:
+    """
+    Search a LangChain FAISS store with query embeddings, all rows in one index call.
+
+    The only place that relies on FAISS store internals (normalization flag,
+    raw index, docstore mapping, relevance function); test_rag_vector_search pins it
+    against similarity_search_with_relevance_scores.
+
+    Args:
+        vectorstore: LangChain FAISS vector store
+        vectors: Query embeddings, shape (n, dim)
+        k: Documents per query
+
+    Returns:
+        (content, relevance in [0, 1]) pairs per query, in rank order
+    """
+    import numpy as np
+
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    if vectorstore._normalize_L2:
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    with get_tracer().span("retrieval.search", k=k, queries=len(vectors)) as span:
+        distances, indices = vectorstore.index.search(vectors, k)
+        relevance = vectorstore._select_relevance_score_fn()
+        results = []
+        for row_distances, row_indices in zip(distances, indices):
+            hits = []
+            for distance, index in zip(row_distances, row_indices):
+                if index == -1:
+                    continue
+                doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[index])
+                hits.append((doc.page_content, float(relevance(float(distance)))))
+            results.append(hits)
+        span.set(hits=sum(len(hits) for hits in results))
+    return results
+
+def rag_search_with_scores(query: str, k: int = 4) -> List[Tuple[str, float]]:
+    """Search the FAISS index, returning (content, relevance) pairs with relevance in [0, 1]."""
+    if not os.path.exists(FAISS_PATH):
+        print(f"⚠️  FAISS index not found at {FAISS_PATH}")
+        return []
+
+    try:
+        vectorstore = get_vectorstore()
+        # Same steps as similarity_search_with_relevance_scores, timed separately
+        with get_tracer().span("retrieval.embed", queries=1):
+            vector = get_embeddings().embed_query(query)
+        return _search_by_vectors(vectorstore, [vector], k)[0]
+    except Exception as e:
+        print(f"Error searching FAISS index: {e}")
+        return []
+
+def rag_search_batch(queries: List[str], k: int = 4
+                     ) -> Tuple[List[List[Tuple[str, float]]], Optional[Any]]:
+    """
+    Search the FAISS index for many queries with one embedding batch and one index search.
+
+    Returns:
+        (content, relevance) pairs per query, and the query embeddings as a
+        NumPy array so callers can reuse them (None if the queries were not embedded)
+    """
+    if not queries:
+        return [], None
+    if not os.path.exists(FAISS_PATH):
+        print(f"⚠️  FAISS index not found at {FAISS_PATH}")
+        return [[] for _ in queries], None
+
+    vectors = None
+    try:
+        import numpy as np
+
+        vectorstore = get_vectorstore()
+        with get_tracer().span("retrieval.embed", queries=len(queries)):
+            vectors = np.asarray(get_embeddings().embed_documents(queries), dtype=np.float32)
+        return _search_by_vectors(vectorstore, vectors, k), vectors
+    except Exception as e:
+        print(f"Error searching FAISS index: {e}")
+        return [[] for _ in queries], vectors
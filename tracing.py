@@ -0,0 +1,358 @@
+"""
+Tracing
+
+Lightweight spans around pipeline stages, agent executions, retrieval and
+LLM calls. Spans nest through a context variable, carry attributes (chunk
+counts, prompt tokens, cache hits, ...) and on completion feed a latency
+histogram per span name. With TRACE_EXPORT_PATH set, finished spans are
+also appended to a JSONL file by a background writer.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from rate_limiter import estimate_tokens
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram.
+
+    Values are recorded in microseconds into log-linear buckets: each power
+    of two is split into 2**sub_bucket_bits buckets, so every percentile is
+    accurate to within 1 / 2**sub_bucket_bits of the true value (under 1%
+    by default) while memory stays bounded regardless of the sample count.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 7):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            sub_bucket_bits: Precision; buckets per power of two is 2**sub_bucket_bits
+        """
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """
+        Add one latency sample.
+
+        Args:
+            seconds: Measured latency
+        """
+        value = max(1, int(seconds * 1e6))
+        shift = max(0, value.bit_length() - 1 - self.sub_bucket_bits)
+        bucket = (value >> shift) << shift
+        with self._lock:
+            self.counts[bucket] = self.counts.get(bucket, 0) + 1
+            self.count += 1
+            self.total_us += value
+            self.max_us = max(self.max_us, value)
+            self.min_us = value if self.min_us is None else min(self.min_us, value)
+
+    def percentile(self, pct: float) -> float:
+        """
+        Latency at a percentile.
+
+        Args:
+            pct: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds (0.0 without samples)
+        """
+        with self._lock:
+            return self._percentile(pct)
+
+    def cumulative(self, bounds: List[float]) -> Tuple[List[int], int, float]:
+        """
+        Count samples at or below each bound (for Prometheus-style buckets).
+
+        Args:
+            bounds: Ascending upper bounds in seconds
+
+        Returns:
+            Tuple of (cumulative count per bound, total count, sum in seconds)
+        """
+        with self._lock:
+            items = sorted(self.counts.items())
+            count, total = self.count, self.total_us / 1e6
+        cumulative = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            limit = bound * 1e6
+            while index < len(items) and items[index][0] <= limit:
+                seen += items[index][1]
+                index += 1
+            cumulative.append(seen)
+        return cumulative, count, total
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Summarize the histogram.
+
+        Returns:
+            count plus min, mean, p50, p90, p99, p999 and max latency in seconds
+        """
+        with self._lock:
+            if not self.count:
+                return {"count": 0}
+            return {
+                "count": self.count,
+                "min": self.min_us / 1e6,
+                "mean": self.total_us / self.count / 1e6,
+                "p50": self._percentile(50),
+                "p90": self._percentile(90),
+                "p99": self._percentile(99),
+                "p999": self._percentile(99.9),
+                "max": self.max_us / 1e6,
+            }
+
+    def _percentile(self, pct: float) -> float:
+        """Percentile from the buckets (lock held)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(pct / 100.0 * self.count)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                # Never report beyond the largest recorded value
+                return min(bucket, self.max_us) / 1e6
+        return self.max_us / 1e6
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "start",
+                 "duration", "error", "_start_perf")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self._start_perf = time.perf_counter()
+
+    def set(self, **attributes: Any) -> None:
+        """Add or overwrite attributes."""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert span to dictionary."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": self.duration * 1000,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class JsonlSpanExporter:
+    """Appends finished spans to a JSONL file from a background thread."""
+
+    def __init__(self, path: str, max_pending: int = 10000):
+        """
+        Initialize the exporter and start its writer thread.
+
+        Args:
+            path: Output JSONL file (appended to)
+            max_pending: Spans buffered before new ones are dropped
+        """
+        self.path = path
+        self.dropped = 0
+        self._pending: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._writer = threading.Thread(target=self._write_loop, name="span-exporter",
+                                        daemon=True)
+        self._writer.start()
+
+    def export(self, span: Span) -> None:
+        """Queue a finished span for writing; never blocks the caller."""
+        try:
+            self._pending.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Write out queued spans and stop the writer."""
+        self._pending.put(None)
+        self._writer.join()
+
+    def _write_loop(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as out:
+            while True:
+                span = self._pending.get()
+                if span is None:
+                    break
+                out.write(json.dumps(span.to_dict(), default=str) + "\n")
+                if self._pending.empty():
+                    out.flush()
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+class Tracer:
+    """Creates spans and aggregates their latencies per span name."""
+
+    def __init__(self, exporter: Optional[JsonlSpanExporter] = None):
+        """
+        Initialize the tracer.
+
+        Args:
+            exporter: Where finished spans are written (None keeps only histograms)
+        """
+        self.exporter = exporter
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Time the enclosed block as a span, nested under the current span.
+
+        Args:
+            name: Span (and histogram) name, e.g. "retrieval.embed"
+            **attributes: Initial span attributes
+
+        Yields:
+            The span, for adding attributes
+        """
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            span.duration = time.perf_counter() - span._start_perf
+            self._histogram(name).record(span.duration)
+            if self.exporter is not None:
+                self.exporter.export(span)
+
+    def histogram_items(self) -> List[Tuple[str, LatencyHistogram]]:
+        """Get (span name, histogram) pairs, sorted by name."""
+        with self._lock:
+            return sorted(self.histograms.items())
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get latency percentiles per span name.
+
+        Returns:
+            Histogram snapshot (see LatencyHistogram.snapshot) per span name
+        """
+        return {name: histogram.snapshot() for name, histogram in self.histogram_items()}
+
+    def _histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+
+def current_span() -> Optional[Span]:
+    """Get the innermost active span, if any."""
+    return _current_span.get()
+
+
+def add_span_attributes(**attributes: Any) -> None:
+    """Attach attributes to the innermost active span (no-op outside a span)."""
+    span = _current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+class TracedLLM:
+    """Wraps an LLM object (call/predict interface) in an "llm.call" span per call."""
+
+    def __init__(self, llm: Any, tracer: Optional[Tracer] = None):
+        """
+        Initialize the traced LLM.
+
+        Args:
+            llm: Underlying LLM (CachedLLM, RateLimitedLLM, LatencyRouter, ...)
+            tracer: Tracer to record to (the shared tracer if omitted)
+        """
+        self.llm = llm
+        self.tracer = tracer or get_tracer()
+        self.name = repr(llm)
+
+    @property
+    def provider(self) -> Optional[str]:
+        """Provider of the wrapped LLM (used for cache keys and context windows)."""
+        return getattr(self.llm, "provider", None)
+
+    @property
+    def model(self) -> Optional[str]:
+        """Model of the wrapped LLM."""
+        return getattr(self.llm, "model", None)
+
+    def call(self, messages: List[Dict[str, str]]) -> str:
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+        with self.tracer.span("llm.call", llm=self.name, prompt_tokens=prompt_tokens) as span:
+            response = self.llm.call(messages)
+            span.set(response_tokens=estimate_tokens(str(response)))
+            return response
+
+    def predict(self, prompt: str) -> str:
+        with self.tracer.span("llm.call", llm=self.name,
+                              prompt_tokens=estimate_tokens(prompt)) as span:
+            response = self.llm.predict(prompt)
+            span.set(response_tokens=estimate_tokens(str(response)))
+            return response
+
+    def __repr__(self) -> str:
+        return f"TracedLLM({self.llm!r})"
+
+
+# Shared tracer - created lazily so histograms accumulate across queries
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """
+    Get or create the shared tracer.
+
+    Environment:
+        TRACE_EXPORT_PATH: JSONL file finished spans are appended to (unset disables export)
+    """
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            path = os.getenv('TRACE_EXPORT_PATH')
+            exporter = None
+            if path:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                exporter = JsonlSpanExporter(path)
+                atexit.register(exporter.close)
+            _tracer = Tracer(exporter)
+        return _tracer
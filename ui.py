@@ -1,7 +1,12 @@
 import streamlit as st
 from controller import SystemController
+from metrics import start_metrics_server
+from models import QueryStatus
 import time
 
+# Queries shown per page of session history
+HISTORY_PAGE_SIZE = 10
+
 # --- Configuration & Setup ---
 st.set_page_config(
     page_title="Health Research Agentic System",
@@ -171,6 +176,9 @@ if 'controller' not in st.session_state:
     st.session_state.controller = SystemController()
     st.session_state.controller.initialize_system()
 
+# Prometheus scrape endpoint beside the app when METRICS_PORT is set (started once per process)
+start_metrics_server()
+
 if 'session_id' not in st.session_state:
     st.session_state.session_id = st.session_state.controller.session_manager.create_session()
 
@@ -192,10 +200,10 @@ with st.sidebar:
     )
     
     st.markdown("### 📊 Session Stats")
-    history = controller.get_session_state(st.session_state.session_id)
+    history = controller.get_session_state(st.session_state.session_id, limit=HISTORY_PAGE_SIZE)
     if history:
-        st.metric("Queries", len(history['queries']))
-        st.metric("Feedback Given", len(history['feedback']))
+        st.metric("Queries", history['total_queries'])
+        st.metric("Feedback Given", history['total_feedback'])
     
     st.markdown("---")
     if st.button("New Session", type="secondary"):
@@ -230,13 +238,15 @@ if search_button:
             time.sleep(0.5)
             st.write("📝 **Summarizer Agent:** Synthesizing information...")
             time.sleep(0.5)
-            st.write("🤔 **Reflective Agent:** Reviewing for accuracy and safety...")
+            st.write("🤔 **Reflective Agent:** Queued to review accuracy and safety in the background...")
             
             response = controller.handle_query(query, st.session_state.session_id)
             st.session_state.last_response = response
             
             if response.is_successful():
                 status.update(label="Processing Complete", state="complete", expanded=False)
+            elif response.status == QueryStatus.REJECTED.value:
+                status.update(label="⏳ System busy - please try again shortly", state="error", expanded=True)
             else:
                 status.update(label="❌ Process Failed", state="error", expanded=True)
 
@@ -275,6 +285,18 @@ if st.session_state.last_response:
                 st.info("No detailed content available.")
             st.markdown('</div>', unsafe_allow_html=True)
             
+            # Reflection runs in the background; poll for it on each render
+            st.markdown('<div class="card">', unsafe_allow_html=True)
+            st.markdown('<div class="result-header">🤔 Quality Reflection</div>', unsafe_allow_html=True)
+            reflection = controller.get_reflection(st.session_state.session_id, response.query.query_id)
+            if reflection:
+                st.markdown(reflection)
+            else:
+                st.info("The Reflective Agent is still reviewing this summary.")
+                if st.button("Check for Reflection"):
+                    st.rerun()
+            st.markdown('</div>', unsafe_allow_html=True)
+            
         with tab2:
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.markdown("### 🔍 Retrieved Documents")
@@ -332,7 +354,14 @@ if st.session_state.last_response:
 # Session History Expander (kept at bottom for reference)
 with st.expander("📜 View Session History"):
     if history and history['queries']:
-        for i, q in enumerate(reversed(history['queries']), 1):
+        pages = -(-history['available_queries'] // HISTORY_PAGE_SIZE)
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+        offset = (page - 1) * HISTORY_PAGE_SIZE
+        if offset:
+            history = controller.get_session_state(
+                st.session_state.session_id, offset=offset, limit=HISTORY_PAGE_SIZE
+            )
+        for i, q in enumerate(reversed(history['queries']), offset + 1):
             st.markdown(f"**{i}.** {q['text']} ({q['timestamp']})")
     else:
         st.write("No history yet.")
@@ -2,10 +2,18 @@
 Input Validator
 
 Validates and sanitizes user input before processing.
+
+Validation and sanitization share one pass: the length bounds are checked
+first so rejected input never reaches a regex, the forbidden patterns are
+matched as a single precompiled alternation, and tags and null bytes are
+stripped by one substitution.
 """
-from typing import Optional
+from typing import Iterable, List, Optional
 import re
 
+# Removed during sanitization: HTML/script tags and null bytes
+_STRIP_PATTERN = re.compile(r'<[^>]+>|\x00')
+
 
 class InputValidator:
     """Validates user queries and other inputs."""
@@ -27,6 +35,8 @@ class InputValidator:
             r'javascript:',               # JavaScript protocol
             r'on\w+\s*=',                # Event handlers
         ]
+        self._forbidden = re.compile(
+            '|'.join(f'(?:{pattern})' for pattern in self.forbidden_patterns), re.IGNORECASE)
     
     def validate_query(self, query: str) -> bool:
         """
@@ -38,20 +48,63 @@ class InputValidator:
         Returns:
             True if valid, False otherwise
         """
+        return self._checked(query) is not None
+    
+    def validate_and_sanitize(self, query: str) -> Optional[str]:
+        """
+        Validate a user query and sanitize it in one pass.
+        
+        Args:
+            query: Query string to validate
+            
+        Returns:
+            Sanitized query if valid, None otherwise
+        """
+        text = self._checked(query)
+        if text is None:
+            return None
+        return ' '.join(_STRIP_PATTERN.sub('', text).split())
+    
+    def validate_batch(self, queries: Iterable[str]) -> List[Optional[str]]:
+        """
+        Validate and sanitize many queries.
+        
+        Args:
+            queries: Query strings to validate
+            
+        Returns:
+            Sanitized query, or None if invalid, for each input in order
+        """
+        checked = self._checked
+        strip_sub = _STRIP_PATTERN.sub
+        results: List[Optional[str]] = []
+        for query in queries:
+            text = checked(query)
+            results.append(None if text is None else ' '.join(strip_sub('', text).split()))
+        return results
+    
+    def _checked(self, query: str) -> Optional[str]:
+        """Stripped query if it passes the length and safety checks, None otherwise."""
         if not query or not isinstance(query, str):
-            return False
+            return None
         
-        query = query.strip()
+        # Early exits: stripping can only shorten the text, and cannot shorten
+        # it if neither end is whitespace
+        length = len(query)
+        if length < self.min_length:
+            return None
+        if length > self.max_length and not (query[0].isspace() or query[-1].isspace()):
+            return None
         
-        # Check length
-        if not self.check_length(query):
-            return False
+        text = query.strip()
+        if not self.min_length <= len(text) <= self.max_length:
+            return None
         
         # Check for dangerous patterns
-        if not self.check_safety(query):
-            return False
+        if self._forbidden.search(text):
+            return None
         
-        return True
+        return text
     
     def sanitize_input(self, input_str: str) -> str:
         """
@@ -66,16 +119,8 @@ class InputValidator:
         if not input_str:
             return ""
         
-        # Remove HTML/script tags
-        sanitized = re.sub(r'<[^>]+>', '', input_str)
-        
-        # Remove null bytes
-        sanitized = sanitized.replace('\x00', '')
-        
-        # Normalize whitespace
-        sanitized = ' '.join(sanitized.split())
-        
-        return sanitized.strip()
+        # Remove HTML/script tags and null bytes, then normalize whitespace
+        return ' '.join(_STRIP_PATTERN.sub('', input_str).split())
     
     def check_length(self, text: str) -> bool:
         """
@@ -100,13 +145,7 @@ class InputValidator:
         Returns:
             True if safe, False if dangerous patterns found
         """
-        text_lower = text.lower()
-        
-        for pattern in self.forbidden_patterns:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                return False
-        
-        return True
+        return self._forbidden.search(text) is None
     
     def validate_rating(self, rating: int) -> bool:
         """